@@ -1,20 +1,24 @@
+import os
 import numpy as np
 import pandas as pd
 import warnings
 from flask import Flask, request
 from AFLPy.AFLData_Client import load_data, upload_data
 from AFLPy.ntfy import push_notification
-from afl_analytics.arpadl.pyafl import convert_to_actions
+from afl_analytics.arpadl.cache import ConversionCache
 
 warnings.filterwarnings("ignore")
 
 app = Flask(__name__)
 
+# Unchanged matches are served from the cache instead of being converted again
+cache = ConversionCache(os.environ.get("ARPADL_CACHE_DIR", ".arpadl_cache"))
+
 @app.route("/aflanalytics/convert_to_actions", methods=["GET", "POST"])
 def convert_chains_to_arpadl(ID = None):
     
     chains = load_data('AFL_API_Match_Chains', ID = request.json['ID'])
-    actions = convert_to_actions(chains)
+    actions = cache.convert_to_actions(chains)
     
     upload_data(Dataset_Name="CG_ARPADL_Data", Dataset=actions, overwrite=True, update_if_identical=True)
     push_notification("Chains converted to ARPADL Data", ", ".join([match_id for match_id in list(actions['match_id'])]))
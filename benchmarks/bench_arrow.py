@@ -0,0 +1,73 @@
+"""Compare the pandas and Arrow backends of the ARPADL and atomic conversions.
+
+Usage: python benchmarks/bench_arrow.py [chains.parquet] [--repeats N]
+
+Without a path, a season of synthetic chains is written to a temporary
+Parquet file and read from there.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from afl_analytics.arpadl.arrow import actions_to_pandas, convert_to_actions_arrow, convert_to_atomic_arrow
+from afl_analytics.arpadl.atomic.base import convert_to_atomic
+from afl_analytics.arpadl.pyafl import convert_to_actions
+from afl_analytics.arpadl.synthetic import generate_chains, matches_per_round, rounds_per_season
+
+
+def _best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def bench(path, repeats=5):
+    # The Arrow backend reads the string columns as dictionaries, without decoding them
+    strings = [field.name for field in pq.read_schema(path) if pa.types.is_string(field.type)]
+
+    pandas_time, pandas_actions = _best_of(
+        lambda: convert_to_actions(pq.read_table(path).to_pandas(), validation="dtype"), repeats
+    )
+    arrow_time, arrow_actions = _best_of(
+        lambda: convert_to_actions_arrow(pq.read_table(path, read_dictionary=strings), validation="dtype"), repeats
+    )
+    assert actions_to_pandas(arrow_actions).equals(pandas_actions)
+
+    pandas_atomic_time, pandas_atomic = _best_of(lambda: convert_to_atomic(pandas_actions), repeats)
+    arrow_atomic_time, arrow_atomic = _best_of(lambda: convert_to_atomic_arrow(arrow_actions), repeats)
+    assert actions_to_pandas(arrow_atomic).equals(pandas_atomic)
+
+    print(f"actions: {len(pandas_actions)}")
+    print(f"pandas:  {pandas_time:.3f}s")
+    print(f"arrow:   {arrow_time:.3f}s ({pandas_time / arrow_time:.2f}x)")
+    print(f"atomic actions: {len(pandas_atomic)}")
+    print(f"pandas:  {pandas_atomic_time:.3f}s")
+    print(f"arrow:   {arrow_atomic_time:.3f}s ({pandas_atomic_time / arrow_atomic_time:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", help="Parquet file with chains, synthetic chains if omitted")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.path is not None:
+        bench(args.path, args.repeats)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chains.parquet")
+        chains = generate_chains(matches_per_round * rounds_per_season, seed=0)
+        pq.write_table(pa.Table.from_pandas(chains, preserve_index=False), path)
+        bench(path, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
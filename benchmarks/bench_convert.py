@@ -0,0 +1,97 @@
+"""Throughput and peak memory of the ARPADL converters on synthetic chains.
+
+Usage: python benchmarks/bench_convert.py [n_matches ...] [--repeats N] [--json PATH] [--profile]
+
+Defaults to one match, one round, a quarter season and a season. Each size
+reports the actions per second and the peak traced memory of
+convert_to_actions and convert_to_atomic. With --profile, the time spent in
+each stage of the converters is printed as well.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from afl_analytics.arpadl.atomic.base import convert_to_atomic
+from afl_analytics.arpadl.profiling import Profiler
+from afl_analytics.arpadl.pyafl import convert_to_actions
+from afl_analytics.arpadl.synthetic import generate_chains, matches_per_round, rounds_per_season
+
+
+def _best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(n_matches, repeats=3):
+    chains = generate_chains(n_matches, seed=0)
+    to_actions = lambda: convert_to_actions(chains, validation="dtype")
+    actions_time, actions = _best_of(to_actions, repeats)
+    to_atomic = lambda: convert_to_atomic(actions)
+    atomic_time, atomic_actions = _best_of(to_atomic, repeats)
+
+    return {
+        "matches": n_matches,
+        "chains": len(chains),
+        "convert_to_actions": {
+            "actions": len(actions),
+            "seconds": actions_time,
+            "actions_per_second": len(actions) / actions_time,
+            "peak_bytes": _peak_memory(to_actions),
+        },
+        "convert_to_atomic": {
+            "actions": len(atomic_actions),
+            "seconds": atomic_time,
+            "actions_per_second": len(atomic_actions) / atomic_time,
+            "peak_bytes": _peak_memory(to_atomic),
+        },
+    }
+
+
+def main():
+    season = matches_per_round * rounds_per_season
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[1, matches_per_round, season // 4, season])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--profile", action="store_true", help="Print the time spent in each stage")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'matches':>8} {'converter':>20} {'actions':>10} {'seconds':>9} {'actions/s':>11} {'peak MB':>9}")
+    for n_matches in args.sizes:
+        result = bench(n_matches, args.repeats)
+        results.append(result)
+        for converter in ["convert_to_actions", "convert_to_atomic"]:
+            r = result[converter]
+            print(
+                f"{n_matches:>8} {converter:>20} {r['actions']:>10} {r['seconds']:>9.3f} "
+                f"{r['actions_per_second']:>11.0f} {r['peak_bytes'] / 2**20:>9.1f}"
+            )
+        if args.profile:
+            chains = generate_chains(n_matches, seed=0)
+            with Profiler() as profiler:
+                convert_to_atomic(convert_to_actions(chains, validation="dtype"))
+            print(profiler.summary().drop(columns="peak_bytes").to_string(), end="\n\n")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Throughput of the VAEP and Atomic-VAEP features, labels and values on synthetic matches.
+
+Usage: python benchmarks/bench_vaep.py [n_matches ...] [--repeats N] [--json PATH]
+
+Defaults to one match, one round and a quarter season. VAEP computes the game
+states of one match at a time, so it is run match by match; Atomic-VAEP
+computes them for all matches in a single pass. Each size reports the actions
+per second of the features, the labels and the values of both frameworks.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from afl_analytics.arpadl.atomic.base import convert_to_atomic
+from afl_analytics.arpadl.pyafl import convert_to_actions
+from afl_analytics.arpadl.synthetic import generate_chains, matches_per_round, rounds_per_season
+from afl_analytics.utils import get_home_team_from_match_id
+from afl_analytics.vaep import formula
+from afl_analytics.vaep.atomic import formula as atomic_formula
+from afl_analytics.vaep.atomic.base import AtomicVAEP
+from afl_analytics.vaep.base import VAEP
+
+
+def _best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _per_match(fn, actions):
+    def run():
+        for match_id, match_actions in actions.groupby("match_id", sort=False):
+            fn(pd.Series({"home_team_id": get_home_team_from_match_id(match_id)}), match_actions)
+
+    return run
+
+
+def _result(n_actions, seconds):
+    return {"actions": n_actions, "seconds": seconds, "actions_per_second": n_actions / seconds}
+
+
+def bench(n_matches, repeats=3):
+    actions = convert_to_actions(generate_chains(n_matches, seed=0), validation="dtype")
+    atomic_actions = convert_to_atomic(actions)
+    rng = np.random.default_rng(0)
+    probabilities = [pd.Series(rng.random(len(actions)), index=actions.index) for _ in range(2)]
+    atomic_probabilities = [pd.Series(rng.random(len(atomic_actions)), index=atomic_actions.index) for _ in range(2)]
+
+    vaep_model, atomic_model = VAEP(), AtomicVAEP()
+    return {
+        "matches": n_matches,
+        "vaep": {
+            stage: _result(len(actions), _best_of(fn, repeats))
+            for stage, fn in [
+                ("features", _per_match(vaep_model.compute_features, actions)),
+                ("labels", _per_match(vaep_model.compute_labels, actions)),
+                ("values", lambda: formula.value(actions, *probabilities)),
+            ]
+        },
+        "atomic_vaep": {
+            stage: _result(len(atomic_actions), _best_of(fn, repeats))
+            for stage, fn in [
+                ("features", lambda: atomic_model.compute_features(None, atomic_actions)),
+                ("labels", lambda: atomic_model.compute_labels(None, atomic_actions)),
+                ("values", lambda: atomic_formula.value(atomic_actions, *atomic_probabilities)),
+            ]
+        },
+    }
+
+
+def main():
+    season = matches_per_round * rounds_per_season
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[1, matches_per_round, season // 4])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'matches':>8} {'framework':>12} {'stage':>9} {'actions':>10} {'seconds':>9} {'actions/s':>11}")
+    for n_matches in args.sizes:
+        result = bench(n_matches, args.repeats)
+        results.append(result)
+        for framework in ["vaep", "atomic_vaep"]:
+            for stage, r in result[framework].items():
+                print(
+                    f"{n_matches:>8} {framework:>12} {stage:>9} {r['actions']:>10} "
+                    f"{r['seconds']:>9.3f} {r['actions_per_second']:>11.0f}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
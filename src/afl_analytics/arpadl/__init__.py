@@ -0,0 +1,5 @@
+"""Implementation of the ARPADL language."""
+
+__all__ = ["add_names", "decode_categories", "encode_categories"]
+
+from .utils import add_names, decode_categories, encode_categories
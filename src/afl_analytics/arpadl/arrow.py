@@ -0,0 +1,215 @@
+"""Apache Arrow backend for the ARPADL converters.
+
+The chains are read straight from an Arrow table. String columns are
+dictionary-encoded and handed to the converter as categoricals, so no Python
+string objects are created for them, and numeric columns are converted
+without copying. The ARPADL actions are returned as an Arrow table with
+dictionary-encoded string columns, which converts to pandas without copying
+the numeric columns.
+The atomic conversion likewise runs on the dictionary indices of the ARPADL
+actions.
+"""
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+from . import config as arpadlconfig
+from .atomic.base import _arpadl_columns, _atomic_vocabularies, _convert_codes
+from .atomic.schema import AtomicARPADLSchema
+from .pyafl import _chain_columns, _convert_chains
+from .schema import ARPADLSchema, validate_actions
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None  # type: ignore
+    pc = None  # type: ignore
+
+# Columns compared with each other share one dictionary, so they compare by index
+_team_columns: list[str] = ['Team', 'Team_Chain', 'Home_Team', 'Away_Team']
+
+_vocabularies: dict[str, list[str]] = {
+    'action_type': arpadlconfig.actiontypes,
+    'bodypart': arpadlconfig.bodyparts,
+    'result': arpadlconfig.results,
+}
+
+
+def convert_to_actions_arrow(chains: "pa.Table", validation: str = "dtype") -> "pa.Table":
+    """
+    Convert PyAFL events in an Arrow table to ARPADL actions.
+
+    Parameters
+    ----------
+    chains : pa.Table
+        Table containing AFL API Match Chains from one or more games.
+    validation : str, default='dtype'
+        How thoroughly the actions are validated against the ARPADL schema:
+        'full', 'dtype', 'sample' or 'off'.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+
+    Returns
+    -------
+    actions : pa.Table
+        Table with the corresponding ARPADL actions. The 'match_id', 'team',
+        'player', 'action_type', 'bodypart' and 'result' columns are
+        dictionary-encoded.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is not installed.")
+
+    strings = {
+        col: _dictionary(chains.column(col))
+        for col in _chain_columns
+        if _is_string(chains.schema.field(col).type)
+    }
+    teams = _sorted_unique([strings[col] for col in _team_columns])
+
+    columns = {}
+    for col in _chain_columns:
+        if col in _team_columns:
+            columns[col] = _to_categorical(strings[col], teams)
+        elif col in strings:
+            columns[col] = _to_categorical(strings[col], _sorted_unique([strings[col]]))
+        else:
+            columns[col] = chains.column(col).to_numpy()
+
+    actions = _to_table(_convert_chains(columns), ARPADLSchema, _vocabularies)
+    validate_actions(actions_to_pandas(actions, categorical=True), ARPADLSchema, validation)
+    return actions
+
+
+def convert_to_atomic_arrow(actions: "pa.Table", validation: str = "off") -> "pa.Table":
+    """
+    Convert ARPADL actions in an Arrow table to Atomic-ARPADL actions.
+
+    The string columns are converted as dictionary indices by the same
+    conversion as :func:`~afl_analytics.arpadl.atomic.base.convert_to_atomic`,
+    so no Python string objects are created for them, and its result equals
+    that of the pandas converter.
+
+    Parameters
+    ----------
+    actions : pa.Table
+        Table with ARPADL actions.
+    validation : str, default='off'
+        How thoroughly the atomic actions are validated against the
+        Atomic-ARPADL schema: 'full', 'dtype', 'sample' or 'off'.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+
+    Returns
+    -------
+    pa.Table
+        Table with the Atomic-ARPADL actions. The 'match_id', 'team',
+        'player', 'action_type' and 'bodypart' columns are dictionary-encoded.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is not installed.")
+
+    columns = {}
+    for col in _arpadl_columns:
+        if col in _vocabularies:
+            columns[col] = _to_categorical(_dictionary(actions.column(col)), pa.array(_vocabularies[col])).codes
+        elif _is_string(actions.schema.field(col).type):
+            column = _dictionary(actions.column(col))
+            columns[col] = _to_categorical(column, _sorted_unique([column]))
+        else:
+            columns[col] = actions.column(col).to_numpy()
+
+    # The conversion runs on the codes; the names are only attached to the result
+    names = {col: values.categories for col, values in columns.items() if isinstance(values, pd.Categorical)}
+    atomic_actions = _convert_codes({col: values.codes if col in names else values for col, values in columns.items()})
+    for col, categories in names.items():
+        atomic_actions[col] = pd.Categorical.from_codes(atomic_actions[col], categories=categories)
+
+    atomic_actions = _to_table(atomic_actions, AtomicARPADLSchema, _atomic_vocabularies)
+    validate_actions(actions_to_pandas(atomic_actions, categorical=True), AtomicARPADLSchema, validation)
+    return atomic_actions
+
+
+def actions_to_pandas(actions: "pa.Table", categorical: bool = False) -> DataFrame[ARPADLSchema]:
+    """
+    Return a pandas view of an Arrow table with (atomic) ARPADL actions.
+
+    Numeric columns without missing values are not copied, dictionary-encoded
+    columns become categoricals.
+
+    Parameters
+    ----------
+    actions : pa.Table
+        Table with ARPADL or Atomic-ARPADL actions.
+    categorical : bool, default=False
+        Whether to keep the dictionary-encoded columns as categoricals instead
+        of converting them to strings.
+
+    Returns
+    -------
+    pd.DataFrame
+        The actions.
+    """
+    frame = actions.to_pandas(split_blocks=True)
+    if not categorical:
+        for col, dtype in frame.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype(object)
+    return frame
+
+
+def _is_string(data_type: "pa.DataType") -> bool:
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def _dictionary(column: "pa.ChunkedArray") -> "pa.DictionaryArray":
+    # Dictionary-encoded columns, as read from Parquet, are used without decoding the strings
+    column = column.combine_chunks()
+    if not pa.types.is_dictionary(column.type):
+        column = column.cast(pa.string()).dictionary_encode()
+    return column
+
+
+def _sorted_unique(columns: list["pa.DictionaryArray"]) -> "pa.Array":
+    # Sorted like pandas categories, so sorting by code sorts by name
+    dictionaries = [column.dictionary.cast(pa.string()) for column in columns]
+    values = pc.unique(pa.chunked_array(dictionaries, type=pa.string())).drop_null()
+    return values.take(pc.sort_indices(values))
+
+
+def _to_categorical(column: "pa.DictionaryArray", categories: "pa.Array") -> pd.Categorical:
+    # Translate the dictionary of the column, not its rows, to the categories
+    dictionary_codes = pc.index_in(column.dictionary.cast(pa.string()), value_set=categories)
+    dictionary_codes = np.append(dictionary_codes.fill_null(-1).to_numpy(), -1)
+    indices = column.indices.fill_null(-1).to_numpy()
+    return pd.Categorical.from_codes(
+        dictionary_codes[indices], categories=categories.to_numpy(zero_copy_only=False)
+    )
+
+
+def _to_table(actions: dict, schema: type, vocabularies: dict[str, list[str]]) -> "pa.Table":
+    # Columns with a vocabulary hold codes into it, the other string columns are categoricals
+    arrays = {}
+    for col in schema.to_schema().columns.keys():
+        values = actions[col]
+        if col in vocabularies:
+            arrays[col] = pa.DictionaryArray.from_arrays(
+                pa.array(values, type=pa.int8()), pa.array(vocabularies[col])
+            )
+        elif isinstance(values, pd.Categorical):
+            arrays[col] = pa.DictionaryArray.from_arrays(
+                pa.array(values.codes, mask=values.codes < 0),
+                pa.array(np.asarray(values.categories, dtype=object), type=pa.string()),
+            )
+        else:
+            arrays[col] = pa.array(values)
+    return pa.table(arrays)
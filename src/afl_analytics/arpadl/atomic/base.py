@@ -2,177 +2,255 @@
 
 from typing import cast
 
+import numpy as np
 import pandas as pd
 from pandera.typing import DataFrame
 
 import afl_analytics.arpadl.config as _spadl
-from afl_analytics.arpadl.schema import ARPADLSchema
+from afl_analytics.arpadl.profiling import stage
+from afl_analytics.arpadl.schema import ARPADLSchema, validate_actions
 
 from . import config as _atomicspadl
 from .schema import AtomicARPADLSchema
 
 
-def convert_to_atomic(actions: DataFrame[ARPADLSchema]) -> DataFrame[AtomicARPADLSchema]:
+@stage
+def convert_to_atomic(
+    actions: DataFrame[ARPADLSchema], categorical: bool = False, validation: str = "off"
+) -> DataFrame[AtomicARPADLSchema]:
     """Convert regular ARPADL actions to atomic actions.
 
     Parameters
     ----------
     actions : pd.DataFrame
-        An ARPADL dataframe.
+        An ARPADL dataframe, with string or categorical columns.
+    categorical : bool, default=False
+        Whether to return the 'action_type', 'bodypart', 'team' and 'player'
+        columns as categoricals instead of strings.
+    validation : str, default='off'
+        How thoroughly the atomic actions are validated against the
+        Atomic-ARPADL schema: 'full', 'dtype', 'sample' or 'off'. See
+        :func:`~afl_analytics.arpadl.schema.validate_actions`.
 
     Returns
     -------
     pd.DataFrame
         The Atomic-ARPADL dataframe.
     """
-    atomic_actions = cast(pd.DataFrame, actions.copy())
-    atomic_actions = _extra_from_disposals(atomic_actions)
-    atomic_actions = _extra_from_shots(atomic_actions)
-    atomic_actions = _extra_from_fouls(atomic_actions)
-    atomic_actions = _convert_columns(atomic_actions)
+    # The conversion runs on integer codes; the names are only looked up for the result
+    columns, names = {}, {}
+    for col in _arpadl_columns:
+        if col in _vocabularies:
+            columns[col] = _codes(actions[col], _vocabularies[col])
+        elif col in _named_columns:
+            columns[col], names[col] = _factorize(actions[col])
+        else:
+            columns[col] = actions[col].to_numpy()
+
+    atomic_actions = _to_frame(_convert_codes(columns), names, categorical)
+    atomic_actions = validate_actions(atomic_actions, AtomicARPADLSchema, validation)
     return cast(DataFrame[AtomicARPADLSchema], atomic_actions)
 
 
-def _extra_from_disposals(actions: pd.DataFrame) -> pd.DataFrame:
-    next_actions = actions.shift(-1)
-    same_team = actions['team'] == next_actions['team']
-
-    samegame = actions['match_id'] == next_actions['match_id']
-    sameperiod = actions['period_id'] == next_actions['period_id']
-    successful = actions['result'] == "success"
-    handball = actions['action_type'] == "handball"
-    # samephase = next_actions.time_seconds - actions.time_seconds < max_pass_duration
-    extra_idx = (
-        actions['action_type'].isin(["handball"])
-        & samegame
-        & sameperiod
-        )
-
-    prev = actions[extra_idx]
-    nex = next_actions[extra_idx]
-
-    extras = pd.DataFrame()
-    prev = actions[extra_idx]
-    nex = next_actions[extra_idx]
-    extras["match_id"] = nex['match_id']
-    extras["period_id"] = nex['period_id']
-    extras["time_seconds"] = prev["time_seconds"]
-
-    extras["team"] = nex['team']
-    extras["player"] = nex['player']
-    extras["start_x"] = prev['end_x']
-    extras["start_y"] = prev['end_y']
-    extras["end_x"] = nex['start_x']
-    extras["end_y"] = nex['start_y']
-    extras["bodypart"] = 'hand'
-
-    extras['action_type'] = "non_action"
-    extras['action_type'] = (
-        extras['action_type'].mask(same_team & successful & handball, "handball_receival")
-    )
-    extras = extras[extras['action_type'] != 'non_action']
-
-    extras['result'] = "success"
-
-    actions = pd.concat([actions, extras], ignore_index=True, sort=False)
-    actions = actions.sort_values(["match_id", "period_id", 'time_seconds']).reset_index(drop=True)
-    return actions
-
-def _extra_from_shots(actions: pd.DataFrame) -> pd.DataFrame:
-
-    shotlike = ["shot"]
-
-    shot = actions['action_type'].isin(shotlike)
-    shot_goal = shot & (actions['result'] == "goal")
-    shot_behind = shot & (actions['result'] == "behind")
-    shot_miss = shot & (actions['result'] == "miss")
-
-    extra_idx = shot_goal | shot_behind | shot_miss
-    prev = actions[extra_idx]
-
-    extras = pd.DataFrame()
-    extras["match_id"] = prev['match_id']
-    extras["period_id"] = prev['period_id']
-    extras["time_seconds"] = prev["time_seconds"]
-
-    extras["team"] = prev['team']
-    extras["player"] = prev['player']
-    extras["start_x"] = prev['end_x']
-    extras["start_y"] = prev['end_y']
-    extras["end_x"] = prev['start_x']
-    extras["end_y"] = prev['start_y']
-    extras["bodypart"] = 'foot'
-
-    extras["action_type"] = "miss"
-    extras["action_type"] = (
-        extras['action_type'].mask(shot_goal, "goal")
-        .mask(shot_behind, "behind")
-        .mask(shot_miss, "miss")
-    )
-
-    actions = pd.concat([actions, extras], ignore_index=True, sort=False)
-    actions = actions.sort_values(["match_id", "period_id", 'time_seconds']).reset_index(drop=True)
-    return actions
-
-def _extra_from_fouls(actions: pd.DataFrame) -> pd.DataFrame:
-    next_actions = actions.shift(-1)
-    same_team = actions['team'] == next_actions['team']
-    same_game = actions['match_id'] == next_actions['match_id']
-    same_period = actions['period_id'] == next_actions['period_id']
-
-    free = actions['action_type'] == "free"
-
-    dx = actions['end_x'] - next_actions['start_x']
-    dy = actions['end_y'] - next_actions['start_y']
-    far_enough = dx**2 + dy**2 >= 50**2
-
-    fifty_idx = (
-        same_team
-        & same_game
-        & same_period
-        & far_enough
-        & free
-    )
-    prev = actions[free]
-    nex = next_actions[fifty_idx]
-
-    extras = pd.DataFrame()
-    extras["match_id"] = nex['match_id']
-    extras["period_id"] = nex['period_id']
-    extras["time_seconds"] = prev["time_seconds"]
-
-    extras["team"] = nex['team']
-    extras["player"] = nex['player']
-    extras["start_x"] = prev['end_x']
-    extras["start_y"] = prev['end_y']
-    extras["end_x"] = nex['start_x']
-    extras["end_y"] = nex['start_y']
-    extras["bodypart"] = 'hand'
-    extras["action_type"] = '50m_penalty'
-    extras["result"] = 'success'
-
-    actions = pd.concat([actions, extras], ignore_index=True, sort=False)
-    actions = actions.sort_values(["match_id", "period_id", 'time_seconds']).reset_index(drop=True)
-    return actions
-
-def _convert_columns(actions: pd.DataFrame) -> pd.DataFrame:
-    actions["x"] = actions['start_x']
-    actions["y"] = actions['start_y']
-    actions["dx"] = actions['end_x'] - actions['start_x']
-    actions["dy"] = actions['end_y'] - actions['start_y']
-    return actions[
-        ['match_id',
-        'period_id',
-        'time_seconds',
-        'team',
-        'player',
-        'x',
-        'y',
-        'dx',
-        'dy',
-        'action_type',
-        'bodypart',
-        ]
+def _convert_codes(actions: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    # The string columns are integer codes: 'action_type', 'bodypart' and 'result' into the
+    # ARPADL vocabularies, 'match_id', 'team' and 'player' into names the atomic actions keep
+    # Every extra action is derived from the ARPADL actions and follows its parent action
+    extras = [
+        _extra_from_disposals(actions),
+        _extra_from_shots(actions),
+        _extra_from_fouls(actions),
     ]
-
-
+    return _convert_columns(_interleave(actions, extras))
+
+
+_arpadl_columns: list[str] = [
+    'match_id',
+    'period_id',
+    'time_seconds',
+    'team',
+    'player',
+    'start_x',
+    'start_y',
+    'end_x',
+    'end_y',
+    'action_type',
+    'bodypart',
+    'result',
+]
+
+_atomic_columns: list[str] = list(AtomicARPADLSchema.to_schema().columns.keys())
+
+_vocabularies: dict[str, list[str]] = {
+    'action_type': _spadl.actiontypes,
+    'bodypart': _spadl.bodyparts,
+    'result': _spadl.results,
+}
+
+_atomic_vocabularies: dict[str, list[str]] = {
+    'action_type': _atomicspadl.actiontypes,
+    'bodypart': _atomicspadl.bodyparts,
+}
+
+_named_columns: list[str] = ['match_id', 'team', 'player']
+
+# The ARPADL action types and bodyparts keep their codes in Atomic-ARPADL
+_type_id: dict[str, int] = {name: i for i, name in enumerate(_atomicspadl.actiontypes)}
+_bodypart_id: dict[str, int] = {name: i for i, name in enumerate(_atomicspadl.bodyparts)}
+_result_id: dict[str, int] = {name: i for i, name in enumerate(_spadl.results)}
+
+# The atomic action type of the outcome of each shot result
+_result_type: np.ndarray = np.array([_type_id.get(name, -1) for name in _spadl.results])
+
+Extras = tuple[np.ndarray, dict[str, np.ndarray]]
+
+
+def _codes(values: pd.Series, categories: list[str]) -> np.ndarray:
+    # The position of each value in the categories, or -1 if it is not one of them
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == categories:
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=categories).codes
+
+
+def _factorize(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    # Codes into the sorted distinct values, the categories pandas would infer
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories()
+        if not values.cat.categories.is_monotonic_increasing:
+            values = values.cat.reorder_categories(values.cat.categories.sort_values())
+        return values.cat.codes.to_numpy(), values.cat.categories.to_numpy()
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _to_frame(
+    actions: dict[str, np.ndarray], names: dict[str, np.ndarray], categorical: bool
+) -> pd.DataFrame:
+    # Atomic actions with the names and atomic vocabularies looked up for the codes
+    frame = {}
+    for col in _atomic_columns:
+        values = actions[col]
+        if col == 'match_id':
+            values = names[col][values]
+        elif col in names or col in _atomic_vocabularies:
+            categories = names[col] if col in names else _atomic_vocabularies[col]
+            values = pd.Categorical.from_codes(values, categories=categories)
+            if not categorical:
+                values = np.asarray(values, dtype=object)
+        frame[col] = values
+    return pd.DataFrame(frame)
+
+
+def _same_phase_as_next(actions: dict[str, np.ndarray]) -> np.ndarray:
+    # Whether the next action is by the same team, in the same match and period
+    same = np.zeros(len(actions['match_id']), dtype=bool)
+    same[:-1] = (
+        (actions['team'][1:] == actions['team'][:-1])
+        & (actions['match_id'][1:] == actions['match_id'][:-1])
+        & (actions['period_id'][1:] == actions['period_id'][:-1])
+    )
+    return same
+
+
+def _extras_to_next(
+    actions: dict[str, np.ndarray], prev: np.ndarray, action_type: str, bodypart: str
+) -> Extras:
+    # Extras that move the ball from the end of an action to the start of the next action
+    nex = prev + 1
+    extras = {
+        "match_id": actions['match_id'][nex],
+        "period_id": actions['period_id'][nex],
+        "time_seconds": actions['time_seconds'][prev],
+        "team": actions['team'][nex],
+        "player": actions['player'][nex],
+        "start_x": actions['end_x'][prev],
+        "start_y": actions['end_y'][prev],
+        "end_x": actions['start_x'][nex],
+        "end_y": actions['start_y'][nex],
+        "action_type": np.full(len(prev), _type_id[action_type]),
+        "bodypart": np.full(len(prev), _bodypart_id[bodypart]),
+    }
+    return prev, extras
+
+
+@stage
+def _extra_from_disposals(actions: dict[str, np.ndarray]) -> Extras:
+    handball = (actions['action_type'] == _type_id["handball"]) & (actions['result'] == _result_id["success"])
+    prev = np.flatnonzero(handball & _same_phase_as_next(actions))
+    return _extras_to_next(actions, prev, "handball_receival", "hand")
+
+
+@stage
+def _extra_from_shots(actions: dict[str, np.ndarray]) -> Extras:
+    outcomes = [_result_id["goal"], _result_id["behind"], _result_id["miss"]]
+    shot = (actions['action_type'] == _type_id["shot"]) & np.isin(actions['result'], outcomes)
+    prev = np.flatnonzero(shot)
+
+    extras = {
+        "match_id": actions['match_id'][prev],
+        "period_id": actions['period_id'][prev],
+        "time_seconds": actions['time_seconds'][prev],
+        "team": actions['team'][prev],
+        "player": actions['player'][prev],
+        "start_x": actions['end_x'][prev],
+        "start_y": actions['end_y'][prev],
+        "end_x": actions['start_x'][prev],
+        "end_y": actions['start_y'][prev],
+        "action_type": _result_type[actions['result'][prev]],
+        "bodypart": np.full(len(prev), _bodypart_id["foot"]),
+    }
+    return prev, extras
+
+
+@stage
+def _extra_from_fouls(actions: dict[str, np.ndarray]) -> Extras:
+    free = actions['action_type'] == _type_id["free"]
+
+    dx = actions['end_x'][:-1] - actions['start_x'][1:]
+    dy = actions['end_y'][:-1] - actions['start_y'][1:]
+    far_enough = np.zeros(len(free), dtype=bool)
+    far_enough[:-1] = dx**2 + dy**2 >= 50**2
+
+    prev = np.flatnonzero(free & far_enough & _same_phase_as_next(actions))
+    return _extras_to_next(actions, prev, "50m_penalty", "hand")
+
+
+@stage
+def _interleave(actions: dict[str, np.ndarray], extras: list[Extras]) -> dict[str, np.ndarray]:
+    n = len(actions['match_id'])
+    prev = np.concatenate([parents for parents, _ in extras])
+
+    # Extras of the same action keep the order of the passes that created them
+    by_parent = np.argsort(prev, kind='stable')
+    counts = np.bincount(prev, minlength=n)
+    position = np.arange(n) + np.cumsum(counts) - counts
+    first_of_parent = np.cumsum(counts) - counts
+    rank = np.empty(len(prev), dtype=np.int64)
+    rank[by_parent] = np.arange(len(prev)) - first_of_parent[prev[by_parent]]
+
+    # Scatter the actions and their extras to their final positions, without sorting
+    take = np.empty(n + len(prev), dtype=np.int64)
+    take[position] = np.arange(n)
+    take[position[prev] + 1 + rank] = n + np.arange(len(prev))
+
+    return {
+        col: np.concatenate([actions[col]] + [columns[col] for _, columns in extras])[take]
+        for col in extras[0][1]
+    }
+
+
+@stage
+def _convert_columns(actions: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    return {
+        'match_id': actions['match_id'],
+        'period_id': actions['period_id'].astype(int),
+        'time_seconds': actions['time_seconds'],
+        'team': actions['team'],
+        'player': actions['player'],
+        'x': actions['start_x'],
+        'y': actions['start_y'],
+        'dx': actions['end_x'] - actions['start_x'],
+        'dy': actions['end_y'] - actions['start_y'],
+        'action_type': actions['action_type'],
+        'bodypart': actions['bodypart'],
+    }
@@ -24,8 +24,11 @@ bodyparts = _arpadl.bodyparts
 bodyparts_df = _arpadl.bodyparts_df
 
 actiontypes = _arpadl.actiontypes + [
-    "handball_receive",
-    "50m_penalty"
+    "handball_receival",
+    "50m_penalty",
+    "goal",
+    "behind",
+    "miss"
 ]
 
 
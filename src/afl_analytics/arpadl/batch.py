@@ -0,0 +1,212 @@
+"""Match-partitioned batch conversion of PyAFL event stream data to ARPADL."""
+
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+from .atomic.base import convert_to_atomic
+from .atomic.schema import AtomicARPADLSchema
+from .pyafl import _chain_columns, convert_to_actions
+from .schema import ARPADLSchema
+
+
+def convert_to_actions_batch(
+    chains: pd.DataFrame, max_workers: Optional[int] = None, validation: str = "full"
+) -> tuple[DataFrame[ARPADLSchema], dict[str, Exception]]:
+    """
+    Convert PyAFL events from many games to ARPADL actions.
+
+    The chains are partitioned by 'Match_ID' and every match is converted on
+    its own in a pool of worker processes. The converted matches are merged
+    in 'Match_ID' order, so the output does not depend on the number of
+    workers or on the order in which they finish.
+
+    Parameters
+    ----------
+    chains : pd.DataFrame
+        DataFrame containing AFL API Match Chains from one or more games.
+    max_workers : int, optional
+        Number of worker processes. Uses the number of processors on the
+        machine if None. With a single worker the matches are converted in
+        the calling process.
+    validation : str, default='full'
+        How thoroughly the actions of each match are validated: 'full',
+        'dtype', 'sample' or 'off'.
+
+    Returns
+    -------
+    actions : pd.DataFrame
+        DataFrame with the ARPADL actions of every match that was converted.
+    failures : dict
+        The exception raised for each match that could not be converted,
+        keyed by 'Match_ID'.
+
+    """
+    # Only ship the columns the converter reads to the workers
+    partitions = _partition(chains[_chain_columns], 'Match_ID')
+    converted = _convert_matches(
+        convert_to_actions, partitions, max_workers, threads=False, validation=validation
+    )
+    return _merge(converted, ARPADLSchema)
+
+
+def convert_to_atomic_batch(
+    actions: DataFrame[ARPADLSchema],
+    max_workers: Optional[int] = None,
+    validation: str = "off",
+    threads: bool = False,
+) -> tuple[DataFrame[AtomicARPADLSchema], dict[str, Exception]]:
+    """
+    Convert the ARPADL actions of many games to Atomic-ARPADL actions.
+
+    The actions are partitioned by 'match_id' and every match is converted on
+    its own in a pool of workers. The converted matches are merged in
+    'match_id' order.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        An ARPADL dataframe with the actions of one or more games.
+    max_workers : int, optional
+        Number of workers. Uses the number of processors on the machine if
+        None. With a single worker the matches are converted in the calling
+        process.
+    validation : str, default='off'
+        How thoroughly the atomic actions of each match are validated:
+        'full', 'dtype', 'sample' or 'off'.
+    threads : bool, default=False
+        Whether to convert the matches in a pool of threads, which share the
+        actions without copying them, instead of a pool of processes.
+
+    Returns
+    -------
+    atomic_actions : pd.DataFrame
+        The Atomic-ARPADL actions of every match that was converted.
+    failures : dict
+        The exception raised for each match that could not be converted,
+        keyed by 'match_id'.
+    """
+    converted = _convert_matches(
+        convert_to_atomic, _partition(actions, 'match_id'), max_workers, threads, validation=validation
+    )
+    return _merge(converted, AtomicARPADLSchema)
+
+
+def iter_convert_to_atomic(
+    actions: DataFrame[ARPADLSchema],
+    max_workers: Optional[int] = None,
+    validation: str = "off",
+    threads: bool = False,
+) -> Iterator[tuple[str, DataFrame[AtomicARPADLSchema]]]:
+    """
+    Convert ARPADL actions to Atomic-ARPADL actions, one match at a time.
+
+    The matches are converted in a pool of workers, a few matches ahead of
+    the consumer, and yielded in 'match_id' order. Only the matches in flight
+    are held in memory, so the atomic actions of several seasons can be
+    written out without building one frame with all of them.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        An ARPADL dataframe with the actions of one or more games.
+    max_workers : int, optional
+        Number of workers. Uses the number of processors on the machine if
+        None. With a single worker the matches are converted in the calling
+        process.
+    validation : str, default='off'
+        How thoroughly the atomic actions of each match are validated:
+        'full', 'dtype', 'sample' or 'off'.
+    threads : bool, default=False
+        Whether to convert the matches in a pool of threads, which share the
+        actions without copying them, instead of a pool of processes.
+
+    Raises
+    ------
+    Exception
+        The exception raised by the conversion of a match.
+
+    Yields
+    ------
+    match_id : str
+        The ID of the match.
+    atomic_actions : pd.DataFrame
+        The Atomic-ARPADL actions of the match.
+    """
+    converted = _convert_matches(
+        convert_to_atomic, _partition(actions, 'match_id'), max_workers, threads, validation=validation
+    )
+    for match_id, atomic_actions, error in converted:
+        if error is not None:
+            raise error
+        yield match_id, atomic_actions
+
+
+def _partition(frame: pd.DataFrame, column: str) -> Iterator[tuple[str, pd.DataFrame]]:
+    # Sorted matches are sliced by position, without copying the frame up front
+    codes, match_ids = pd.factorize(frame[column], sort=True)
+    if len(codes) and (np.diff(codes) >= 0).all():
+        bounds = np.searchsorted(codes, np.arange(len(match_ids) + 1))
+        for code, match_id in enumerate(match_ids):
+            yield match_id, frame.iloc[bounds[code]:bounds[code + 1]]
+    else:
+        rows = pd.Series(np.arange(len(codes))).groupby(codes, sort=True).indices
+        for code, match_id in enumerate(match_ids):
+            yield match_id, frame.iloc[rows[code]]
+
+
+def _convert_matches(
+    convert: Callable[..., pd.DataFrame],
+    partitions: Iterator[tuple[str, pd.DataFrame]],
+    max_workers: Optional[int],
+    threads: bool,
+    **kwargs: Any,
+) -> Iterator[tuple[str, Optional[pd.DataFrame], Optional[Exception]]]:
+    if max_workers == 1:
+        for match_id, match_frame in partitions:
+            try:
+                yield match_id, convert(match_frame, **kwargs), None
+            except Exception as e:
+                yield match_id, None, e
+        return
+
+    pool: Executor = ThreadPoolExecutor(max_workers) if threads else ProcessPoolExecutor(max_workers)
+    with pool as executor:
+        # Keep a bounded number of matches in flight and hand them back in order
+        window = 2 * (max_workers or os.cpu_count() or 1)
+        pending: deque[tuple[str, Future]] = deque()
+        for match_id, match_frame in partitions:
+            pending.append((match_id, executor.submit(convert, match_frame, **kwargs)))
+            if len(pending) >= window:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+
+def _result(match_id: str, future: Future) -> tuple[str, Optional[pd.DataFrame], Optional[Exception]]:
+    try:
+        return match_id, future.result(), None
+    except Exception as e:
+        return match_id, None, e
+
+
+def _merge(
+    converted: Iterator[tuple[str, Optional[pd.DataFrame], Optional[Exception]]], schema: Any
+) -> tuple[pd.DataFrame, dict[str, Exception]]:
+    frames = []
+    failures: dict[str, Exception] = {}
+    for match_id, frame, error in converted:
+        if error is None:
+            frames.append(frame)
+        else:
+            failures[match_id] = error
+
+    if not frames:
+        return pd.DataFrame(columns=list(schema.to_schema().columns.keys())), failures
+
+    return pd.concat(frames, ignore_index=True), failures
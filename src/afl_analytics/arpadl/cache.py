@@ -0,0 +1,220 @@
+"""Content-addressed cache for the ARPADL converters.
+
+Converted matches are stored on disk under a key that hashes the rows of the
+match and a version of the converter configuration, so a match is only
+converted again when its chains or the configuration change. The least
+recently used entries are evicted once the cache exceeds its size limit.
+"""
+
+import hashlib
+import os
+from typing import Callable, Optional
+
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+from afl_analytics.diskcache import LRUDirectory, match_keys
+
+from . import config as arpadlconfig
+from . import pyafl
+from .atomic import config as atomicconfig
+from .atomic.base import convert_to_atomic
+from .atomic.schema import AtomicARPADLSchema
+from .schema import ARPADLSchema
+from .utils import encode_categories
+
+
+def config_version() -> str:
+    """
+    Return a hash of the configuration the ARPADL converter depends on.
+
+    Returns
+    -------
+    str
+        The hash of the description to action mapping, the carry thresholds
+        and the ARPADL vocabularies.
+    """
+    return _hash_text(
+        repr(
+            (
+                sorted(pyafl.description_to_action_mapping.items()),
+                pyafl.min_carry_length,
+                pyafl.min_carry_time,
+                arpadlconfig.actiontypes,
+                arpadlconfig.bodyparts,
+                arpadlconfig.results,
+            )
+        )
+    )
+
+
+def atomic_config_version() -> str:
+    """
+    Return a hash of the configuration the Atomic-ARPADL converter depends on.
+
+    Returns
+    -------
+    str
+        The hash of the Atomic-ARPADL vocabularies.
+    """
+    return _hash_text(repr((atomicconfig.actiontypes, atomicconfig.bodyparts)))
+
+
+class ConversionCache:
+    """
+    An on-disk cache of converted matches.
+
+    Every match is cached on its own, so converting a season after one round
+    was updated only converts the matches of that round. The key of a match
+    includes the validation mode, so a match is only returned at the level it
+    was validated at.
+
+    Changing the code of the converters without changing their configuration
+    does not change the keys; :meth:`clear` the cache after such a change.
+
+    Parameters
+    ----------
+    root : str
+        The directory of the cache. It is created on the first write.
+    max_bytes : int, default=2**30
+        The size limit of the cache. The least recently used matches are
+        evicted when it is exceeded.
+
+    Attributes
+    ----------
+    hits : int
+        The number of matches that were read from the cache.
+    misses : int
+        The number of matches that were converted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2**30) -> None:
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._directory = LRUDirectory(root, ".pkl", max_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        """The size limit of the cache."""
+        return self._directory.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        self._directory.max_bytes = max_bytes
+
+    def convert_to_actions(
+        self, chains: pd.DataFrame, categorical: bool = False, validation: str = "full"
+    ) -> DataFrame[ARPADLSchema]:
+        """
+        Convert PyAFL events to ARPADL actions, reusing unchanged matches.
+
+        Parameters
+        ----------
+        chains : pd.DataFrame
+            DataFrame containing AFL API Match Chains from one or more games.
+        categorical : bool, default=False
+            Whether to return the 'action_type', 'bodypart', 'result', 'team'
+            and 'player' columns as categoricals instead of strings.
+        validation : str, default='full'
+            How thoroughly newly converted matches are validated against the
+            ARPADL schema: 'full', 'dtype', 'sample' or 'off'. Cached matches
+            were validated at the same level when they were converted.
+
+        Returns
+        -------
+        actions : pd.DataFrame
+            DataFrame with the corresponding ARPADL actions, as returned by
+            :func:`~afl_analytics.arpadl.pyafl.convert_to_actions`.
+        """
+        chains = chains[pyafl._chain_columns]
+        actions = self._convert(
+            chains,
+            chains['Match_ID'],
+            f"actions-{config_version()}-{validation}",
+            lambda match_chains: pyafl.convert_to_actions(match_chains, validation=validation),
+        )
+        if actions is None:
+            return pd.DataFrame(columns=list(ARPADLSchema.to_schema().columns.keys()))
+        if categorical:
+            actions = encode_categories(actions)
+        return actions
+
+    def convert_to_atomic(
+        self, actions: DataFrame[ARPADLSchema], categorical: bool = False, validation: str = "off"
+    ) -> DataFrame[AtomicARPADLSchema]:
+        """
+        Convert ARPADL actions to atomic actions, reusing unchanged matches.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame
+            An ARPADL dataframe, with string or categorical columns.
+        categorical : bool, default=False
+            Whether to return the 'action_type', 'bodypart', 'team' and
+            'player' columns as categoricals instead of strings.
+        validation : str, default='off'
+            How thoroughly newly converted matches are validated against the
+            Atomic-ARPADL schema: 'full', 'dtype', 'sample' or 'off'. Cached
+            matches were validated at the same level when they were converted.
+
+        Returns
+        -------
+        pd.DataFrame
+            The Atomic-ARPADL dataframe, as returned by
+            :func:`~afl_analytics.arpadl.atomic.base.convert_to_atomic`.
+        """
+        atomic_actions = self._convert(
+            actions,
+            actions['match_id'],
+            f"atomic-{config_version()}{atomic_config_version()}-{validation}",
+            lambda match_actions: convert_to_atomic(match_actions, validation=validation),
+        )
+        if atomic_actions is None:
+            return pd.DataFrame(columns=list(AtomicARPADLSchema.to_schema().columns.keys()))
+        if categorical:
+            atomic_actions = encode_categories(atomic_actions, atomicconfig.actiontypes)
+        return atomic_actions
+
+    def size(self) -> int:
+        """
+        Return the size of the cache in bytes.
+
+        Returns
+        -------
+        int
+            The total size of the cached matches.
+        """
+        return self._directory.size()
+
+    def clear(self) -> None:
+        """Remove every cached match."""
+        self._directory.clear()
+
+    def _convert(
+        self,
+        frame: pd.DataFrame,
+        match_ids: pd.Series,
+        version: str,
+        convert: Callable[[pd.DataFrame], pd.DataFrame],
+    ) -> Optional[pd.DataFrame]:
+        converted = []
+        for _, rows, key in match_keys(frame, match_ids, version, sort=True):
+            path = os.path.join(self.root, f"{key}.pkl")
+            if self._directory.get(path):
+                self.hits += 1
+                converted.append(pd.read_pickle(path))
+            else:
+                self.misses += 1
+                match_converted = convert(frame.iloc[rows])
+                self._directory.put(path, match_converted.to_pickle)
+                converted.append(match_converted)
+
+        self._directory.evict()
+        if not converted:
+            return None
+        return pd.concat(converted, ignore_index=True)
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
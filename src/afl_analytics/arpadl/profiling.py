@@ -0,0 +1,210 @@
+"""Per-stage instrumentation of the ARPADL converters.
+
+The stages of :func:`~afl_analytics.arpadl.pyafl.convert_to_actions` and
+:func:`~afl_analytics.arpadl.atomic.base.convert_to_atomic` are marked with
+the :func:`stage` decorator. While a :class:`Profiler` is active, every call
+of a stage records its wall time, the number of rows it received and
+returned and, optionally, its peak memory allocation::
+
+    with Profiler(memory=True) as profiler:
+        actions = convert_to_actions(chains)
+    print(profiler.summary())
+
+Without an active profiler a stage only costs a thread-local lookup. A
+profiler only records the stages that run in the thread that activated it;
+stages that run in worker threads or processes, such as those of
+:func:`~afl_analytics.arpadl.batch.convert_to_atomic_batch`, are not
+recorded. Thread pools are thus not profiled, and tracemalloc traces the whole
+process, so only one profiler should record memory at a time.
+"""
+
+import json
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Any, Callable, Optional, TypeVar
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# The active profiler of each thread
+_active = threading.local()
+
+
+class Profiler:
+    """
+    Record the stages of the converters that run while it is active.
+
+    Parameters
+    ----------
+    memory : bool, default=False
+        Whether to record the peak memory allocation of each stage with
+        tracemalloc. This slows the converters down considerably.
+    callback : callable, optional
+        Called with the record of every stage as soon as the stage returns.
+
+    Attributes
+    ----------
+    records : list(dict)
+        One record per stage call, in the order the calls returned, with the
+        'stage', 'parent', 'seconds', 'rows_in', 'rows_out' and 'peak_bytes'
+        of the call. The rows of a boolean mask are its selected rows.
+        'peak_bytes' is None unless memory is recorded.
+    """
+
+    def __init__(self, memory: bool = False, callback: Optional[Callable[[dict], None]] = None) -> None:
+        self.memory = memory
+        self.callback = callback
+        self.records: list[dict] = []
+        # The running stages, with their allocation at the start and their peak so far
+        self._stack: list[list[Any]] = []
+        self._previous: Optional[Profiler] = None
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> "Profiler":
+        self._previous, _active.profiler = getattr(_active, "profiler", None), self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _active.profiler = self._previous
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return the records as a dataframe.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per stage call.
+        """
+        columns = ["stage", "parent", "seconds", "rows_in", "rows_out", "peak_bytes"]
+        return pd.DataFrame(self.records, columns=columns)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Return the records aggregated by stage.
+
+        Returns
+        -------
+        pd.DataFrame
+            The number of calls, total seconds, total rows in and out and the
+            largest peak allocation of each stage, slowest stage first.
+        """
+        return (
+            self.to_frame()
+            .groupby("stage", sort=False)
+            .agg(
+                calls=("seconds", "size"),
+                seconds=("seconds", "sum"),
+                rows_in=("rows_in", "sum"),
+                rows_out=("rows_out", "sum"),
+                peak_bytes=("peak_bytes", "max"),
+            )
+            .sort_values("seconds", ascending=False)
+        )
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Export the records as JSON.
+
+        Parameters
+        ----------
+        path : str, optional
+            Also write the report to this file.
+
+        Returns
+        -------
+        str
+            The records as a JSON array.
+        """
+        report = json.dumps(self.records, indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(report)
+        return report
+
+    def _call(self, name: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Resetting the peak would lose it for the running stages
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([name, current, current])
+        else:
+            self._stack.append([name, 0, 0])
+
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            _, allocated, own_peak = self._stack.pop()
+            peak_bytes = None
+            if self.memory:
+                own_peak = max(own_peak, tracemalloc.get_traced_memory()[1])
+                peak_bytes = own_peak - allocated
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], own_peak)
+
+        record = {
+            "stage": name,
+            "parent": self._stack[-1][0] if self._stack else None,
+            "seconds": seconds,
+            "rows_in": _rows(args[0]) if args else None,
+            "rows_out": _rows(result),
+            "peak_bytes": peak_bytes,
+        }
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return result
+
+
+def stage(fn: F) -> F:
+    """
+    Mark a function as a stage of a converter.
+
+    Parameters
+    ----------
+    fn : callable
+        The stage. Its first argument and its result are counted as rows.
+
+    Returns
+    -------
+    callable
+        The stage, recorded by the active :class:`Profiler`.
+    """
+    name = fn.__name__
+
+    @wraps(fn)
+    def _stage(*args: Any, **kwargs: Any) -> Any:
+        profiler = getattr(_active, "profiler", None)
+        if profiler is None:
+            return fn(*args, **kwargs)
+        return profiler._call(name, fn, args, kwargs)
+
+    return _stage  # type: ignore
+
+
+def _rows(value: Any) -> Optional[int]:
+    # Boolean masks, dataframes, arrays, dicts of columns and tuples of columns
+    if isinstance(value, (np.ndarray, pd.Series)) and value.dtype == bool:
+        return int(value.sum())
+    if isinstance(value, dict):
+        value = next(iter(value.values()), None)
+    elif isinstance(value, tuple):
+        value = value[0] if value else None
+    try:
+        return len(value)
+    except TypeError:
+        return None
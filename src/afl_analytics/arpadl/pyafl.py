@@ -5,16 +5,27 @@ import numpy as np
 import pandas as pd  # type: ignore
 from pandera.typing import DataFrame
 
-from .schema import ARPADLSchema
+from . import config as arpadlconfig
+from .profiling import stage
+from .schema import ARPADLSchema, validate_actions
+from .utils import encode_categories
 
-def convert_to_actions(chains: pd.DataFrame) -> DataFrame[ARPADLSchema]:
+@stage
+def convert_to_actions(chains: pd.DataFrame, categorical: bool = False, validation: str = "full") -> DataFrame[ARPADLSchema]:
     """
     Convert PyAFL events to ARPADL actions.
 
     Parameters
     ----------
     chains : pd.DataFrame
-        DataFrame containing AFL API Match Chains from a single game.
+        DataFrame containing AFL API Match Chains from one or more games.
+    categorical : bool, default=False
+        Whether to return the 'action_type', 'bodypart', 'result', 'team' and
+        'player' columns as categoricals instead of strings.
+    validation : str, default='full'
+        How thoroughly the actions are validated against the ARPADL schema:
+        'full', 'dtype', 'sample' or 'off'. See
+        :func:`~afl_analytics.arpadl.schema.validate_actions`.
 
     Returns
     -------
@@ -23,45 +34,72 @@ def convert_to_actions(chains: pd.DataFrame) -> DataFrame[ARPADLSchema]:
 
     """
     
-    actions = chains.copy()
-
-    actions["match_id"] = actions['Match_ID']
-    actions["period_id"] = actions['Period_Number']
-    actions["team"] = actions['Team']
-    actions["player"] = actions['Player']    
-    actions['time_seconds'] = _create_time_seconds(actions)
-    actions['action_type'] = _create_action_type(actions)
-    actions['bodypart'] = _create_bodypart(actions)
-    actions['result'] = _create_result(actions)
-    actions['start_x'], actions['start_y'] = _create_start_location(actions)
-
-    actions = _filter_action_type(actions)
-    actions = _remove_missing_players(actions)
-
-    actions['end_x'], actions['end_y'] = _create_end_location(actions)
-    actions = _remove_duplicate_actions(actions)
-
-    actions = _filter_arpadl_columns(actions)
-    actions = actions[~(actions.duplicated())]
-
-    actions = _add_carries(actions)
-
-    actions = actions.sort_values(by = ['match_id', 'period_id', 'time_seconds'], ascending = True)
+    actions = _convert_chains({col: chains[col].to_numpy() for col in _chain_columns})
+    actions = pd.DataFrame(_add_names(actions))
+    actions = validate_actions(actions, ARPADLSchema, validation)
+    
+    if categorical:
+        actions = encode_categories(actions)
         
-    return ARPADLSchema.validate(actions)
+    return actions
 
-def _remove_missing_players(chains):
+_chain_columns: list[str] = [
+    'Match_ID',
+    'Period_Number',
+    'Period_Duration',
+    'Team',
+    'Player',
+    'Description',
+    'Shot_At_Goal',
+    'Disposal',
+    'Final_State',
+    'Home_Team_Direction_Q1',
+    'Team_Chain',
+    'Home_Team',
+    'Away_Team',
+    'x',
+    'y'
+]
+
+_actiontype_ids = {name: type_id for type_id, name in enumerate(arpadlconfig.actiontypes)}
+_bodypart_ids = {name: bodypart_id for bodypart_id, name in enumerate(arpadlconfig.bodyparts)}
+_result_ids = {name: result_id for result_id, name in enumerate(arpadlconfig.results)}
+
+def _convert_chains(chains):
     
-    chains = chains[~chains['Player'].isna()]
+    # Period lengths need every chain row, everything else only the rows that become actions
+    time_seconds = _create_time_seconds(chains)
+    action_type = _create_action_type(chains)
+    
+    keep = _filter_actions(chains, action_type)
+    chains = {col: values[keep] for col, values in chains.items()}
+
+    actions = {}
+    actions["match_id"] = chains['Match_ID']
+    actions["period_id"] = chains['Period_Number']
+    actions['time_seconds'] = time_seconds[keep]
+    actions["team"] = chains['Team']
+    actions["player"] = chains['Player']
+    actions['start_x'], actions['start_y'] = _create_start_location(chains)
+    actions['action_type'] = action_type[keep]
+    actions['end_x'], actions['end_y'] = _create_end_location(actions)
+    actions['bodypart'] = _create_bodypart(actions)
+    actions['result'] = _create_result(chains, actions)
     
-    return chains
+    # One keep-mask for mirrored and repeated actions; repeats are found by hashing the ARPADL columns only
+    keep = _remove_duplicate_actions(chains, actions)
+    keep[keep] = ~_duplicated({col: values[keep] for col, values in actions.items()})
+    actions = {col: values[keep] for col, values in actions.items()}
 
-def _filter_action_type(chains):
+    return _add_carries(actions)
+
+@stage
+def _filter_actions(chains, action_type):
     
-    chains = chains[chains['action_type'] != 'non_action']
-    chains = chains[~chains['action_type'].isna()]
+    is_action = (action_type >= 0) & (action_type != _actiontype_ids['non_action'])
+    has_player = ~pd.isna(chains['Player'])
     
-    return chains
+    return is_action & has_player
 
 description_to_action_mapping = {
     'Kick':'kick',
@@ -104,148 +142,198 @@ description_to_action_mapping = {
     'Free For: Off The Ball':'free_off_ball'
 }
 
+@stage
 def _create_action_type(chains):
     
-    action_type = chains['Description'].map(description_to_action_mapping)
-    action_type = np.where((chains['Shot_At_Goal']=="TRUE") | (chains['Shot_At_Goal'] == True), 'shot', action_type)
+    # Map each distinct description once and look the ids up by position
+    codes, descriptions = pd.factorize(chains['Description'])
+    type_ids = np.array(
+        [_actiontype_ids.get(description_to_action_mapping.get(d), -1) for d in descriptions] + [-1],
+        dtype=np.int8,
+    )
+    action_type = type_ids[codes]
+    
+    shot = (chains['Shot_At_Goal'] == "TRUE") | (chains['Shot_At_Goal'] == True)
+    action_type[shot] = _actiontype_ids['shot']
       
     return action_type
 
+@stage
 def _create_time_seconds(chains):
-    max_quarter_durations = chains.groupby(['Match_ID', "Period_Number"])['Period_Duration'].max().reset_index()
-    max_quarter_durations = max_quarter_durations.rename(columns = {'Period_Duration':'Period_Duration_Max'})
-    max_quarter_durations = max_quarter_durations.pivot(index = 'Match_ID', columns='Period_Number', values='Period_Duration_Max')
-    chains = chains.merge(max_quarter_durations, how='left', on = ['Match_ID'])
-    time_seconds = np.where(chains['Period_Number'] == 1, chains['Period_Duration'],
-                                np.where(chains['Period_Number'] == 2, chains[1] + chains['Period_Duration'],
-                                        np.where(chains['Period_Number'] == 3, chains[1] + chains[2] + chains['Period_Duration'],
-                                                    np.where(chains['Period_Number'] == 4, chains[1] + chains[2] + chains[3] + chains['Period_Duration'],
-                                                            0))))
+    
+    # Seconds since the start of the match, adding the longest recorded duration of each earlier period
+    match_codes, match_ids = pd.factorize(chains['Match_ID'])
+    period = chains['Period_Number']
+    duration = chains['Period_Duration'].astype(float)
+    in_match = (match_codes >= 0) & np.isin(period, [1, 2, 3, 4])
+    
+    max_duration = np.full((len(match_ids), 5), np.nan)
+    np.fmax.at(max_duration, (match_codes[in_match], period[in_match].astype(int)), duration[in_match])
+    period_start = _period_starts(max_duration)
+    
+    time_seconds = np.zeros(len(duration))
+    time_seconds[in_match] = period_start[match_codes[in_match], period[in_match].astype(int)] + duration[in_match]
     
     return time_seconds
 
-def _create_result(actions):
+def _period_starts(max_duration):
+    
+    # Period p starts after the longest recorded duration of periods 1 to p-1
+    period_start = np.zeros_like(max_duration)
+    period_start[..., 2:] = np.cumsum(max_duration[..., 1:4], axis=-1)
     
-    result = ['success']*len(actions)
+    return period_start
+
+@stage
+def _create_result(chains, actions):
+    
+    action_type = actions['action_type']
+    result = np.full(len(action_type), _result_ids['success'], dtype=np.int8)
         
-    result = np.where(actions['Disposal'] == 'effective', 'success', result)
-    result = np.where(actions['Disposal'] == 'ineffective', 'fail', result)
-    result = np.where(actions['Disposal'] == 'clanger', 'fail', result)
-    
-    shot_goal = (actions['action_type'] == "shot") & (actions['Final_State'] == "goal")
-    shot_behind = (actions['action_type'] == "shot") & (actions['Final_State'] == "behind")
-    shot_not_goal_behind = (actions['action_type'] == "shot") & ((actions['Final_State'] != "goal") | (actions['Final_State'] != "behind"))
-    result = np.where(shot_goal, "goal",
-                      np.where(shot_behind, "behind", 
-                               np.where(shot_not_goal_behind, "miss", 
-                                        result)))
-
-    result = np.where(actions['action_type'] == 'bounce', 'success', result)
-    result = np.where(actions['action_type'] == 'error', 'fail', result)
-    result = np.where(actions['action_type'] == 'mark_dropped', 'fail', result)
-    result = np.where(actions['action_type'] == 'mark_fumbled', 'fail', result)
-    result = np.where(actions['action_type'] == 'non_action', 'non_action', result)
+    result[chains['Disposal'] == 'ineffective'] = _result_ids['fail']
+    result[chains['Disposal'] == 'clanger'] = _result_ids['fail']
+    
+    shot = action_type == _actiontype_ids['shot']
+    result[shot] = np.where(chains['Final_State'][shot] == "goal", _result_ids['goal'],
+                            np.where(chains['Final_State'][shot] == "behind", _result_ids['behind'],
+                                     _result_ids['miss']))
+
+    result[action_type == _actiontype_ids['bounce']] = _result_ids['success']
+    failed = np.isin(action_type, [_actiontype_ids[t] for t in ['error', 'mark_dropped', 'mark_fumbled']])
+    result[failed] = _result_ids['fail']
 
     return result
 
+@stage
 def _create_bodypart(actions):
     
-    body_part = np.where(actions['action_type'].isin(['kick', 'kickin', 'shot']), 'foot', 'hand')
-    body_part = np.where(actions['action_type'] == 'non_action', 'non_action', body_part)
+    foot = np.isin(actions['action_type'], [_actiontype_ids[t] for t in ['kick', 'kickin', 'shot']])
     
-    return body_part
+    return np.where(foot, _bodypart_ids['foot'], _bodypart_ids['hand']).astype(np.int8)
 
+@stage
 def _create_start_location(chains):
     
     # Create raw pitch x, y locations (current x, y locations try to always go left to right for both teams)
-    start_x = np.where((chains['Home_Team_Direction_Q1'] == "right") & (chains['Team_Chain'] == chains['Away_Team']), 
-                                -1*chains['x'],
-                                np.where((chains['Home_Team_Direction_Q1'] == "left") & (chains['Team_Chain'] == chains['Home_Team']), 
-                                        -1*chains['x'], 
-                                        chains['x']))
-    start_y = np.where((chains['Home_Team_Direction_Q1'] == "right") & (chains['Team_Chain'] == chains['Away_Team']), 
-                                -1*chains['y'],
-                                np.where((chains['Home_Team_Direction_Q1'] == "left") & (chains['Team_Chain'] == chains['Home_Team']), 
-                                        -1*chains['y'], 
-                                        chains['y']))
+    flip = (
+        ((chains['Home_Team_Direction_Q1'] == "right") & (chains['Team_Chain'] == chains['Away_Team']))
+        | ((chains['Home_Team_Direction_Q1'] == "left") & (chains['Team_Chain'] == chains['Home_Team']))
+    )
+    start_x = np.where(flip, -1*chains['x'], chains['x'])
+    start_y = np.where(flip, -1*chains['y'], chains['y'])
     
     return start_x, start_y
 
-def _create_end_location(chains):
+def _same_period_as_next(actions):
+    
+    same_period = np.zeros(len(actions['period_id']), dtype=bool)
+    same_period[:-1] = (actions['match_id'][1:] == actions['match_id'][:-1]) & (actions['period_id'][1:] == actions['period_id'][:-1])
+    
+    return same_period
+
+def _next(values):
+    
+    return np.append(values[1:], np.nan)
+
+@stage
+def _create_end_location(actions):
+    
+    # Disposals end where the next action starts, unless that action is in another match or period
+    disposal = np.isin(actions['action_type'], [_actiontype_ids['kick'], _actiontype_ids['handball']])
+    disposal &= _same_period_as_next(actions)
         
-    end_x = np.where(chains['action_type'].isin(['kick', 'handball']), chains['start_x'].shift(-1), chains['start_x'])
-    end_y = np.where(chains['action_type'].isin(['kick', 'handball']), chains['start_y'].shift(-1), chains['start_y'])
+    end_x = np.where(disposal, _next(actions['start_x']), actions['start_x'])
+    end_y = np.where(disposal, _next(actions['start_y']), actions['start_y'])
     
-    end_x = np.where(np.isnan(end_x), chains['start_x'], end_x)
-    end_y = np.where(np.isnan(end_y), chains['start_y'], end_y)
+    end_x = np.where(np.isnan(end_x), actions['start_x'], end_x)
+    end_y = np.where(np.isnan(end_y), actions['start_y'], end_y)
     
     return end_x, end_y
 
-def _remove_duplicate_actions(actions):
-
-    actions = actions[~((actions['start_x'] == -1*actions['end_x']) & (actions['start_y'] == -1*actions['end_y']) & (actions['Team_Chain'] != actions['Team']))]
+@stage
+def _remove_duplicate_actions(chains, actions):
 
-    return actions
+    mirrored = (actions['start_x'] == -1*actions['end_x']) & (actions['start_y'] == -1*actions['end_y'])
+    
+    return ~(mirrored & (chains['Team_Chain'] != chains['Team']))
 
-def _filter_arpadl_columns(actions):
+@stage
+def _duplicated(actions):
     
-    return actions[list(ARPADLSchema.to_schema().columns.keys())]
+    return pd.DataFrame(actions).duplicated().to_numpy()
 
 min_carry_length: float = 3
 min_carry_time: float = 2
 
-def _add_carries(actions):
-                
-    next_actions = actions.shift(-1, fill_value=0)
-    same_team = actions['team'] == next_actions['team']
-    same_period = actions['period_id'] == next_actions['period_id']
+_carry_after: list[str] = [
+    'gather',
+    'gather_from_hitout',
+    'gather_from_opposition',
+    'loose_ball_get',
+    'hard_ball_get',
+    'kickin_play_on'
+]
 
-    dx = actions['end_x'] - next_actions['start_x']
-    dy = actions['end_y'] - next_actions['start_y']
+def _create_carries(actions):
+    
+    # Carries fill the gap between a possession-gaining action and the next action by the same team
+    same_team = np.zeros(len(actions['team']), dtype=bool)
+    same_team[:-1] = actions['team'][1:] == actions['team'][:-1]
+    same_period = _same_period_as_next(actions)
+
+    dx = actions['end_x'] - _next(actions['start_x'])
+    dy = actions['end_y'] - _next(actions['start_y'])
     far_enough = dx**2 + dy**2 >= min_carry_length**2
-    dt = next_actions['time_seconds'] - actions['time_seconds']
+    dt = _next(actions['time_seconds']) - actions['time_seconds']
     long_enough = dt >= min_carry_time
 
-    curr_gather = (actions['action_type'] == 'gather')
-    curr_gather_from_hitout = (actions['action_type'] == 'gather_from_hitout')
-    curr_gather_from_opposition = (actions['action_type'] == 'gather_from_opposition')
-    curr_gather = (actions['action_type'] == 'gather')
-    curr_hard_ball_get = (actions['action_type'] == 'hard_ball_get')
-    curr_loose_ball_get = (actions['action_type'] == 'loose_ball_get')
-    curr_kickin_playon = (actions['action_type'] == 'kickin_play_on')
-
-    carry_idx = (
-        same_team
-        & same_period
-        & far_enough
-        & long_enough
-        & (
-            curr_gather | 
-            curr_gather_from_hitout | 
-            curr_gather_from_opposition |
-            curr_loose_ball_get | 
-            curr_hard_ball_get | 
-            curr_kickin_playon)
-    )
+    gain_possession = np.isin(actions['action_type'], [_actiontype_ids[t] for t in _carry_after])
 
-    carries = pd.DataFrame()
-    prev = actions[carry_idx]
-    nex = next_actions[carry_idx]
-    carries["match_id"] = nex['match_id']
-    carries["period_id"] = nex['period_id']
-    carries["time_seconds"] = (prev["time_seconds"] + nex["time_seconds"]) / 2
-
-    carries["team"] = nex['team']
-    carries["player"] = nex['player']
-    carries["start_x"] = prev['end_x']
-    carries["start_y"] = prev['end_y']
-    carries["end_x"] = nex['start_x']
-    carries["end_y"] = nex['start_y']
-    carries["bodypart"] = 'hand'
-    carries["action_type"] = 'carry'
-    carries["result"] = 'success'
-
-    actions = pd.concat([actions, carries], ignore_index=True, sort=False)
-    actions = actions.sort_values(["match_id", "period_id", 'time_seconds']).reset_index(drop=True)
+    prev = np.flatnonzero(same_team & same_period & far_enough & long_enough & gain_possession)
+    nex = prev + 1
+    
+    carries = {}
+    carries["match_id"] = actions['match_id'][nex]
+    carries["period_id"] = actions['period_id'][nex]
+    carries["time_seconds"] = (actions["time_seconds"][prev] + actions["time_seconds"][nex]) / 2
+
+    carries["team"] = actions['team'][nex]
+    carries["player"] = actions['player'][nex]
+    carries["start_x"] = actions['end_x'][prev]
+    carries["start_y"] = actions['end_y'][prev]
+    carries["end_x"] = actions['start_x'][nex]
+    carries["end_y"] = actions['start_y'][nex]
+    carries["action_type"] = np.full(len(prev), _actiontype_ids['carry'], dtype=np.int8)
+    carries["bodypart"] = np.full(len(prev), _bodypart_ids['hand'], dtype=np.int8)
+    carries["result"] = np.full(len(prev), _result_ids['success'], dtype=np.int8)
+    
+    return prev, carries
+
+@stage
+def _add_carries(actions):
+    
+    _, carries = _create_carries(actions)
+    actions = {col: _concatenate([values, carries[col]]) for col, values in actions.items()}
+    
+    # Stable sort, so carries follow any action at the same time
+    match_order = pd.factorize(actions['match_id'], sort=True)[0]
+    order = np.lexsort((actions['time_seconds'], actions['period_id'], match_order))
                 
-    return actions
+    return {col: values[order] for col, values in actions.items()}
+
+def _concatenate(arrays):
+    
+    # Keep categorical columns, such as those of Arrow dictionaries, categorical
+    if isinstance(arrays[0], pd.Categorical):
+        return pd.Categorical.from_codes(np.concatenate([a.codes for a in arrays]), dtype=arrays[0].dtype)
+    
+    return np.concatenate(arrays)
+
+@stage
+def _add_names(actions):
+    
+    actions['action_type'] = np.asarray(arpadlconfig.actiontypes, dtype=object)[actions['action_type']]
+    actions['bodypart'] = np.asarray(arpadlconfig.bodyparts, dtype=object)[actions['bodypart']]
+    actions['result'] = np.asarray(arpadlconfig.results, dtype=object)[actions['result']]
+    
+    return {col: actions[col] for col in ARPADLSchema.to_schema().columns.keys()}
@@ -2,10 +2,14 @@
 
 from typing import Any, Optional
 
+import numpy as np
+import pandas as pd  # type: ignore
 import pandera as pa
+from pandera.engines import pandas_engine
 from pandera.typing import Series
 
 from . import config as arpadlconfig
+from .profiling import stage
 
 
 class ARPADLSchema(pa.DataFrameModel):
@@ -26,4 +30,108 @@ class ARPADLSchema(pa.DataFrameModel):
 
     class Config:  # noqa: D106
         strict = True
-        coerce = True
\ No newline at end of file
+        coerce = True
+
+
+validation_modes: list[str] = ["full", "dtype", "sample", "off"]
+
+
+@stage
+def validate_actions(
+    actions: pd.DataFrame,
+    schema: type[pa.DataFrameModel] = ARPADLSchema,
+    validation: str = "full",
+    sample_frac: float = 0.1,
+    random_state: Optional[int] = None,
+) -> pd.DataFrame:
+    """Validate a dataframe of actions against a schema.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions to validate.
+    schema : type, default=ARPADLSchema
+        The schema the actions should satisfy.
+    validation : str, default='full'
+        How thoroughly the actions are validated:
+
+        - 'full': coerce the dtypes and run every check on every row.
+        - 'dtype': only check the columns, their dtypes and the categories of
+          categorical columns, independent of the number of rows.
+        - 'sample': do the 'dtype' validation and run every check on a
+          random sample of the rows.
+        - 'off': do not validate.
+    sample_frac : float, default=0.1
+        The fraction of rows checked by 'sample' validation.
+    random_state : int, optional
+        Seed used to draw the rows checked by 'sample' validation.
+
+    Raises
+    ------
+    ValueError
+        If the validation mode is not supported.
+
+    Returns
+    -------
+    pd.DataFrame
+        The validated actions. Only 'full' validation coerces the dtypes;
+        categorical columns stay categorical in every mode.
+    """
+    if validation == "full":
+        validated = schema.validate(actions)
+        # Coercing turns the categorical columns into strings; keep those of the input
+        categorical = [col for col, dtype in actions.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+        return validated.assign(**{col: actions[col] for col in categorical}) if categorical else validated
+    if validation == "dtype":
+        _validate_structure(actions, schema)
+    elif validation == "sample":
+        _validate_structure(actions, schema)
+        schema.validate(actions.sample(frac=sample_frac, random_state=random_state))
+    elif validation != "off":
+        raise ValueError(f"A {validation} validation is not supported")
+    return actions
+
+
+def _validate_structure(actions: pd.DataFrame, schema: type[pa.DataFrameModel]) -> None:
+    dataframe_schema = schema.to_schema()
+
+    missing = [
+        name
+        for name, column in dataframe_schema.columns.items()
+        if column.required and name not in actions.columns
+    ]
+    extra = [name for name in actions.columns if name not in dataframe_schema.columns]
+    if missing or (dataframe_schema.strict and extra):
+        raise pa.errors.SchemaError(
+            dataframe_schema, actions, f"columns missing: {missing}, columns not in schema: {extra}"
+        )
+
+    for name, column in dataframe_schema.columns.items():
+        if name not in actions.columns:
+            continue
+        dtype = actions[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            _validate_categories(dataframe_schema, column, actions[name])
+        elif column.dtype is not None and not column.dtype.check(pandas_engine.Engine.dtype(dtype)):
+            raise pa.errors.SchemaError(
+                dataframe_schema,
+                actions,
+                f"expected column '{name}' to have type {column.dtype}, got {dtype}",
+            )
+
+
+def _validate_categories(
+    dataframe_schema: pa.DataFrameSchema, column: pa.Column, values: pd.Series
+) -> None:
+    # Compare the categories instead of every row; the codes point into them
+    for check in column.checks:
+        if check.name == "isin":
+            allowed = check.statistics["allowed_values"]
+            invalid = ~np.isin(values.cat.categories, list(allowed))
+            if invalid.any():
+                raise pa.errors.SchemaError(
+                    dataframe_schema,
+                    values,
+                    f"column '{column.name}' has categories "
+                    f"{list(values.cat.categories[invalid])} not in {list(allowed)}",
+                )
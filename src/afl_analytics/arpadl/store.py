@@ -0,0 +1,232 @@
+"""Local Parquet store for ARPADL and Atomic-ARPADL actions.
+
+The actions of each match are written to their own Parquet file in a
+directory partitioned by competition, season and round::
+
+    root/competition=AFL/season=2022/round=28/AFL_2022_F4_Geelong_Sydney.parquet
+
+The schema of the first write is kept in ``root/_common_metadata`` and is the
+schema of every read, whichever files are stored. Reads only open the
+partitions and columns they need, and memory-map the files.
+"""
+
+import os
+from typing import Any, Optional, Union
+
+import pandas as pd  # type: ignore
+
+from afl_analytics.diskcache import write_atomically
+from afl_analytics.utils import (
+    get_competition_from_match_id,
+    get_round_from_match_id,
+    get_season_from_match_id,
+)
+
+from .arrow import _is_string, actions_to_pandas
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore
+
+partition_columns: list[str] = ["competition", "season", "round"]
+
+_schema_file: str = "_common_metadata"
+
+
+class ActionStore:
+    """
+    A local store of actions, partitioned by competition, season and round.
+
+    Parameters
+    ----------
+    root : str
+        The directory of the store. It is created on the first write.
+    """
+
+    def __init__(self, root: str) -> None:
+        if pa is None:
+            raise ImportError("pyarrow is not installed.")
+        self.root = root
+
+    def write(self, actions: Union[pd.DataFrame, "pa.Table"]) -> list[str]:
+        """
+        Write the actions of one or more matches to the store.
+
+        The stored actions of each match in `actions` are replaced; other
+        matches in the same partition are kept. The schema of the first write
+        is stored as the schema of the store.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame or pa.Table
+            ARPADL or Atomic-ARPADL actions.
+
+        Raises
+        ------
+        ValueError
+            If the round of a match cannot be derived from its 'match_id'.
+
+        Returns
+        -------
+        list(str)
+            The paths of the files that were written.
+        """
+        if isinstance(actions, pd.DataFrame):
+            actions = pa.Table.from_pandas(actions, preserve_index=False)
+
+        schema_path = os.path.join(self.root, _schema_file)
+        if not os.path.exists(schema_path):
+            os.makedirs(self.root, exist_ok=True)
+            write_atomically(schema_path, lambda hidden: pq.write_metadata(actions.schema, hidden))
+
+        match_ids = actions.column("match_id").cast(pa.string())
+        paths = []
+        for match_id in pc.unique(match_ids).to_pylist():
+            match_actions = actions.filter(pc.equal(match_ids, match_id))
+            path = self.path(match_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomically(path, lambda hidden: pq.write_table(match_actions, hidden))
+            paths.append(path)
+        return paths
+
+    def path(self, match_id: str) -> str:
+        """
+        Return the file in which the actions of a match are stored.
+
+        Parameters
+        ----------
+        match_id : str
+            The ID of the match.
+
+        Raises
+        ------
+        ValueError
+            If the round of the match cannot be derived from `match_id`.
+
+        Returns
+        -------
+        str
+            The path of the Parquet file.
+        """
+        round_id = get_round_from_match_id(match_id)
+        if round_id is None:
+            raise ValueError(f"The round of {match_id} is unknown")
+        return os.path.join(
+            self.root,
+            f"competition={get_competition_from_match_id(match_id)}",
+            f"season={get_season_from_match_id(match_id)}",
+            f"round={round_id}",
+            f"{match_id}.parquet",
+        )
+
+    def read_table(
+        self,
+        columns: Optional[list[str]] = None,
+        competition: Optional[str] = None,
+        season: Optional[Union[int, list[int]]] = None,
+        round: Optional[Union[int, list[int]]] = None,
+        match_id: Optional[Union[str, list[str]]] = None,
+        filter: Optional["ds.Expression"] = None,
+    ) -> "pa.Table":
+        """
+        Read stored actions as an Arrow table.
+
+        Partitions that do not match the competition, season and round are
+        skipped without being opened, and the other filters are pushed down
+        to the Parquet row groups. Only the requested columns are read.
+
+        Parameters
+        ----------
+        columns : list(str), optional
+            The columns to read. Reads all action columns if None.
+        competition : str, optional
+            Only read this competition.
+        season : int or list(int), optional
+            Only read these seasons.
+        round : int or list(int), optional
+            Only read these rounds.
+        match_id : str or list(str), optional
+            Only read these matches.
+        filter : pyarrow.dataset.Expression, optional
+            An additional filter on the action columns.
+
+        Returns
+        -------
+        pa.Table
+            The actions, with dictionary-encoded string columns.
+        """
+        conditions = [
+            (name, value)
+            for name, value in [
+                ("competition", competition),
+                ("season", season),
+                ("round", round),
+                ("match_id", match_id),
+            ]
+            if value is not None
+        ]
+        expression = filter
+        for name, value in conditions:
+            values = value if isinstance(value, list) else [value]
+            condition = ds.field(name).isin(values)
+            expression = condition if expression is None else expression & condition
+
+        dataset = self._dataset()
+        if columns is None:
+            columns = [c for c in dataset.schema.names if c not in partition_columns]
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def read(
+        self, columns: Optional[list[str]] = None, categorical: bool = False, **filters: Any
+    ) -> pd.DataFrame:
+        """
+        Read stored actions as a dataframe.
+
+        Parameters
+        ----------
+        columns : list(str), optional
+            The columns to read. Reads all action columns if None.
+        categorical : bool, default=False
+            Whether to return the string columns as categoricals.
+        **filters
+            The 'competition', 'season', 'round', 'match_id' and 'filter'
+            arguments of :meth:`read_table`.
+
+        Returns
+        -------
+        pd.DataFrame
+            The actions.
+        """
+        return actions_to_pandas(self.read_table(columns, **filters), categorical=categorical)
+
+    def _dataset(self) -> "ds.Dataset":
+        schema_path = os.path.join(self.root, _schema_file)
+        if not os.path.exists(schema_path):
+            raise FileNotFoundError(f"No actions are stored in {self.root}")
+
+        # Read strings as dictionaries, so they are never decoded to Python strings
+        schema = pq.read_schema(schema_path)
+        string_columns = [field.name for field in schema if _is_string(field.type)]
+        file_format = ds.ParquetFileFormat(
+            read_options=ds.ParquetReadOptions(dictionary_columns=string_columns)
+        )
+        fields = [
+            pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if field.name in string_columns else field
+            for field in schema
+        ]
+        partitioning = ds.partitioning(
+            pa.schema([("competition", pa.string()), ("season", pa.int32()), ("round", pa.int32())]),
+            flavor="hive",
+        )
+        return ds.dataset(
+            self.root,
+            schema=pa.schema(fields + list(partitioning.schema), metadata=schema.metadata),
+            format=file_format,
+            partitioning=partitioning,
+            filesystem=pafs.LocalFileSystem(use_mmap=True),
+        )
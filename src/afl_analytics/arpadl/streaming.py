@@ -0,0 +1,223 @@
+"""Incremental conversion of in-play PyAFL event stream data to ARPADL actions."""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+from .pyafl import (
+    _add_names,
+    _chain_columns,
+    _create_action_type,
+    _create_bodypart,
+    _create_carries,
+    _create_end_location,
+    _create_result,
+    _create_start_location,
+    _filter_actions,
+    _period_starts,
+    _remove_duplicate_actions,
+)
+from .schema import ARPADLSchema, validate_actions
+from .utils import encode_categories
+
+
+class StreamingConverter:
+    """
+    Convert the chains of matches in play to ARPADL actions, chunk by chunk.
+
+    Each call to :meth:`update` converts only the chains that arrived since
+    the previous call and returns the actions that can no longer change. The
+    last action of each match is held back until the next action arrives,
+    because its end location and a possible carry depend on that action.
+    :meth:`flush` releases the held back actions once a match is over.
+
+    Concatenating the output of every call for a match gives the same
+    actions as :func:`~afl_analytics.arpadl.pyafl.convert_to_actions` on all
+    of its chains, as long as the chains of a match arrive in time order.
+    The work per chunk only depends on the size of the chunk.
+
+    Parameters
+    ----------
+    categorical : bool, default=False
+        Whether to return the 'action_type', 'bodypart', 'result', 'team' and
+        'player' columns as categoricals instead of strings.
+    validation : str, default='full'
+        How thoroughly the actions are validated against the ARPADL schema:
+        'full', 'dtype', 'sample' or 'off'.
+    """
+
+    def __init__(self, categorical: bool = False, validation: str = "full") -> None:
+        self.categorical = categorical
+        self.validation = validation
+        self._matches: dict[str, _MatchState] = {}
+
+    def update(self, chains: pd.DataFrame) -> DataFrame[ARPADLSchema]:
+        """
+        Convert newly arrived chains and return the finalised actions.
+
+        Parameters
+        ----------
+        chains : pd.DataFrame
+            The AFL API Match Chains that arrived since the previous call, from
+            one or more matches.
+
+        Returns
+        -------
+        actions : pd.DataFrame
+            The ARPADL actions that were finalised by these chains.
+        """
+        columns = {col: chains[col].to_numpy() for col in _chain_columns}
+        match_codes, match_ids = pd.factorize(columns['Match_ID'])
+
+        converted = []
+        for match_code, match_id in enumerate(match_ids):
+            rows = np.flatnonzero(match_codes == match_code)
+            state = self._matches.setdefault(match_id, _MatchState())
+            converted.append(state.update({col: values[rows] for col, values in columns.items()}))
+        return self._to_frame(converted)
+
+    def flush(self, match_id: Optional[str] = None) -> DataFrame[ARPADLSchema]:
+        """
+        Return the held back actions of finished matches and forget their state.
+
+        Parameters
+        ----------
+        match_id : str, optional
+            The match that finished. Flushes every match if None.
+
+        Returns
+        -------
+        actions : pd.DataFrame
+            The last ARPADL actions of the flushed matches.
+        """
+        match_ids = list(self._matches) if match_id is None else [match_id]
+        return self._to_frame([self._matches.pop(m).flush() for m in match_ids if m in self._matches])
+
+    def _to_frame(self, converted: list[Optional[dict[str, np.ndarray]]]) -> DataFrame[ARPADLSchema]:
+        converted = [actions for actions in converted if actions is not None]
+        if converted:
+            actions = {
+                col: np.concatenate([match_actions[col] for match_actions in converted])
+                for col in converted[0]
+            }
+        else:
+            actions = {col: np.array([], dtype=object) for col in _action_columns}
+            actions.update({col: np.array([]) for col in _float_columns})
+            actions.update({col: np.array([], dtype=np.int8) for col in _coded_columns})
+            actions['period_id'] = np.array([], dtype=np.int64)
+        actions = pd.DataFrame(_add_names(actions))
+        actions = validate_actions(actions, ARPADLSchema, self.validation)
+        if self.categorical:
+            actions = encode_categories(actions)
+        return actions
+
+
+_action_columns: list[str] = ['match_id', 'team', 'player']
+_float_columns: list[str] = ['time_seconds', 'start_x', 'start_y', 'end_x', 'end_y']
+_coded_columns: list[str] = ['action_type', 'bodypart', 'result']
+
+
+class _MatchState:
+    """The part of a match that later chains can still change."""
+
+    def __init__(self) -> None:
+        # Longest duration seen in each period, indexed by period number
+        self.max_duration = np.full(5, np.nan)
+        # The last action, waiting for the next action to set its end location
+        self.open_action: Optional[dict[str, np.ndarray]] = None
+        # The last deduplicated action, waiting for the next action to decide on a carry
+        self.last_action: Optional[dict[str, np.ndarray]] = None
+        self.seen: set[tuple] = set()
+
+    def update(self, chains: dict[str, np.ndarray]) -> Optional[dict[str, np.ndarray]]:
+        period = chains['Period_Number']
+        duration = chains['Period_Duration'].astype(float)
+        in_match = np.isin(period, [1, 2, 3, 4])
+        np.fmax.at(self.max_duration, period[in_match].astype(int), duration[in_match])
+
+        action_type = _create_action_type(chains)
+        keep = _filter_actions(chains, action_type)
+        chains = {col: values[keep] for col, values in chains.items()}
+        in_match = in_match[keep]
+
+        time_seconds = np.zeros(len(in_match))
+        period_start = _period_starts(self.max_duration)
+        time_seconds[in_match] = period_start[period[keep][in_match].astype(int)] + duration[keep][in_match]
+
+        actions = {}
+        actions["match_id"] = chains['Match_ID']
+        actions["period_id"] = chains['Period_Number']
+        actions['time_seconds'] = time_seconds
+        actions["team"] = chains['Team']
+        actions["player"] = chains['Player']
+        actions['start_x'], actions['start_y'] = _create_start_location(chains)
+        actions['action_type'] = action_type[keep]
+        actions['bodypart'] = _create_bodypart(actions)
+        actions['result'] = _create_result(chains, actions)
+        actions['Team'] = chains['Team']
+        actions['Team_Chain'] = chains['Team_Chain']
+
+        actions = _concat(self.open_action, actions)
+        if actions is None or len(actions['match_id']) == 0:
+            return None
+        self.open_action = _take(actions, slice(-1, None))
+        return self._finalise(_take(actions, slice(None, -1)), _create_end_location(actions))
+
+    def flush(self) -> Optional[dict[str, np.ndarray]]:
+        actions = None
+        if self.open_action is not None:
+            actions = self._finalise(self.open_action, _create_end_location(self.open_action))
+        if self.last_action is None:
+            return actions
+        return _concat(actions, self.last_action)
+
+    def _finalise(
+        self, actions: dict[str, np.ndarray], end_location: tuple[np.ndarray, np.ndarray]
+    ) -> Optional[dict[str, np.ndarray]]:
+        n = len(actions['match_id'])
+        actions['end_x'], actions['end_y'] = end_location[0][:n], end_location[1][:n]
+
+        keep = _remove_duplicate_actions(actions, actions)
+        actions = {col: values[keep] for col, values in actions.items() if col not in ('Team', 'Team_Chain')}
+        keep = np.array([self._first_time_seen(key) for key in _row_keys(actions)], dtype=bool)
+        actions = _concat(self.last_action, _take(actions, keep))
+        if actions is None or len(actions['match_id']) == 0:
+            return None
+
+        # The carry after the last action depends on the action after it
+        self.last_action = _take(actions, slice(-1, None))
+        prev, carries = _create_carries(actions)
+        finalised = np.arange(len(actions['match_id']) - 1)
+        order = np.argsort(np.concatenate([2 * finalised, 2 * prev + 1]), kind='stable')
+        return {
+            col: np.concatenate([actions[col][finalised], carries[col]])[order]
+            for col in actions
+        }
+
+    def _first_time_seen(self, key: tuple) -> bool:
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+
+def _take(actions: dict[str, np.ndarray], rows) -> dict[str, np.ndarray]:
+    return {col: values[rows] for col, values in actions.items()}
+
+
+def _concat(
+    first: Optional[dict[str, np.ndarray]], second: Optional[dict[str, np.ndarray]]
+) -> Optional[dict[str, np.ndarray]]:
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return {col: np.concatenate([first[col], second[col]]) for col in first}
+
+
+def _row_keys(actions: dict[str, np.ndarray]) -> list[tuple]:
+    # Missing values compare equal, as in DataFrame.duplicated
+    columns = [[None if pd.isna(v) else v for v in values.tolist()] for values in actions.values()]
+    return list(zip(*columns))
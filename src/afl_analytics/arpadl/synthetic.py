@@ -0,0 +1,201 @@
+"""Synthetic AFL API Match Chains for offline tests and benchmarks.
+
+The chains follow the structure of the AFL API feed: possession chains that
+start with a stoppage or a loose ball, move the ball up the ground with kicks
+and handballs, and end in a shot at goal or a turnover. Every column that
+:func:`~afl_analytics.arpadl.pyafl.convert_to_actions` reads is filled in,
+and the fixture follows the round robin of an 18 team competition, so the
+generator scales from a single match to many seasons.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from afl_analytics.utils import round_map
+
+teams: list[str] = [
+    "Adelaide",
+    "Brisbane Lions",
+    "Carlton",
+    "Collingwood",
+    "Essendon",
+    "Fremantle",
+    "Geelong",
+    "Gold Coast",
+    "Greater Western Sydney",
+    "Hawthorn",
+    "Melbourne",
+    "North Melbourne",
+    "Port Adelaide",
+    "Richmond",
+    "St Kilda",
+    "Sydney",
+    "West Coast",
+    "Western Bulldogs",
+]
+
+matches_per_round: int = len(teams) // 2
+rounds_per_season: int = 24
+
+_stoppages: list[str] = ["Centre Bounce", "Ball Up Call"]
+_gains: list[str] = ["Gather From Hitout", "Hard Ball Get", "Loose Ball Get", "Gather", "Gather from Opposition"]
+_gain_p: list[float] = [0.2, 0.25, 0.3, 0.15, 0.1]
+_kick_receivals: list[str] = ["Uncontested Mark", "Contested Mark", "Mark On Lead", "Loose Ball Get", "Gather"]
+_kick_receival_p: list[float] = [0.4, 0.15, 0.1, 0.2, 0.15]
+_contests: list[str] = ["Spoil", "Knock On", "Mark Dropped", "No Pressure Error"]
+_non_actions: list[str] = ["Kick Into F50", "Out of Bounds", "Free Advantage"]
+
+
+def generate_chains(
+    n_matches: int = 1,
+    events_per_match: int = 1500,
+    first_season: int = 2023,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Generate synthetic AFL API Match Chains.
+
+    Parameters
+    ----------
+    n_matches : int, default=1
+        The number of matches. Matches fill the rounds of a season, nine to a
+        round and 24 rounds to a season, before moving on to the next season.
+    events_per_match : int, default=1500
+        The approximate number of chain rows of each match.
+    first_season : int, default=2023
+        The season of the first match.
+    seed : int, optional
+        Seed of the random generator, for reproducible chains.
+
+    Returns
+    -------
+    pd.DataFrame
+        The chains, ordered by match and time.
+    """
+    rng = np.random.default_rng(seed)
+    matches = [
+        _generate_match(rng, match, events_per_match, first_season) for match in range(n_matches)
+    ]
+    return pd.concat(matches, ignore_index=True)
+
+
+def _fixture(match: int, first_season: int) -> tuple[str, str, str]:
+    # Round robin by the circle method, so every team plays once per round
+    season, match = divmod(match, matches_per_round * rounds_per_season)
+    round_number, slot = divmod(match, matches_per_round)
+    rotation = round_number % (len(teams) - 1)
+    circle = teams[1:][rotation:] + teams[1:][:rotation]
+    order = [teams[0]] + circle
+    home, away = order[slot], order[-1 - slot]
+    if round_number % 2:
+        home, away = away, home
+
+    round_code = [code for code, number in round_map.items() if number == round_number + 1][0]
+    match_id = "_".join(
+        ["AFL", str(first_season + season), round_code, home.replace(" ", ""), away.replace(" ", "")]
+    )
+    return match_id, home, away
+
+
+def _generate_match(rng: np.random.Generator, match: int, n: int, first_season: int) -> pd.DataFrame:
+    match_id, home, away = _fixture(match, first_season)
+
+    # Possession chains, at least two events each
+    lengths = rng.geometric(1 / 7, size=n) + 1
+    lengths = lengths[: np.searchsorted(np.cumsum(lengths), n) + 1]
+    chain = np.repeat(np.arange(len(lengths)), lengths)
+    chain_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    position = np.arange(len(chain)) - chain_start
+    last = position == np.repeat(lengths, lengths) - 1
+    n = len(chain)
+
+    # Chains alternate between the teams after most turnovers
+    chain_team_is_home = np.cumsum(rng.random(len(lengths)) < 0.7) % 2 == 0
+    team_chain = np.where(chain_team_is_home, home, away)[chain].astype(object)
+    opposition = np.where(chain_team_is_home, away, home)[chain].astype(object)
+
+    # Four quarters of about 30 minutes, each chain staying in its quarter
+    period = np.repeat(1 + np.minimum(np.arange(len(lengths)) * 4 // len(lengths), 3), lengths)
+    gaps = rng.exponential(1800 / (n / 4), size=n)
+    period_start = np.flatnonzero(np.diff(period, prepend=0))
+    duration = np.cumsum(gaps)
+    duration -= np.repeat(duration[period_start] - gaps[period_start], np.diff(np.append(period_start, n)))
+    duration = np.round(duration)
+
+    # Disposals alternate with the receivals they lead to
+    disposal_type = np.where(rng.random(n) < 0.55, "Kick", "Handball").astype(object)
+    disposal_type[rng.random(n) < 0.03] = "Ground Kick"
+    previous = np.roll(disposal_type, 1)
+    receival = np.where(
+        previous == "Handball", "Handball Received", rng.choice(_kick_receivals, size=n, p=_kick_receival_p)
+    )
+    description = np.where(position % 2 == 1, disposal_type, receival).astype(object)
+    first = position == 0
+    description[first] = rng.choice(_gains, size=first.sum(), p=_gain_p)
+    stoppage = first & (rng.random(n) < 0.3)
+    description[stoppage] = rng.choice(_stoppages, size=stoppage.sum())
+    description[period_start] = "Centre Bounce"
+
+    # Contests and non-actions by either team
+    contest = ~first & (rng.random(n) < 0.05)
+    description[contest] = rng.choice(_contests, size=contest.sum())
+    by_opposition = contest & np.isin(description, ["Spoil", "Knock On"])
+    other = ~first & ~contest & (rng.random(n) < 0.04)
+    description[other] = rng.choice(_non_actions, size=other.sum())
+    free = ~first & (rng.random(n) < 0.01)
+    description[free] = rng.choice(["Free For", "Free For: In Possession", "Free For: Off The Ball"], size=free.sum())
+
+    # About half of the chains end in a shot at goal
+    shot_chain = rng.random(len(lengths)) < 0.45
+    shot = last & shot_chain[chain]
+    description[shot] = "Kick"
+    final_state = np.where(
+        shot_chain,
+        rng.choice(["goal", "behind", "rushed", "outOfBounds"], size=len(lengths), p=[0.48, 0.4, 0.06, 0.06]),
+        rng.choice(["turnover", "ballUpCall", "outOfBounds", "endQuarter"], size=len(lengths), p=[0.7, 0.15, 0.12, 0.03]),
+    )[chain].astype(object)
+
+    disposal = np.full(n, None, dtype=object)
+    disposes = np.isin(description, ["Kick", "Handball", "Ground Kick"])
+    disposal[disposes] = rng.choice(["effective", "ineffective", "clanger"], size=disposes.sum(), p=[0.7, 0.2, 0.1])
+
+    team = np.where(by_opposition, opposition, team_chain).astype(object)
+    numbers = rng.integers(1, 23, size=n)
+    player = np.array([f"{t} {number}" for t, number in zip(team, numbers)], dtype=object)
+    player[np.isin(description, _stoppages + ["Out of Bounds"])] = None
+
+    # The chain team moves the ball towards its goal; opposition events are mirrored
+    steps = np.where(first, 0, rng.normal(6, 12, size=n))
+    walk = np.cumsum(steps)
+    x = np.clip(rng.uniform(-70, 30, size=len(lengths))[chain] + walk - walk[chain_start], -80, 80)
+    x[shot] = np.clip(rng.normal(55, 10, size=shot.sum()), 20, 80)
+    y = np.clip(rng.normal(0, 25, size=n), -65, 65)
+    x[by_opposition], y[by_opposition] = -x[by_opposition], -y[by_opposition]
+
+    # The raw locations are in pitch coordinates, the converter flips them per team and quarter
+    direction = rng.choice(["left", "right"])
+    flip = (team_chain == home) == (direction == "left")
+    x = np.round(np.where(flip, -x, x), 1)
+    y = np.round(np.where(flip, -y, y), 1)
+
+    return pd.DataFrame(
+        {
+            "Match_ID": match_id,
+            "Period_Number": period,
+            "Period_Duration": duration,
+            "Team": team,
+            "Player": player,
+            "Description": description,
+            "Shot_At_Goal": shot,
+            "Disposal": disposal,
+            "Final_State": final_state,
+            "Home_Team_Direction_Q1": direction,
+            "Team_Chain": team_chain,
+            "Home_Team": home,
+            "Away_Team": away,
+            "x": x,
+            "y": y,
+        }
+    )
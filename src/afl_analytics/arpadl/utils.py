@@ -0,0 +1,89 @@
+"""Utility functions for working with ARPADL dataframes."""
+
+from typing import Optional
+
+import pandas as pd  # type: ignore
+
+from . import config as arpadlconfig
+from .profiling import stage
+
+_coded_columns: list[str] = ["action_type", "bodypart", "result", "team", "player"]
+
+
+@stage
+def encode_categories(
+    actions: pd.DataFrame, actiontypes: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """Convert the string columns of an ARPADL dataframe to categoricals.
+
+    The 'action_type', 'bodypart' and 'result' columns are encoded with the
+    fixed vocabularies of :mod:`afl_analytics.arpadl.config`, such that the
+    category codes are equal to the 'type_id', 'bodypart_id' and 'result_id'.
+    The categories of the 'team' and 'player' columns are inferred from the data.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        An ARPADL or Atomic-ARPADL dataframe.
+    actiontypes : list(str), optional
+        The action type vocabulary. Uses the ARPADL action types if None.
+
+    Returns
+    -------
+    pd.DataFrame
+        The actions with categorical columns.
+    """
+    vocabularies = {
+        "action_type": arpadlconfig.actiontypes if actiontypes is None else actiontypes,
+        "bodypart": arpadlconfig.bodyparts,
+        "result": arpadlconfig.results,
+    }
+    actions = actions.copy(deep=False)
+    for col in _coded_columns:
+        if col not in actions.columns:
+            continue
+        if col in vocabularies:
+            actions[col] = pd.Categorical(actions[col], categories=vocabularies[col])
+        else:
+            actions[col] = actions[col].astype("category")
+    return actions
+
+
+@stage
+def decode_categories(actions: pd.DataFrame) -> pd.DataFrame:
+    """Convert the categorical columns of an ARPADL dataframe back to strings.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        An ARPADL or Atomic-ARPADL dataframe.
+
+    Returns
+    -------
+    pd.DataFrame
+        The actions with string columns.
+    """
+    actions = actions.copy(deep=False)
+    for col in _coded_columns:
+        if col in actions.columns and isinstance(actions[col].dtype, pd.CategoricalDtype):
+            actions[col] = actions[col].astype(object)
+    return actions
+
+
+def add_names(actions: pd.DataFrame) -> pd.DataFrame:
+    """Add the names of the action types, results and bodyparts.
+
+    ARPADL dataframes carry names rather than ids, so this only decodes the
+    columns of a categorical ARPADL dataframe.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        An ARPADL or Atomic-ARPADL dataframe.
+
+    Returns
+    -------
+    pd.DataFrame
+        The actions with the names of each action type, result and bodypart.
+    """
+    return decode_categories(actions)
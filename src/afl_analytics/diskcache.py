@@ -0,0 +1,172 @@
+"""Content-addressed on-disk caches of per-match results.
+
+The result of each match is stored in a file whose name hashes the rows of the
+match together with a version of the code that computed it, so a match is only
+computed again when its rows or that version change. Files are written to a
+hidden file and moved in place, so readers never see a partial file, and the
+least recently used files are evicted once the cache exceeds its size limit.
+"""
+
+import hashlib
+import os
+from typing import Callable, Iterator, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+
+def match_keys(
+    frame: pd.DataFrame,
+    match_ids: pd.Series,
+    version: str,
+    sort: bool = False,
+    context: Optional[Callable[[str], str]] = None,
+) -> Iterator[tuple[str, np.ndarray, str]]:
+    """
+    Hash the rows of each match in a frame.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The rows of one or more matches.
+    match_ids : pd.Series
+        The match of each row.
+    version : str
+        The version of the code that computes the cached results.
+    sort : bool, default=False
+        Whether to yield the matches in sorted order instead of in the order
+        of their first row.
+    context : callable, optional
+        Returns the inputs of the cached result of a match, other than its
+        rows, given its ID. They are hashed into the key of the match.
+
+    Yields
+    ------
+    tuple(str, np.ndarray, str)
+        The ID of each match, the positions of its rows and its key.
+    """
+    # One hash per row, combined per match, so only the changed matches miss
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    for match_id, rows in frame.groupby(match_ids.astype(str), sort=sort).indices.items():
+        digest = hashlib.sha256(version.encode())
+        if context is not None:
+            digest.update(context(match_id).encode())
+        digest.update(row_hashes[rows].tobytes())
+        yield match_id, rows, f"{match_id}-{digest.hexdigest()[:32]}"
+
+
+def write_atomically(path: str, write: Callable[[str], None]) -> None:
+    """
+    Write a file through a hidden file that is moved in place.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    write : callable
+        Writes the contents of the file to the path it is given.
+    """
+    directory, name = os.path.split(path)
+    hidden = os.path.join(directory, f".{name}.tmp")
+    write(hidden)
+    os.replace(hidden, path)
+
+
+class LRUDirectory:
+    """
+    A directory of cached files, evicted least recently used first.
+
+    Parameters
+    ----------
+    root : str
+        The directory. It is created on the first write.
+    suffix : str
+        The suffix of the cached files in the directory and its direct
+        subdirectories.
+    max_bytes : int
+        The size limit of the cached files.
+    """
+
+    def __init__(self, root: str, suffix: str, max_bytes: int) -> None:
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+
+    def get(self, path: str) -> bool:
+        """
+        Return whether a file is cached, marking it as recently used.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Returns
+        -------
+        bool
+            True if the file exists.
+        """
+        if not os.path.exists(path):
+            return False
+        os.utime(path)
+        return True
+
+    def put(self, path: str, write: Callable[[str], None]) -> None:
+        """
+        Write a file to the cache.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        write : callable
+            Writes the contents of the file to the path it is given.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomically(path, write)
+
+    def size(self) -> int:
+        """
+        Return the size of the cached files in bytes.
+
+        Returns
+        -------
+        int
+            The total size of the cached files.
+        """
+        return sum(size for _, _, size in self.entries())
+
+    def clear(self) -> None:
+        """Remove every cached file."""
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def evict(self) -> None:
+        """Remove the least recently used files until the cache fits its size limit."""
+        entries = sorted(self.entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def entries(self) -> list[tuple[str, float, int]]:
+        """
+        Return the cached files.
+
+        Returns
+        -------
+        list(tuple(str, float, int))
+            The path, modification time and size of each cached file.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            children = os.scandir(entry.path) if entry.is_dir() else [entry]
+            for child in children:
+                if child.name.endswith(self.suffix) and not child.name.startswith("."):
+                    stat = child.stat()
+                    entries.append((child.path, stat.st_mtime, stat.st_size))
+        return entries
@@ -0,0 +1,117 @@
+"""Implements the Atomic-VAEP framework.
+
+Attributes
+----------
+xfns_default : list(callable)
+    The default Atomic-VAEP features.
+
+"""
+
+from typing import Optional, Union
+
+import pandas as pd  # type: ignore
+from scipy.sparse import csr_matrix  # type: ignore
+
+from afl_analytics.vaep.base import VAEP
+
+from . import features as fs
+from . import formula as vaep
+from . import labels as lab
+
+xfns_default = [
+    fs.actiontype_onehot,
+    fs.bodypart_onehot,
+    fs.time,
+    fs.location,
+    fs.polar,
+    fs.movement_polar,
+    fs.direction,
+    fs.team,
+    fs.time_delta,
+    fs.goalscore,
+]
+
+
+class AtomicVAEP(VAEP):
+    """
+    An implementation of the VAEP framework for atomic actions.
+
+    In contrast to the original VAEP framework [1]_ this extension
+    distinguishes the contribution of the player who initiates the action
+    (e.g., gives the pass) and the player who completes the action (e.g.,
+    receives the pass) [2]_.
+
+    The game states, labels and values are computed with NumPy for the actions
+    of any number of matches at once, without crossing match or period
+    boundaries.
+
+    Parameters
+    ----------
+    xfns : list
+        List of feature transformers (see :mod:`afl_analytics.vaep.atomic.features`)
+        used to describe the game states. Uses :attr:`~afl_analytics.vaep.atomic.base.xfns_default`
+        if None.
+    nb_prev_actions : int, default=3  # noqa: DAR103
+        Number of previous actions used to decscribe the game state.
+
+    See Also
+    --------
+    :class:`afl_analytics.vaep.base.VAEP` : Implementation of the original VAEP framework.
+
+    References
+    ----------
+    .. [1] Tom Decroos, Lotte Bransen, Jan Van Haaren, and Jesse Davis.
+        "Actions speak louder than goals: Valuing player actions in soccer." In
+        Proceedings of the 25th ACM SIGKDD International Conference on Knowledge
+        Discovery & Data Mining, pp. 1851-1861. 2019.
+    .. [2] Tom Decroos, Pieter Robberechts and Jesse Davis.
+        "Introducing Atomic-SPADL: A New Way to Represent Event Stream Data".
+        DTAI Sports Analytics Blog. 2020.
+    """
+
+    _fs = fs
+    _lab = lab
+    _vaep = vaep
+
+    def __init__(
+        self,
+        xfns: Optional[list[fs.FeatureTransfomer]] = None,
+        nb_prev_actions: int = 3,
+    ) -> None:
+        xfns = xfns_default if xfns is None else xfns
+        super().__init__(xfns, nb_prev_actions)
+
+    def compute_features(
+        self,
+        game: Optional[Union[pd.Series, dict[str, str]]],
+        game_actions: fs.Actions,
+        sparse: bool = False,
+    ) -> Union[pd.DataFrame, csr_matrix]:
+        """
+        Transform actions to the feature-based representation of game states.
+
+        Parameters
+        ----------
+        game : pd.Series or dict, optional
+            The ARPADL representation of a single game, or the home team of
+            each game keyed by 'match_id'. If None, the home team of each game
+            is derived from its 'match_id'.
+        game_actions : pd.DataFrame
+            The Atomic-ARPADL actions of one or more games.
+        sparse : bool, default=False
+            Whether to return the features as a sparse matrix, in which only
+            the ones of the one-hot encoded features are stored. Its columns
+            are those of :attr:`feature_plan`.
+
+        Returns
+        -------
+        features : pd.DataFrame or scipy.sparse.csr_matrix
+            Returns the feature-based representation of each game state.
+        """
+        home_team = game.home_team_id if isinstance(game, pd.Series) else game
+        game_actions_with_names = self._arpadlcfg.add_names(game_actions)  # type: ignore
+        gamestates = self._fs.gamestates(game_actions_with_names, self.nb_prev_actions)
+        gamestates = self._fs.play_left_to_right(gamestates, home_team)
+        if sparse:
+            return self.feature_plan.transform_sparse(gamestates)
+        return self.feature_plan.to_frame(gamestates)
@@ -0,0 +1,382 @@
+"""Implements the feature tranformers of the Atomic-VAEP framework.
+
+The game states of all matches are represented at once by a :class:`GameStates`
+object, which holds the Atomic-ARPADL fields of the previous actions of each
+action in one (n_actions, nb_prev_actions, n_fields) NumPy array, like the
+game states of regular actions. Column ``i`` of a field contains the ``i``-th
+previous action of each action, found by index arithmetic that never crosses
+a match or period boundary. The feature transformers compute their features
+for all game states in a few array operations.
+"""
+
+from typing import Any, Callable, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+import afl_analytics.arpadl.atomic.config as atomicspadl
+from afl_analytics.arpadl.atomic.schema import AtomicARPADLSchema
+from afl_analytics.utils import get_home_team_from_match_id
+from afl_analytics.vaep import features as regular
+
+Actions = DataFrame[AtomicARPADLSchema]
+Features = DataFrame[Any]
+
+_numeric_fields: list[str] = ["period_id", "time_seconds", "x", "y", "dx", "dy"]
+_coded_fields: dict[str, Optional[list[str]]] = {
+    "team": None,
+    "action_type": atomicspadl.actiontypes,
+    "bodypart": atomicspadl.bodyparts,
+}
+
+
+class GameStates(regular.GameStates):
+    """The game states of the atomic actions of one or more matches.
+
+    The previous actions of every action are stored in one contiguous
+    (n_actions, nb_prev_actions, n_fields) array, as for regular actions, with
+    the fields of Atomic-ARPADL actions. Team, action type and bodypart are
+    stored as integer codes into :attr:`categories`.
+
+    See Also
+    --------
+    afl_analytics.vaep.features.GameStates : For regular actions.
+    """
+
+    fields: list[str] = _numeric_fields + list(_coded_fields)
+    coded_fields: dict[str, Optional[list[str]]] = _coded_fields
+
+
+FeatureTransfomer = Callable[[GameStates], Features]
+
+
+def feature_column_names(fs: list[FeatureTransfomer], nb_prev_actions: int = 3) -> list[str]:
+    """Return the names of the features generated by a list of transformers.
+
+    Parameters
+    ----------
+    fs : list(callable)
+        A list of feature transformers.
+    nb_prev_actions : int, default=3  # noqa: DAR103
+        The number of previous actions included in the game state.
+
+    Returns
+    -------
+    list(str)
+        The name of each generated feature.
+    """
+    dummy_actions = pd.DataFrame(
+        {
+            "match_id": ["AFL_2023_01_Home_Away"],
+            "period_id": [1],
+            "time_seconds": [0.0],
+            "team": ["Home"],
+            "player": ["Player"],
+            "x": [0.0],
+            "y": [0.0],
+            "dx": [0.0],
+            "dy": [0.0],
+            "action_type": [atomicspadl.actiontypes[0]],
+            "bodypart": [atomicspadl.bodyparts[0]],
+        }
+    )
+    gs = gamestates(dummy_actions, nb_prev_actions)
+    return list(pd.concat([f(gs) for f in fs], axis=1).columns.values)
+
+
+def gamestates(actions: Actions, nb_prev_actions: int = 3) -> GameStates:
+    """Convert a dataframe of atomic actions to game states.
+
+    Each game state is represented as the <nb_prev_actions> previous actions.
+    The previous actions never cross a match or period boundary; at the start
+    of a period the first action of the period is repeated, as in
+    :func:`afl_analytics.vaep.features.gamestates`.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The atomic actions of one or more matches, ordered by match, period
+        and time.
+    nb_prev_actions : int, default=3  # noqa: DAR103
+        The number of previous actions included in the game state.
+
+    Raises
+    ------
+    ValueError
+        If the number of actions is smaller 1.
+
+    Returns
+    -------
+    GameStates
+         The <nb_prev_actions> previous actions for each action.
+    """
+    return regular._gamestates(GameStates, actions, nb_prev_actions)
+
+
+def play_left_to_right(
+    gamestates: GameStates, home_team: Optional[Union[str, dict[str, str]]] = None
+) -> GameStates:
+    """Perform all actions in a gamestate in the same playing direction.
+
+    This changes the location and direction of each action in a gamestate,
+    such that all actions are performed as if the team that performs the first
+    action in the gamestate plays from left to right.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+    home_team : str or dict, optional
+        The home team of a single match, or the home team of each match keyed
+        by 'match_id'. Derived from the 'match_id' of each match if None.
+
+    Returns
+    -------
+    GameStates
+        The game states with all actions performed left to right.
+
+    See Also
+    --------
+    afl_analytics.vaep.features.play_left_to_right : For regular actions.
+    """
+    # The home team of the match of each action, as a team code
+    team_codes = {name: code for code, name in enumerate(gamestates.categories["team"])}
+    match_ids = gamestates.match_ids
+    if home_team is None:
+        home_teams = [get_home_team_from_match_id(match_id) for match_id in match_ids]
+    elif isinstance(home_team, dict):
+        home_teams = [home_team[match_id] for match_id in match_ids]
+    else:
+        home_teams = [home_team] * len(match_ids)
+    home_codes = np.array([team_codes.get(team, -1) for team in home_teams] + [-1])
+
+    away = gamestates.field("team")[:, 0] != home_codes[gamestates.match]
+    x, y, dx, dy = (gamestates.field(col) for col in ["x", "y", "dx", "dy"])
+    x[away] = atomicspadl.field_length - x[away]
+    y[away] = atomicspadl.field_width - y[away]
+    dx[away] = -dx[away]
+    dy[away] = -dy[away]
+    gamestates._frames.clear()
+    return gamestates
+
+
+def _lagged(gamestates: GameStates, features: dict[str, np.ndarray]) -> pd.DataFrame:
+    # Features of every action in the game state, named and ordered like those of vaep.features.simple
+    X = {}
+    for i in range(gamestates.nb_prev_actions):
+        for name, values in features.items():
+            X[name + "_a" + str(i)] = values[:, i]
+    return pd.DataFrame(X, index=gamestates.index)
+
+
+# SIMPLE FEATURES
+
+
+def actiontype_onehot(gamestates: GameStates) -> Features:
+    """Get the one-hot-encoded type of each action.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        A one-hot encoding of each action's type.
+    """
+    codes = gamestates.field("action_type")
+    return _lagged(
+        gamestates,
+        {"actiontype_" + name: codes == type_id for type_id, name in enumerate(atomicspadl.actiontypes)},
+    )
+
+
+def bodypart_onehot(gamestates: GameStates) -> Features:
+    """Get the one-hot-encoded bodypart of each action.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The one-hot encoding of each action's bodypart.
+    """
+    codes = gamestates.field("bodypart")
+    return _lagged(
+        gamestates,
+        {"bodypart_" + name: codes == bodypart_id for bodypart_id, name in enumerate(atomicspadl.bodyparts)},
+    )
+
+
+def time(gamestates: GameStates) -> Features:
+    """Get the time when each action was performed.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The 'period_id' and 'time_seconds' when each action was performed.
+    """
+    return _lagged(
+        gamestates,
+        {"period_id": gamestates.field("period_id"), "time_seconds": gamestates.field("time_seconds")},
+    )
+
+
+def location(gamestates: GameStates) -> Features:
+    """Get the location where each action started.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The 'x' and 'y' location of each action.
+    """
+    return _lagged(gamestates, {"x": gamestates.field("x"), "y": gamestates.field("y")})
+
+
+_goal_x: float = atomicspadl.field_length
+_goal_y: float = atomicspadl.field_width / 2
+
+
+def polar(gamestates: GameStates) -> Features:
+    """Get the polar coordinates of each action's location.
+
+    The center of the opponent's goal is used as the origin.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The 'dist_to_goal' and 'angle_to_goal' of each action.
+    """
+    dx = np.abs(_goal_x - gamestates.field("x"))
+    dy = np.abs(_goal_y - gamestates.field("y"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        angle = np.nan_to_num(np.arctan(dy / dx))
+    return _lagged(gamestates, {"dist_to_goal": np.sqrt(dx**2 + dy**2), "angle_to_goal": angle})
+
+
+def movement_polar(gamestates: GameStates) -> Features:
+    """Get the distance covered and direction of each action.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The distance covered ('mov_d') and direction ('mov_angle') of each
+        action.
+    """
+    dx, dy = gamestates.field("dx"), gamestates.field("dy")
+    return _lagged(gamestates, {"mov_d": np.sqrt(dx**2 + dy**2), "mov_angle": np.arctan2(dy, dx)})
+
+
+def direction(gamestates: GameStates) -> Features:
+    """Get the direction of each action as a unit vector.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The horizontal ('dx') and vertical ('dy') component of the direction
+        of each action.
+    """
+    dx, dy = gamestates.field("dx"), gamestates.field("dy")
+    mov = np.sqrt(dx**2 + dy**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _lagged(
+            gamestates,
+            {"dx": np.where(mov > 0, dx / mov, 0.0), "dy": np.where(mov > 0, dy / mov, 0.0)},
+        )
+
+
+# STATE FEATURES
+
+
+def team(gamestates: GameStates) -> Features:
+    """Check whether the possession changed during the game state.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        A dataframe with a column 'team_ai' for each <nb_prev_actions> indicating
+        whether the team that performed action a0 is in possession.
+    """
+    teams = gamestates.field("team")
+    return pd.DataFrame(
+        {"team_" + str(i): teams[:, i] == teams[:, 0] for i in range(1, gamestates.nb_prev_actions)},
+        index=gamestates.index,
+    )
+
+
+def time_delta(gamestates: GameStates) -> Features:
+    """Get the number of seconds between the last and previous actions.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        A dataframe with a column 'time_delta_i' for each <nb_prev_actions>
+        containing the number of seconds between action ai and action a0.
+    """
+    t = gamestates.field("time_seconds")
+    return pd.DataFrame(
+        {"time_delta_" + str(i): t[:, 0] - t[:, i] for i in range(1, gamestates.nb_prev_actions)},
+        index=gamestates.index,
+    )
+
+
+# CONTEXT FEATURES
+
+
+def goalscore(gamestates: GameStates) -> Features:
+    """Get the number of goals scored by each team before the action.
+
+    Parameters
+    ----------
+    gamestates : GameStates
+        The game states of one or more matches.
+
+    Returns
+    -------
+    Features
+        The number of goals scored by the team performing the last action of the
+        game state ('goalscore_team'), by the opponent ('goalscore_opponent'),
+        and the goal difference between both teams ('goalscore_diff').
+    """
+    goals = gamestates.field("action_type")[:, 0] == atomicspadl.actiontypes.index("goal")
+    return regular._goalscore(gamestates, goals)
@@ -0,0 +1,124 @@
+"""Implements the formula of the Atomic-VAEP framework.
+
+The values are computed for the actions of one or more matches at once. The
+first action of every period has no previous game state, so its value is the
+full scoring and conceding probability of its own game state.
+"""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame, Series
+
+from afl_analytics.arpadl.atomic.schema import AtomicARPADLSchema
+from afl_analytics.vaep import formula as vaep
+
+
+def _values(
+    actions: DataFrame[AtomicARPADLSchema], scores: Series[float], concedes: Series[float]
+) -> tuple[np.ndarray, np.ndarray]:
+    # The fused kernel of regular actions, with the goals as actions of their own
+    goal = actions["action_type"].to_numpy() == "goal"
+    return vaep._values(actions, scores, concedes, goal)
+
+
+def offensive_value(
+    actions: DataFrame[AtomicARPADLSchema], scores: Series[float], concedes: Series[float]
+) -> Series[float]:
+    r"""Compute the offensive value of each action.
+
+    VAEP defines the *offensive value* of an action as the change in scoring
+    probability before and after the action.
+
+    .. math::
+
+      \Delta P_{score}(a_{i}, t) = P^{k}_{score}(S_i, t) - P^{k}_{score}(S_{i-1}, t)
+
+    where :math:`P_{score}(S_i, t)` is the probability that team :math:`t`
+    which possesses the ball in state :math:`S_i` will score in the next 10
+    actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        Atomic-ARPADL actions.
+    scores : pd.Series
+        The probability of scoring from each corresponding game state.
+    concedes : pd.Series
+        The probability of conceding from each corresponding game state.
+
+    Returns
+    -------
+    pd.Series
+        The offensive value of each action.
+    """
+    offensive, _ = _values(actions, scores, concedes)
+    return pd.Series(offensive, index=actions.index)
+
+
+def defensive_value(
+    actions: DataFrame[AtomicARPADLSchema], scores: Series[float], concedes: Series[float]
+) -> Series[float]:
+    r"""Compute the defensive value of each action.
+
+    VAEP defines the *defensive value* of an action as the change in conceding
+    probability.
+
+    .. math::
+
+      \Delta P_{concede}(a_{i}, t) = P^{k}_{concede}(S_i, t) - P^{k}_{concede}(S_{i-1}, t)
+
+    where :math:`P_{concede}(S_i, t)` is the probability that team :math:`t`
+    which possesses the ball in state :math:`S_i` will concede in the next 10
+    actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        Atomic-ARPADL actions.
+    scores : pd.Series
+        The probability of scoring from each corresponding game state.
+    concedes : pd.Series
+        The probability of conceding from each corresponding game state.
+
+    Returns
+    -------
+    pd.Series
+        The defensive value of each action.
+    """
+    _, defensive = _values(actions, scores, concedes)
+    return pd.Series(defensive, index=actions.index)
+
+
+def value(
+    actions: DataFrame[AtomicARPADLSchema], Pscores: Series[float], Pconcedes: Series[float]
+) -> pd.DataFrame:
+    r"""Compute the offensive, defensive and VAEP value of each action.
+
+    The total VAEP value of an action is the difference between that action's
+    offensive value and defensive value.
+
+    .. math::
+
+      V_{VAEP}(a_i) = \Delta P_{score}(a_{i}, t) - \Delta P_{concede}(a_{i}, t)
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        Atomic-ARPADL actions.
+    Pscores : pd.Series
+        The probability of scoring from each corresponding game state.
+    Pconcedes : pd.Series
+        The probability of conceding from each corresponding game state.
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'offensive_value', 'defensive_value' and 'vaep_value' of each action.
+    """
+    offensive, defensive = _values(actions, Pscores, Pconcedes)
+
+    v = pd.DataFrame(index=actions.index)
+    v["offensive_value"] = offensive
+    v["defensive_value"] = defensive
+    v["vaep_value"] = v["offensive_value"] + v["defensive_value"]
+    return v
@@ -0,0 +1,88 @@
+"""Implements the label tranformers of the Atomic-VAEP framework.
+
+The labels are computed for the actions of one or more matches at once and
+never look past the end of a match.
+"""
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from pandera.typing import DataFrame
+
+from afl_analytics.arpadl.atomic.schema import AtomicARPADLSchema
+
+from ..labels import _goals_within
+
+
+def _goal_by_team(actions: DataFrame[AtomicARPADLSchema], nr_actions: int, same_team: bool) -> np.ndarray:
+    goals = (actions["action_type"] == "goal").to_numpy()
+    team = pd.factorize(actions["team"])[0]
+    match = pd.factorize(actions["match_id"])[0]
+    scores, concedes = _goals_within(goals, team, match, [nr_actions])
+    return (scores if same_team else concedes)[:, 0]
+
+
+def scores(actions: DataFrame[AtomicARPADLSchema], nr_actions: int = 10) -> pd.DataFrame:
+    """Determine whether the team possessing the ball scored a goal within the next x actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions of one or more matches.
+    nr_actions : int, default=10  # noqa: DAR103
+        Number of actions after the current action to consider.
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with a column 'scores' and a row for each action set to
+        True if a goal was scored by the team possessing the ball within the
+        next x actions; otherwise False.
+    """
+    return pd.DataFrame({"scores": _goal_by_team(actions, nr_actions, True)}, index=actions.index)
+
+
+def concedes(actions: DataFrame[AtomicARPADLSchema], nr_actions: int = 10) -> pd.DataFrame:
+    """Determine whether the team possessing the ball conceded a goal within the next x actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions of one or more matches.
+    nr_actions : int, default=10  # noqa: DAR103
+        Number of actions after the current action to consider.
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with a column 'concedes' and a row for each action set to
+        True if a goal was conceded by the team possessing the ball within the
+        next x actions; otherwise False.
+    """
+    return pd.DataFrame({"concedes": _goal_by_team(actions, nr_actions, False)}, index=actions.index)
+
+
+def goal_from_shot(actions: DataFrame[AtomicARPADLSchema]) -> pd.DataFrame:
+    """Determine whether a goal was scored from the current action.
+
+    In Atomic-ARPADL the outcome of a shot is the action that follows it.
+    This label can be use to train an xG model.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions of one or more matches.
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with the columns 'goal_from_shot', 'behind_from_shot' and
+        'score_from_shot' and a row for each action.
+    """
+    shot = (actions["action_type"] == "shot").to_numpy()
+    outcome = np.append(actions["action_type"].to_numpy()[1:], None)
+    goals = shot & (outcome == "goal")
+    behinds = shot & (outcome == "behind")
+    return pd.DataFrame(
+        {"goal_from_shot": goals, "behind_from_shot": behinds, "score_from_shot": goals * 6 + behinds},
+        index=actions.index,
+    )
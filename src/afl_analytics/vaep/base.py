@@ -8,18 +8,22 @@ xfns_default : list(callable)
 """
 
 import math
-from typing import Any, Optional
+from collections.abc import MutableMapping
+from typing import Any, Iterable, Optional, Union
 
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix, issparse
 from sklearn.exceptions import NotFittedError
 from sklearn.metrics import brier_score_loss, roc_auc_score
 
 import afl_analytics.arpadl as arpadlcfg
 
+from . import batch, chunked, serialization
 from . import features as fs
 from . import formula as vaep
 from . import labels as lab
+from .plan import FeaturePlan
 
 try:
     import xgboost
@@ -40,7 +44,6 @@ xfns_default = [
     fs.result_onehot,
     fs.actiontype_result_onehot,
     fs.bodypart_onehot,
-    fs.time,
     fs.startlocation,
     fs.endlocation,
     fs.startpolar,
@@ -90,12 +93,27 @@ class VAEP:
         xfns: Optional[list[fs.FeatureTransfomer]] = None,
         nb_prev_actions: int = 3,
     ) -> None:
-        self.__models: dict[str, Any] = {}
+        self.__models: MutableMapping[str, Any] = {}
         self.xfns = xfns_default if xfns is None else xfns
         self.yfns = [self._lab.scores, self._lab.concedes]
         self.nb_prev_actions = nb_prev_actions
+        self._feature_plan: Optional[FeaturePlan] = None
 
-    def compute_features(self, game: pd.Series, game_actions: fs.Actions) -> pd.DataFrame:
+    @property
+    def feature_plan(self) -> FeaturePlan:
+        """The compiled plan of the feature transformers.
+
+        The plan is compiled on first use and again whenever the feature
+        transformers or the number of previous actions change.
+        """
+        plan = self._feature_plan
+        if plan is None or plan.xfns != list(self.xfns) or plan.nb_prev_actions != self.nb_prev_actions:
+            plan = self._feature_plan = FeaturePlan(self.xfns, self.nb_prev_actions, self._fs)
+        return plan
+
+    def compute_features(
+        self, game: pd.Series, game_actions: fs.Actions, sparse: bool = False
+    ) -> Union[pd.DataFrame, csr_matrix]:
         """
         Transform actions to the feature-based representation of game states.
 
@@ -105,16 +123,22 @@ class VAEP:
             The SPADL representation of a single game.
         game_actions : pd.DataFrame
             The actions performed during `game` in the SPADL representation.
+        sparse : bool, default=False
+            Whether to return the features as a sparse matrix, in which only
+            the ones of the one-hot encoded features are stored. Its columns
+            are those of :attr:`feature_plan`.
 
         Returns
         -------
-        features : pd.DataFrame
+        features : pd.DataFrame or scipy.sparse.csr_matrix
             Returns the feature-based representation of each game state in the game.
         """
         game_actions_with_names = self._arpadlcfg.add_names(game_actions)  # type: ignore
         gamestates = self._fs.gamestates(game_actions_with_names, self.nb_prev_actions)
         gamestates = self._fs.play_left_to_right(gamestates, game.home_team_id)
-        return pd.concat([fn(gamestates) for fn in self.xfns], axis=1)
+        if sparse:
+            return self.feature_plan.transform_sparse(gamestates)
+        return self.feature_plan.to_frame(gamestates)
 
     def compute_labels(
         self,
@@ -139,9 +163,64 @@ class VAEP:
         game_actions_with_names = self._arpadlcfg.add_names(game_actions)  # type: ignore
         return pd.concat([fn(game_actions_with_names) for fn in self.yfns], axis=1)
 
+    def compute_features_many(
+        self,
+        actions: fs.Actions,
+        home_teams: Optional[dict[str, str]] = None,
+        max_workers: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Transform the actions of many games to the feature-based representation of game states.
+
+        The games are computed in a pool of worker processes, which write
+        their features straight into a shared result matrix.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame
+            The actions of one or more games in the SPADL representation.
+        home_teams : dict, optional
+            The home team of each game, keyed by 'match_id'. Derived from the
+            'match_id' of each game if None.
+        max_workers : int, optional
+            Number of worker processes. Uses the number of processors on the
+            machine if None. With a single worker the games are computed in
+            the calling process.
+
+        Returns
+        -------
+        features : pd.DataFrame
+            Returns the feature-based representation of each game state, in
+            the order of the actions.
+        """
+        return batch.compute_features_many(self, actions, home_teams, max_workers)
+
+    def compute_labels_many(self, actions: fs.Actions, max_workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Compute the labels for each game state of many games.
+
+        The games are computed in a pool of worker processes, which write
+        their labels straight into a shared result matrix.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame
+            The actions of one or more games in the SPADL representation.
+        max_workers : int, optional
+            Number of worker processes. Uses the number of processors on the
+            machine if None. With a single worker the games are computed in
+            the calling process.
+
+        Returns
+        -------
+        labels : pd.DataFrame
+            Returns the labels of each game state, in the order of the actions.
+        """
+        return batch.compute_labels_many(self, actions, max_workers)
+
     def fit(
         self,
-        X: pd.DataFrame,
+        X: Union[pd.DataFrame, csr_matrix],
         y: pd.DataFrame,
         learner: str = "xgboost",
         val_size: float = 0.25,
@@ -153,8 +232,10 @@ class VAEP:
 
         Parameters
         ----------
-        X : pd.DataFrame
-            Feature representation of the game states.
+        X : pd.DataFrame or scipy.sparse.csr_matrix
+            Feature representation of the game states. XGBoost learns sparse
+            features as a booster, one dense block of rows at a time, and
+            only uses the 'verbose' fit parameter.
         y : pd.DataFrame
             Scoring and conceding labels for each game state.
         learner : string, default='xgboost'  # noqa: DAR103
@@ -179,7 +260,7 @@ class VAEP:
             Fitted VAEP model.
 
         """
-        nb_states = len(X)
+        nb_states = X.shape[0]
         idx = np.random.permutation(nb_states)
         # fmt: off
         train_idx = idx[:math.floor(nb_states * (1 - val_size))]
@@ -187,14 +268,14 @@ class VAEP:
         # fmt: on
 
         # filter feature columns
-        cols = self._fs.feature_column_names(self.xfns, self.nb_prev_actions)
-        if not set(cols).issubset(set(X.columns)):
-            missing_cols = " and ".join(set(cols).difference(X.columns))
-            raise ValueError(f"{missing_cols} are not available in the features dataframe")
+        X = self._feature_matrix(X)
 
         # split train and validation data
-        X_train, y_train = X.iloc[train_idx][cols], y.iloc[train_idx]
-        X_val, y_val = X.iloc[val_idx][cols], y.iloc[val_idx]
+        if issparse(X):
+            X_train, X_val = X[train_idx], X[val_idx]
+        else:
+            X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+        y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
 
         # train classifiers F(X) = Y
         for col in list(y.columns):
@@ -215,6 +296,76 @@ class VAEP:
                 raise ValueError(f"A {learner} learner is not supported")
         return self
 
+    def fit_chunks(
+        self,
+        chunks: Iterable[chunked.Chunk],
+        learner: str = "xgboost",
+        val_size: float = 0.25,
+        tree_params: Optional[dict[str, Any]] = None,
+        num_boost_round: int = 100,
+        cache_dir: Optional[str] = None,
+        random_state: int = 0,
+    ) -> "VAEP":
+        """
+        Fit the model on chunks of training data that need not fit in memory.
+
+        The learners bin the features one chunk at a time, without ever
+        concatenating them. Every chunk holds the game states of one or more
+        whole matches; the validation set is a random subset of the chunks, so
+        no match is split between the training and the validation set.
+
+        Parameters
+        ----------
+        chunks : iterable
+            The ``(X, y)`` chunks with the feature representation and the
+            labels of the game states, e.g.
+            :meth:`afl_analytics.vaep.store.FeatureStore.chunks`. It is
+            iterated several times, so it cannot be a generator.
+        learner : string, default='xgboost'  # noqa: DAR103
+            Gradient boosting implementation which should be used to learn the
+            model. The supported learners are 'xgboost' and 'lightgbm'.
+        val_size : float, default=0.25  # noqa: DAR103
+            Expected fraction of the chunks that will be used as the
+            validation set for early stopping. When zero, no validation data
+            will be used.
+        tree_params : dict
+            Parameters passed to the native training function of the learner.
+        num_boost_round : int, default=100
+            The maximum number of boosting rounds.
+        cache_dir : str, optional
+            Directory in which XGBoost pages the binned features to disk. The
+            binned features are kept in memory if None.
+        random_state : int, default=0
+            The seed of the validation split.
+
+        Raises
+        ------
+        ValueError
+            If the chunks are a one-shot iterator or the learner is not supported.
+
+        Returns
+        -------
+        self
+            Fitted VAEP model.
+        """
+        if iter(chunks) is chunks:
+            raise ValueError("The chunks are read several times, so they cannot be a one-shot iterator")
+
+        cols = self.feature_plan.columns
+        labels = list(next(iter(chunks))[1].columns)
+        for col in labels:
+            if learner == "xgboost":
+                self.__models[col] = chunked.train_xgboost(
+                    chunks, col, cols, val_size, tree_params, num_boost_round, cache_dir, random_state
+                )
+            elif learner == "lightgbm":
+                self.__models[col] = chunked.train_lightgbm(
+                    chunks, col, cols, val_size, tree_params, num_boost_round, random_state
+                )
+            else:
+                raise ValueError(f"A {learner} learner is not supported")
+        return self
+
     def _fit_xgboost(
         self,
         X: pd.DataFrame,
@@ -236,6 +387,8 @@ class VAEP:
             }
         if fit_params is None:
             fit_params = {"verbose": True}
+        if issparse(X):
+            return self._fit_xgboost_blocks(X, y, eval_set, tree_params, fit_params)
         if eval_set is not None:
             val_params = {"eval_set": eval_set}
             fit_params = {**fit_params, **val_params}
@@ -243,6 +396,37 @@ class VAEP:
         model = xgboost.XGBClassifier(**tree_params)
         return model.fit(X, y, **fit_params)
 
+    def _fit_xgboost_blocks(
+        self,
+        X: csr_matrix,
+        y: pd.Series,
+        eval_set: Optional[list[tuple[csr_matrix, pd.Series]]],
+        tree_params: dict[str, Any],
+        fit_params: dict[str, Any],
+    ) -> "xgboost.Booster":
+        # XGBoost treats the entries missing from a sparse matrix as missing
+        # values instead of zeros, so it bins sparse features one dense block
+        # of rows at a time. The classifier parameters are translated to a
+        # booster; only the 'verbose' fit parameter applies.
+        classifier = xgboost.XGBClassifier(**tree_params)
+        cols = self.feature_plan.columns
+
+        def matrix(X: csr_matrix, y: pd.Series, ref: Optional["xgboost.DMatrix"] = None) -> "xgboost.DMatrix":
+            label = str(y.name)
+            blocks = chunked._RowBlocks(X, y.to_frame(label))
+            return xgboost.QuantileDMatrix(chunked._XGBoostChunks(blocks, label, cols, False, 0.0, 0, None), ref=ref)
+
+        dtrain = matrix(X, y)
+        evals = [(matrix(X_val, y_val, dtrain), "validation") for X_val, y_val in eval_set or []]
+        return xgboost.train(
+            classifier.get_xgb_params(),
+            dtrain,
+            classifier.n_estimators or 100,
+            evals=evals,
+            early_stopping_rounds=classifier.early_stopping_rounds if evals else None,
+            verbose_eval=fit_params.get("verbose", False),
+        )
+
     def _fit_catboost(
         self,
         X: pd.DataFrame,
@@ -261,7 +445,7 @@ class VAEP:
                 "iterations": 100,
             }
         if fit_params is None:
-            is_cat_feature = [c.dtype.name == "category" for (_, c) in X.iteritems()]
+            is_cat_feature = [] if issparse(X) else [c.dtype.name == "category" for (_, c) in X.items()]
             fit_params = {
                 "cat_features": np.nonzero(is_cat_feature)[0].tolist(),
                 "verbose": True,
@@ -286,26 +470,52 @@ class VAEP:
         if tree_params is None:
             tree_params = {"n_estimators": 100, "max_depth": 3}
         if fit_params is None:
-            fit_params = {"eval_metric": "auc", "verbose": True}
+            fit_params = {"eval_metric": "auc", "callbacks": [lightgbm.log_evaluation()]}
         if eval_set is not None:
-            val_params = {"early_stopping_rounds": 10, "eval_set": eval_set}
+            callbacks = fit_params.get("callbacks", []) + [lightgbm.early_stopping(10, verbose=False)]
+            val_params = {"callbacks": callbacks, "eval_set": eval_set}
             fit_params = {**fit_params, **val_params}
         # Train the model
         model = lightgbm.LGBMClassifier(**tree_params)
         return model.fit(X, y, **fit_params)
 
-    def _estimate_probabilities(self, X: pd.DataFrame) -> pd.DataFrame:
-        # filter feature columns
-        cols = self._fs.feature_column_names(self.xfns, self.nb_prev_actions)
+    def _feature_matrix(self, X: Union[pd.DataFrame, csr_matrix]) -> Union[pd.DataFrame, csr_matrix]:
+        # The feature columns of X, in the order of the feature plan
+        cols = self.feature_plan.columns
+        if issparse(X):
+            if X.shape[1] != len(cols):
+                raise ValueError(f"The sparse features have {X.shape[1]} columns instead of {len(cols)}")
+            return X.tocsr()
+        if list(X.columns) == cols:
+            return X
         if not set(cols).issubset(set(X.columns)):
             missing_cols = " and ".join(set(cols).difference(X.columns))
             raise ValueError(f"{missing_cols} are not available in the features dataframe")
+        return X[cols]
+
+    def _estimate_probabilities(self, X: Union[pd.DataFrame, csr_matrix]) -> pd.DataFrame:
+        # filter feature columns
+        X = self._feature_matrix(X)
+        # One contiguous matrix for the native predictors, shared by all heads
+        values = X if issparse(X) else X.to_numpy()
 
-        Y_hat = pd.DataFrame()
+        Y_hat = pd.DataFrame(index=None if issparse(X) else X.index)
         for col in self.__models:
-            Y_hat[col] = [p[1] for p in self.__models[col].predict_proba(X[cols])]
+            Y_hat[col] = self._predict(self.__models[col], X, values)
         return Y_hat
 
+    @staticmethod
+    def _predict(model: Any, X: Union[pd.DataFrame, csr_matrix], values: Union[np.ndarray, csr_matrix]) -> np.ndarray:
+        # The probability of the positive class, in a single call on the learner
+        if xgboost is not None and isinstance(model, (xgboost.Booster, xgboost.XGBClassifier)):
+            # Predict with the booster, up to the best iteration as predict_proba does
+            iteration_range = (0, model.best_iteration + 1) if hasattr(model, "best_iteration") else (0, 0)
+            booster = model if isinstance(model, xgboost.Booster) else model.get_booster()
+            return _dense_blocks(lambda rows: booster.inplace_predict(rows, iteration_range=iteration_range), values)
+        if lightgbm is not None and isinstance(model, lightgbm.Booster):
+            return model.predict(values)
+        return model.predict_proba(X)[:, 1]
+
     def rate(
         self,
         game: pd.Series,
@@ -339,7 +549,7 @@ class VAEP:
         if not self.__models:
             raise NotFittedError()
 
-        game_actions_with_names = self._spadlcfg.add_names(game_actions)  # type: ignore
+        game_actions_with_names = self._arpadlcfg.add_names(game_actions)  # type: ignore
         if game_states is None:
             game_states = self.compute_features(game, game_actions)
 
@@ -348,12 +558,114 @@ class VAEP:
         vaep_values = self._vaep.value(game_actions_with_names, p_scores, p_concedes)
         return vaep_values
 
-    def score(self, X: pd.DataFrame, y: pd.DataFrame) -> dict[str, dict[str, float]]:
+    def rate_many(
+        self,
+        actions: fs.Actions,
+        home_teams: Optional[dict[str, str]] = None,
+        game_states: Optional[Union[pd.DataFrame, csr_matrix]] = None,
+        store: Optional[Any] = None,
+        max_workers: Optional[int] = 1,
+    ) -> pd.DataFrame:
+        """
+        Compute the VAEP rating of the actions of many games at once.
+
+        The features of all games are computed or loaded in bulk, each learner
+        predicts all game states in a single call and the value formula is
+        applied to all actions at once.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame
+            The actions of one or more games in the SPADL representation.
+        home_teams : dict, optional
+            The home team of each game, keyed by 'match_id'. Derived from the
+            'match_id' of each game if None.
+        game_states : pd.DataFrame or scipy.sparse.csr_matrix, optional
+            The feature representation of each action. If None, it is loaded
+            from `store` or computed on-the-fly.
+        store : FeatureStore, optional
+            The :class:`~afl_analytics.vaep.store.FeatureStore` from which the
+            features of stored games are read and to which the others are
+            written.
+        max_workers : int, optional, default=1
+            Number of worker processes that compute the features when there
+            is no `store`. Uses the number of processors on the machine if None.
+
+        Raises
+        ------
+        NotFittedError
+            If the model is not fitted yet.
+
+        Returns
+        -------
+        ratings : pd.DataFrame
+            Returns the VAEP rating for each given action, as well as the
+            offensive and defensive value of each action.
+        """
+        if not self.__models:
+            raise NotFittedError()
+
+        if game_states is None:
+            if store is not None:
+                game_states = store.compute_features(self, actions, home_teams)
+            else:
+                game_states = self.compute_features_many(actions, home_teams, max_workers)
+
+        y_hat = self._estimate_probabilities(game_states)
+        actions_with_names = self._arpadlcfg.add_names(actions)  # type: ignore
+        vaep_values = self._vaep.value(actions_with_names, y_hat.scores.to_numpy(), y_hat.concedes.to_numpy())
+        return vaep_values.set_index(actions.index)
+
+    def save(self, path: str) -> None:
+        """
+        Save the fitted model to a directory.
+
+        Each learner is saved in the native format of its library, next to a
+        manifest with the feature transformers and the number of previous
+        actions of the model.
+
+        Parameters
+        ----------
+        path : str
+            The directory to save the model to. It is created if needed.
+
+        Raises
+        ------
+        NotFittedError
+            If the model is not fitted yet.
+        """
+        if not self.__models:
+            raise NotFittedError()
+        serialization.save(self, self.__models, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VAEP":
+        """
+        Load a model saved with :meth:`save`.
+
+        Only the manifest is read; each learner is read from disk on its first
+        prediction.
+
+        Parameters
+        ----------
+        path : str
+            The directory the model was saved to.
+
+        Returns
+        -------
+        VAEP
+            The fitted model.
+        """
+        model, models = serialization.load(cls, path)
+        model.__models = models
+        return model
+
+    def score(self, X: Union[pd.DataFrame, csr_matrix], y: pd.DataFrame) -> dict[str, dict[str, float]]:
         """Evaluate the fit of the model on the given test data and labels.
 
         Parameters
         ----------
-        X : pd.DataFrame
+        X : pd.DataFrame or scipy.sparse.csr_matrix
             Feature representation of the game states.
         y : pd.DataFrame
             Scoring and conceding labels for each game state.
@@ -379,4 +691,17 @@ class VAEP:
             scores[col]["brier"] = brier_score_loss(y[col], y_hat[col])
             scores[col]["auroc"] = roc_auc_score(y[col], y_hat[col])
 
-        return scores
\ No newline at end of file
+        return scores
+
+
+def _dense_blocks(predict: Any, values: Union[np.ndarray, csr_matrix]) -> np.ndarray:
+    # XGBoost treats the entries missing from a sparse matrix as missing values
+    # instead of zeros, so sparse features are predicted in dense blocks of rows
+    block_size = chunked._RowBlocks.block_size
+    if not issparse(values):
+        return predict(values)
+    if values.shape[0] <= block_size:
+        return predict(values.toarray())
+    return np.concatenate(
+        [predict(values[start : start + block_size].toarray()) for start in range(0, values.shape[0], block_size)]
+    )
@@ -0,0 +1,172 @@
+"""Match-partitioned computation of VAEP features and labels in a pool of processes.
+
+The actions are partitioned by 'match_id' and the matches are computed in
+worker processes. The workers write their rows straight into a result matrix
+in a memory-mapped file, in shared memory where the system has it, so only the
+actions of a match are pickled on the way in and nothing on the way out. The
+file is removed once the workers are done; the returned dataframe keeps its
+mapping, so the result is never copied.
+"""
+
+import os
+import tempfile
+import weakref
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from afl_analytics.utils import get_home_team_from_match_id
+
+# The model of a worker process, set once by the pool initializer
+_model: Any = None
+
+
+def compute_features_many(
+    model: Any,
+    actions: pd.DataFrame,
+    home_teams: Optional[dict[str, str]] = None,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Compute the features of the game states of many games in a pool of processes.
+
+    Parameters
+    ----------
+    model : VAEP
+        The VAEP or Atomic-VAEP model that computes the features. Its feature
+        transformers must be picklable.
+    actions : pd.DataFrame
+        The ARPADL or Atomic-ARPADL actions of one or more games.
+    home_teams : dict, optional
+        The home team of each game, keyed by 'match_id'. Derived from the
+        'match_id' of each game if None.
+    max_workers : int, optional
+        Number of worker processes. Uses the number of processors on the
+        machine if None. With a single worker the games are computed in the
+        calling process.
+
+    Returns
+    -------
+    pd.DataFrame
+        The features of each game state, in the order of the actions.
+    """
+    games = {
+        match_id: pd.Series(
+            {"home_team_id": home_teams[match_id] if home_teams is not None else get_home_team_from_match_id(match_id)}
+        )
+        for match_id in actions["match_id"].unique()
+    }
+    return _compute_many(model, "compute_features", actions, games, max_workers)
+
+
+def compute_labels_many(model: Any, actions: pd.DataFrame, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Compute the labels of the game states of many games in a pool of processes.
+
+    Parameters
+    ----------
+    model : VAEP
+        The VAEP or Atomic-VAEP model that computes the labels. Its label
+        transformers must be picklable.
+    actions : pd.DataFrame
+        The ARPADL or Atomic-ARPADL actions of one or more games.
+    max_workers : int, optional
+        Number of worker processes. Uses the number of processors on the
+        machine if None. With a single worker the games are computed in the
+        calling process.
+
+    Returns
+    -------
+    pd.DataFrame
+        The labels of each game state, in the order of the actions.
+    """
+    games = {match_id: pd.Series({"match_id": match_id}) for match_id in actions["match_id"].unique()}
+    return _compute_many(model, "compute_labels", actions, games, max_workers)
+
+
+def _compute_many(
+    model: Any,
+    method: str,
+    actions: pd.DataFrame,
+    games: dict[Any, pd.Series],
+    max_workers: Optional[int],
+) -> pd.DataFrame:
+    matches = list(actions.groupby("match_id", sort=False).indices.items())
+    if not matches:
+        return pd.DataFrame(index=actions.index)
+
+    # The first match fixes the columns and type of the result
+    first_id, first_rows = matches[0]
+    first = getattr(model, method)(games[first_id], actions.iloc[first_rows])
+    shape = (len(actions), first.shape[1])
+    dtype = first.to_numpy().dtype
+    if max_workers == 1 or len(matches) == 1 or 0 in shape:
+        values = np.empty(shape, dtype=dtype)
+        values[first_rows] = first.to_numpy()
+        for match_id, rows in matches[1:]:
+            values[rows] = getattr(model, method)(games[match_id], actions.iloc[rows]).to_numpy()
+        return pd.DataFrame(values, index=actions.index, columns=first.columns, copy=False)
+
+    fd, path = tempfile.mkstemp(prefix="vaep-", suffix=".bin", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.close(fd)
+    mapped: Optional[np.memmap] = None
+    try:
+        mapped = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        mapped[first_rows] = first.to_numpy()
+
+        # Workers only need the configuration of the model, not its fitted learners
+        worker_model = type(model)(model.xfns, model.nb_prev_actions)
+        worker_model.yfns = model.yfns
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(worker_model,)) as executor:
+            # Keep a bounded number of matches in flight
+            window = 2 * (max_workers or os.cpu_count() or 1)
+            pending: deque[Future] = deque()
+            for match_id, rows in matches[1:]:
+                pending.append(
+                    executor.submit(
+                        _compute_match, method, games[match_id], actions.iloc[rows], rows, path, shape, dtype.str
+                    )
+                )
+                if len(pending) >= window:
+                    pending.popleft().result()
+            while pending:
+                pending.popleft().result()
+    finally:
+        try:
+            # The mapping outlives the file, so the result stays in shared memory
+            os.remove(path)
+        except OSError:
+            # A mapped file cannot be removed on Windows; remove it with its mapping
+            weakref.finalize(mapped, _remove, path)
+    return pd.DataFrame(mapped, index=actions.index, columns=first.columns, copy=False)
+
+
+def _init_worker(model: Any) -> None:
+    global _model
+    _model = model
+
+
+def _compute_match(
+    method: str,
+    game: pd.Series,
+    match_actions: pd.DataFrame,
+    rows: np.ndarray,
+    path: str,
+    shape: tuple[int, int],
+    dtype: str,
+) -> None:
+    computed: Callable[..., pd.DataFrame] = getattr(_model, method)
+    match_values = computed(game, match_actions).to_numpy()
+    values = np.memmap(path, dtype=np.dtype(dtype), mode="r+", shape=shape)
+    values[rows] = match_values
+    del values
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,288 @@
+"""Out-of-core training of the VAEP learners on chunks of game states.
+
+The training data is an iterable of ``(X, y)`` chunks that is read several
+times, for instance the memory-mapped matches returned by
+:meth:`afl_analytics.vaep.store.FeatureStore.chunks`. Every chunk holds the
+game states of one or more whole matches, and the validation set is a random
+subset of the chunks, so no match is split between the training and the
+validation set. The learners bin the chunks one at a time; the features are
+never concatenated in memory.
+"""
+
+from typing import Any, Iterable, Iterator, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from scipy.sparse import csr_matrix, issparse  # type: ignore
+
+try:
+    import xgboost
+except ImportError:
+    xgboost = None  # type: ignore
+try:
+    import lightgbm
+except ImportError:
+    lightgbm = None  # type: ignore
+
+Chunk = tuple[Union[pd.DataFrame, np.ndarray, csr_matrix], pd.DataFrame]
+
+
+def is_validation(chunk: int, val_size: float, random_state: int = 0) -> bool:
+    """Return whether a chunk belongs to the validation set.
+
+    The split only depends on the position of the chunk, so every pass over
+    the chunks puts the same chunks in the validation set.
+
+    Parameters
+    ----------
+    chunk : int
+        The position of the chunk.
+    val_size : float
+        The expected fraction of the chunks in the validation set.
+    random_state : int, default=0
+        The seed of the split.
+
+    Returns
+    -------
+    bool
+        True if the chunk belongs to the validation set.
+    """
+    return bool(np.random.default_rng([random_state, chunk]).random() < val_size)
+
+
+def train_xgboost(
+    chunks: Iterable[Chunk],
+    label: str,
+    columns: list[str],
+    val_size: float = 0.25,
+    tree_params: Optional[dict[str, Any]] = None,
+    num_boost_round: int = 100,
+    cache_dir: Optional[str] = None,
+    random_state: int = 0,
+) -> "xgboost.Booster":
+    """Train an XGBoost booster on chunks of game states.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The ``(X, y)`` chunks. It is iterated once per pass of XGBoost.
+    label : str
+        The label column of ``y`` to learn.
+    columns : list(str)
+        The feature columns, in the order of the feature plan.
+    val_size : float, default=0.25
+        The expected fraction of the chunks used as the validation set for
+        early stopping. When zero, no validation data will be used.
+    tree_params : dict, optional
+        Parameters passed to :func:`xgboost.train`.
+    num_boost_round : int, default=100
+        The maximum number of boosting rounds.
+    cache_dir : str, optional
+        Directory in which XGBoost pages the binned features to disk. The
+        binned features are kept in memory if None.
+    random_state : int, default=0
+        The seed of the validation split.
+
+    Raises
+    ------
+    ImportError
+        If xgboost is not installed.
+    ValueError
+        If none of the chunks is in the training set.
+
+    Returns
+    -------
+    xgboost.Booster
+        The trained booster.
+    """
+    if xgboost is None:
+        raise ImportError("xgboost is not installed.")
+    if tree_params is None:
+        tree_params = {"max_depth": 3, "objective": "binary:logistic", "eval_metric": "auc"}
+
+    def matrix(validation: bool, ref: Optional["xgboost.DMatrix"] = None) -> "xgboost.DMatrix":
+        prefix = None if cache_dir is None else f"{cache_dir}/{label}-{'val' if validation else 'train'}"
+        batches = _XGBoostChunks(chunks, label, columns, validation, val_size, random_state, prefix)
+        if prefix is not None:
+            return xgboost.ExtMemQuantileDMatrix(batches, ref=ref)
+        return xgboost.QuantileDMatrix(batches, ref=ref)
+
+    if not _has_split(chunks, False, val_size, random_state):
+        raise ValueError(_no_training_chunk)
+    dtrain = matrix(validation=False)
+    evals = []
+    if val_size > 0 and _has_split(chunks, True, val_size, random_state):
+        evals = [(matrix(validation=True, ref=dtrain), "validation")]
+    return xgboost.train(
+        tree_params,
+        dtrain,
+        num_boost_round,
+        evals=evals,
+        early_stopping_rounds=10 if evals else None,
+        verbose_eval=False,
+    )
+
+
+def train_lightgbm(
+    chunks: Iterable[Chunk],
+    label: str,
+    columns: list[str],
+    val_size: float = 0.25,
+    tree_params: Optional[dict[str, Any]] = None,
+    num_boost_round: int = 100,
+    random_state: int = 0,
+) -> "lightgbm.Booster":
+    """Train a LightGBM booster on chunks of game states.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The ``(X, y)`` chunks. The chunks are read in batches while LightGBM
+        bins them, so they should be memory-mapped for data sets that do not
+        fit in memory.
+    label : str
+        The label column of ``y`` to learn.
+    columns : list(str)
+        The feature columns, in the order of the feature plan.
+    val_size : float, default=0.25
+        The expected fraction of the chunks used as the validation set for
+        early stopping. When zero, no validation data will be used.
+    tree_params : dict, optional
+        Parameters passed to :func:`lightgbm.train`.
+    num_boost_round : int, default=100
+        The maximum number of boosting rounds.
+    random_state : int, default=0
+        The seed of the validation split.
+
+    Raises
+    ------
+    ImportError
+        If lightgbm is not installed.
+    ValueError
+        If none of the chunks is in the training set.
+
+    Returns
+    -------
+    lightgbm.Booster
+        The trained booster.
+    """
+    if lightgbm is None:
+        raise ImportError("lightgbm is not installed.")
+    if tree_params is None:
+        tree_params = {"max_depth": 3, "objective": "binary", "metric": "auc", "verbose": -1}
+
+    splits: dict[bool, tuple[list, list]] = {False: ([], []), True: ([], [])}
+    for i, (X, y) in enumerate(chunks):
+        sequences, labels = splits[val_size > 0 and is_validation(i, val_size, random_state)]
+        sequences.append(_LightGBMChunk(_feature_matrix(X, columns)))
+        labels.append(y[label].to_numpy())
+
+    if not splits[False][0]:
+        raise ValueError(_no_training_chunk)
+    dtrain = lightgbm.Dataset(splits[False][0], label=np.concatenate(splits[False][1]), params=tree_params)
+    valid_sets, callbacks = [], []
+    if splits[True][0]:
+        valid_sets = [lightgbm.Dataset(splits[True][0], label=np.concatenate(splits[True][1]), reference=dtrain)]
+        callbacks = [lightgbm.early_stopping(10, verbose=False)]
+    return lightgbm.train(tree_params, dtrain, num_boost_round, valid_sets=valid_sets, callbacks=callbacks)
+
+
+def _feature_matrix(
+    X: Union[pd.DataFrame, np.ndarray, csr_matrix], columns: list[str]
+) -> Union[np.ndarray, csr_matrix]:
+    # The feature columns of a chunk, without copying a chunk that is already in plan order
+    if isinstance(X, pd.DataFrame):
+        if list(X.columns) != columns:
+            X = X[columns]
+        return X.to_numpy()
+    if X.shape[1] != len(columns):
+        raise ValueError(f"The features have {X.shape[1]} columns instead of {len(columns)}")
+    return X
+
+
+def _has_split(chunks: Iterable[Chunk], validation: bool, val_size: float, random_state: int) -> bool:
+    # Whether any chunk falls in the validation set, or in the training set
+    return any((val_size > 0 and is_validation(i, val_size, random_state)) == validation for i, _ in enumerate(chunks))
+
+
+_no_training_chunk = "None of the chunks is in the training set; lower val_size or split the data in more chunks"
+
+
+class _RowBlocks:
+    """The rows of a feature matrix and its labels as chunks, sliced again on each pass."""
+
+    block_size = 65536
+
+    def __init__(self, X: Union[np.ndarray, csr_matrix], y: pd.DataFrame) -> None:
+        self.X = X
+        self.y = y
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for start in range(0, self.X.shape[0], self.block_size):
+            stop = start + self.block_size
+            yield self.X[start:stop], self.y.iloc[start:stop]
+
+
+if xgboost is not None:
+
+    class _XGBoostChunks(xgboost.DataIter):
+        """The chunks of the training or the validation set, for XGBoost."""
+
+        def __init__(
+            self,
+            chunks: Iterable[Chunk],
+            label: str,
+            columns: list[str],
+            validation: bool,
+            val_size: float,
+            random_state: int,
+            cache_prefix: Optional[str],
+        ) -> None:
+            self._chunks = chunks
+            self._label = label
+            self._columns = columns
+            self._validation = validation
+            self._val_size = val_size
+            self._random_state = random_state
+            self._iterator: Optional[Iterator[tuple[int, Chunk]]] = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data: Any) -> bool:
+            if self._iterator is None:
+                self._iterator = enumerate(self._chunks)
+            for i, (X, y) in self._iterator:
+                in_validation = self._val_size > 0 and is_validation(i, self._val_size, self._random_state)
+                if in_validation == self._validation:
+                    # XGBoost treats the entries missing from a sparse chunk as
+                    # missing values instead of zeros, so it gets them densely
+                    X = _feature_matrix(X, self._columns)
+                    data = X.toarray() if issparse(X) else X
+                    input_data(data=data, label=y[self._label].to_numpy())
+                    return True
+            return False
+
+        def reset(self) -> None:
+            self._iterator = None
+
+
+if lightgbm is not None:
+
+    class _LightGBMChunk(lightgbm.Sequence):
+        """The rows of a chunk, read in batches while LightGBM bins them."""
+
+        batch_size = 4096
+
+        def __init__(self, X: Union[np.ndarray, csr_matrix]) -> None:
+            self.X = X
+
+        def __getitem__(self, idx: Union[int, slice, np.ndarray]) -> np.ndarray:
+            rows = self.X[idx]
+            if issparse(rows):
+                rows = rows.toarray()
+                if np.isscalar(idx):
+                    rows = rows[0]
+            # LightGBM samples the rows as doubles
+            return np.asarray(rows, dtype=np.float64)
+
+        def __len__(self) -> int:
+            return self.X.shape[0]
@@ -1,8 +1,7 @@
-
 """Implements the feature tranformers of the VAEP framework."""
 
 from functools import wraps
-from typing import Any, Callable, Union, no_type_check
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union, no_type_check, overload
 
 import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
@@ -11,13 +10,125 @@ from pandera.typing import DataFrame
 import afl_analytics.arpadl.config as arpadlcfg
 from afl_analytics.arpadl.atomic.schema import AtomicARPADLSchema
 from afl_analytics.arpadl.schema import ARPADLSchema
+from afl_analytics.utils import get_home_team_from_match_id
 
 arpadlActions = DataFrame[ARPADLSchema]
 Actions = Union[DataFrame[ARPADLSchema], DataFrame[AtomicARPADLSchema]]
-GameStates = list[Actions]
 Features = DataFrame[Any]
+
+_numeric_fields: list[str] = ["period_id", "time_seconds", "start_x", "start_y", "end_x", "end_y"]
+_coded_fields: dict[str, Optional[list[str]]] = {
+    "team": None,
+    "player": None,
+    "action_type": arpadlcfg.actiontypes,
+    "bodypart": arpadlcfg.bodyparts,
+    "result": arpadlcfg.results,
+}
+
+
+class GameStates:
+    """The game states of the actions of one or more matches.
+
+    The previous actions of every action are stored in one contiguous
+    (n_actions, nb_prev_actions, n_fields) array. Team, player, action type,
+    bodypart and result are stored as integer codes into :attr:`categories`.
+
+    For the feature transformers, the game states also behave like the list
+    of actions dataframes :math:`[a_0,a_1,\\ldots]` used by earlier versions:
+    ``gamestates[i]`` returns a dataframe with the i-th previous action of
+    each action, built from the array on first access.
+
+    Parameters
+    ----------
+    index : pd.Index
+        The index of the actions.
+    match : np.ndarray
+        The match of each action, as integer codes.
+    match_ids : np.ndarray
+        The match IDs, indexed by the match codes.
+    values : np.ndarray
+        The fields of the previous actions of each action, with shape
+        (n_actions, nb_prev_actions, n_fields).
+    categories : dict(str, np.ndarray)
+        The names of the codes of each coded field.
+
+    Attributes
+    ----------
+    fields : list(str)
+        The fields of an action, in the order of the last axis of `values`.
+    coded_fields : dict(str, list(str))
+        The categories of each coded field, or None if its codes are assigned
+        in order of appearance.
+    """
+
+    fields: list[str] = _numeric_fields + list(_coded_fields)
+    coded_fields: dict[str, Optional[list[str]]] = _coded_fields
+
+    def __init__(
+        self,
+        index: pd.Index,
+        match: np.ndarray,
+        match_ids: np.ndarray,
+        values: np.ndarray,
+        categories: dict[str, np.ndarray],
+    ) -> None:
+        self.index = index
+        self.match = match
+        self.match_ids = match_ids
+        self.values = values
+        self.categories = categories
+        self._frames: dict[int, pd.DataFrame] = {}
+
+    def field(self, name: str) -> np.ndarray:
+        """Return a (n_actions, nb_prev_actions) view of a field."""
+        return self.values[:, :, self.fields.index(name)]
+
+    @property
+    def nb_prev_actions(self) -> int:
+        """The number of actions in each game state."""
+        return self.values.shape[1]
+
+    def __len__(self) -> int:
+        return self.nb_prev_actions
+
+    @overload
+    def __getitem__(self, i: int) -> pd.DataFrame: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[pd.DataFrame]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[pd.DataFrame, list[pd.DataFrame]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("game state index out of range")
+        if i not in self._frames:
+            self._frames[i] = self._frame(i)
+        return self._frames[i]
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return (self[i] for i in range(len(self)))
+
+    def _frame(self, i: int) -> pd.DataFrame:
+        # The i-th previous action of each action as an actions dataframe
+        lag = self.values[:, i, :]
+        frame = {"match_id": self.match_ids[self.match]}
+        for j, col in enumerate(self.fields):
+            if col in self.coded_fields:
+                frame[col] = pd.Categorical.from_codes(lag[:, j].astype(np.int64), self.categories[col])
+            elif col == "period_id":
+                frame[col] = lag[:, j].astype(np.int64)
+            else:
+                frame[col] = lag[:, j]
+        return pd.DataFrame(frame, index=self.index)
+
+
 FeatureTransfomer = Callable[[GameStates], Features]
 
+G = TypeVar("G", bound=GameStates)
+
 
 def feature_column_names(fs: list[FeatureTransfomer], nb_prev_actions: int = 3) -> list[str]:
     """Return the names of the features generated by a list of transformers.
@@ -60,15 +171,14 @@ def gamestates(actions: Actions, nb_prev_actions: int = 3) -> GameStates:
     r"""Convert a dataframe of actions to gamestates.
 
     Each gamestate is represented as the <nb_prev_actions> previous actions.
-
-    The list of gamestates is internally represented as a list of actions
-    dataframes :math:`[a_0,a_1,\ldots]` where each row in the a_i dataframe contains the
-    previous action of the action in the same row in the :math:`a_{i-1}` dataframe.
+    The previous actions never cross a match or period boundary; at the start
+    of a period the first action of the period is repeated.
 
     Parameters
     ----------
     actions : Actions
-        A DataFrame with the actions of a game.
+        A DataFrame with the actions of one or more games, ordered by match,
+        period and time.
     nb_prev_actions : int, default=3  # noqa: DAR103
         The number of previous actions included in the game state.
 
@@ -82,19 +192,50 @@ def gamestates(actions: Actions, nb_prev_actions: int = 3) -> GameStates:
     GameStates
          The <nb_prev_actions> previous actions for each action.
     """
+    return _gamestates(GameStates, actions, nb_prev_actions)
+
+
+def _gamestates(cls: type[G], actions: Actions, nb_prev_actions: int) -> G:
+    # The game states of the actions, with the fields of the given game states class
     if nb_prev_actions < 1:
         raise ValueError("The game state should include at least one preceding action.")
-    states = [actions]
-    for i in range(1, nb_prev_actions):
-        prev_actions = actions.groupby(["match_id", "period_id"], sort=False, as_index=False).apply(
-            lambda x: x.shift(i, fill_value=float("nan")).fillna(x.iloc[0])  # noqa: B023
-        )
-        prev_actions.index = actions.index.copy()
-        states.append(prev_actions)  # type: ignore
-    return states
+
+    match, match_ids = pd.factorize(actions["match_id"])
+    period = actions["period_id"].to_numpy()
+    n = len(match)
+
+    # Row i - lag, but never before the first action of the period
+    new_period = np.ones(n, dtype=bool)
+    new_period[1:] = (match[1:] != match[:-1]) | (period[1:] != period[:-1])
+    period_start = np.maximum.accumulate(np.where(new_period, np.arange(n), 0))
+    lags = np.arange(nb_prev_actions)
+    prev = np.maximum(np.arange(n)[:, None] - lags[None, :], period_start[:, None])
+
+    fields = np.empty((n, len(cls.fields)), dtype=np.float64)
+    categories = {}
+    for j, col in enumerate(cls.fields):
+        if col not in cls.coded_fields:
+            fields[:, j] = actions[col].to_numpy(dtype=np.float64)
+            continue
+        names = cls.coded_fields[col]
+        if names is None:
+            codes, names = pd.factorize(actions[col])
+        else:
+            codes = _category_codes(actions[col], names)
+        fields[:, j] = codes
+        categories[col] = np.asarray(names, dtype=object)
+    return cls(
+        actions.index,
+        match,
+        np.asarray(match_ids, dtype=object),
+        fields[prev],
+        categories,
+    )
 
 
-def play_left_to_right(gamestates: GameStates, home_team: str) -> GameStates:
+def play_left_to_right(
+    gamestates: GameStates, home_team: Optional[Union[str, dict[str, str]]] = None
+) -> GameStates:
     """Perform all actions in a gamestate in the same playing direction.
 
     This changes the start and end location of each action in a gamestate,
@@ -104,9 +245,10 @@ def play_left_to_right(gamestates: GameStates, home_team: str) -> GameStates:
     Parameters
     ----------
     gamestates : GameStates
-        The game states of a game.
-    home_team_id : int
-        The ID of the home team.
+        The game states of one or more games.
+    home_team : str or dict, optional
+        The home team of a single game, or the home team of each game keyed
+        by 'match_id'. Derived from the 'match_id' of each game if None.
 
     Returns
     -------
@@ -117,16 +259,34 @@ def play_left_to_right(gamestates: GameStates, home_team: str) -> GameStates:
     --------
     socceraction.vaep.features.play_left_to_right : For transforming actions.
     """
-    a0 = gamestates[0]
-    away_idx = a0.team != home_team
-    for actions in gamestates:
-        for col in ["start_x", "end_x"]:
-            actions.loc[away_idx, col] = arpadlcfg.field_length - actions[away_idx][col].values
-        for col in ["start_y", "end_y"]:
-            actions.loc[away_idx, col] = arpadlcfg.field_width - actions[away_idx][col].values
+    # The home team of the match of each action, as a team code
+    team_codes = {name: code for code, name in enumerate(gamestates.categories["team"])}
+    match_ids = gamestates.match_ids
+    if home_team is None:
+        home_teams = [get_home_team_from_match_id(match_id) for match_id in match_ids]
+    elif isinstance(home_team, dict):
+        home_teams = [home_team[match_id] for match_id in match_ids]
+    else:
+        home_teams = [home_team] * len(match_ids)
+    home_codes = np.array([team_codes.get(team, -1) for team in home_teams] + [-1])
+
+    values = gamestates.values
+    away = values[:, 0, GameStates.fields.index("team")] != home_codes[gamestates.match]
+    sign = np.where(away, -1.0, 1.0)[:, None, None]
+    for cols, length in [(["start_x", "end_x"], arpadlcfg.field_length), (["start_y", "end_y"], arpadlcfg.field_width)]:
+        j = [GameStates.fields.index(col) for col in cols]
+        values[:, :, j] = away[:, None, None] * length + sign * values[:, :, j]
+    gamestates._frames.clear()
     return gamestates
 
 
+def _category_codes(values: pd.Series, categories: list[str]) -> np.ndarray:
+    """Return the position of each value in `categories`, or -1 if it is not one of them."""
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == categories:
+        return values.cat.codes.values
+    return pd.Categorical(values, categories=categories).codes
+
+
 @no_type_check
 def simple(actionfn: Callable) -> FeatureTransfomer:
     """Make a function decorator to apply actionfeatures to game states.
@@ -143,8 +303,8 @@ def simple(actionfn: Callable) -> FeatureTransfomer:
     """
 
     @wraps(actionfn)
-    def _wrapper(gamestates: list[Actions]) -> pd.DataFrame:
-        if not isinstance(gamestates, (list,)):
+    def _wrapper(gamestates: Union[GameStates, list[Actions]]) -> pd.DataFrame:
+        if not isinstance(gamestates, (list, GameStates)):
             gamestates = [gamestates]
         X = []
         for i, a in enumerate(gamestates):
@@ -197,9 +357,10 @@ def actiontype_onehot(actions: arpadlActions) -> Features:
         A one-hot encoding of each action's type.
     """
     X = {}
-    for _, type_name in enumerate(arpadlcfg.actiontypes):
+    codes = _category_codes(actions["action_type"], arpadlcfg.actiontypes)
+    for type_id, type_name in enumerate(arpadlcfg.actiontypes):
         col = "actiontype_" + type_name
-        X[col] = actions["action_type"] == type_name
+        X[col] = codes == type_id
     return pd.DataFrame(X, index=actions.index)
 
 
@@ -241,9 +402,10 @@ def result_onehot(actions: arpadlActions) -> Features:
         The one-hot encoding of each action's result.
     """
     X = {}
-    for _, result_name in enumerate(arpadlcfg.results):
+    codes = _category_codes(actions["result"], arpadlcfg.results)
+    for result_id, result_name in enumerate(arpadlcfg.results):
         col = "result_" + result_name
-        X[col] = actions["result"] == result_name
+        X[col] = codes == result_id
     return pd.DataFrame(X, index=actions.index)
 
 
@@ -358,7 +520,8 @@ def bodypart_onehot(actions: Actions) -> Features:
         An alternative version that splits between the left and right foot.
     """
     X = {}
-    for _, bodypart_name in enumerate(arpadlcfg.bodyparts):
+    codes = _category_codes(actions["bodypart"], arpadlcfg.bodyparts)
+    for bodypart_id, bodypart_name in enumerate(arpadlcfg.bodyparts):
         # if bodypart_name in ("foot_left", "foot_right"):
         #     continue
         col = "bodypart_" + bodypart_name
@@ -373,7 +536,7 @@ def bodypart_onehot(actions: Actions) -> Features:
         #     head_other_id = arpadlcfg.bodyparts.index("head/other")
         #     X[col] = actions["bodypart_id"].isin([head_id, other_id, head_other_id])
         # else:
-        X[col] = actions["bodypart"] == bodypart_name
+        X[col] = codes == bodypart_id
     return pd.DataFrame(X, index=actions.index)
 
 
@@ -696,12 +859,14 @@ def speed(gamestates: GameStates) -> Features:
 
 
 def goalscore(gamestates: GameStates) -> Features:
-    """Get the number of goals scored by each team after the action.
+    """Get the number of goals scored by each team before the action.
+
+    The goals are counted from the start of the match of each action.
 
     Parameters
     ----------
     gamestates : GameStates
-        The gamestates of a game.
+        The game states of one or more games.
 
     Returns
     -------
@@ -710,20 +875,36 @@ def goalscore(gamestates: GameStates) -> Features:
         game state ('goalscore_team'), by the opponent ('goalscore_opponent'),
         and the goal difference between both teams ('goalscore_diff').
     """
-    actions = gamestates[0]
-    teamA = actions["team"].values[0]
-    goals = actions["action_type"].str.contains("shot") & (
-        actions["result"] == "goal"
+    shots = [i for i, name in enumerate(arpadlcfg.actiontypes) if "shot" in name]
+    goals = np.isin(gamestates.field("action_type")[:, 0], shots) & (
+        gamestates.field("result")[:, 0] == arpadlcfg.results.index("goal")
     )
-    teamisA = actions["team"] == teamA
-    teamisB = ~teamisA
-    goalsteamA = (goals & teamisA)
-    goalsteamB = (goals & teamisB)
-    goalscoreteamA = goalsteamA.cumsum() - goalsteamA
-    goalscoreteamB = goalsteamB.cumsum() - goalsteamB
-
-    scoredf = pd.DataFrame(index=actions.index)
-    scoredf["goalscore_team"] = (goalscoreteamA * teamisA) + (goalscoreteamB * teamisB)
-    scoredf["goalscore_opponent"] = (goalscoreteamB * teamisA) + (goalscoreteamA * teamisB)
-    scoredf["goalscore_diff"] = scoredf["goalscore_team"] - scoredf["goalscore_opponent"]
-    return scoredf
+    return _goalscore(gamestates, goals)
+
+
+def _goalscore(gamestates: GameStates, goals: np.ndarray) -> Features:
+    # The goals of each team before each action, given which actions are goals
+    scores = _goals_before(gamestates.match, gamestates.field("team")[:, 0], goals)
+    return pd.DataFrame(
+        dict(zip(["goalscore_team", "goalscore_opponent", "goalscore_diff"], scores)), index=gamestates.index
+    )
+
+
+def _goals_before(match: np.ndarray, team: np.ndarray, goals: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The goals of the team of each action and of its opponent before the
+    # action, counted from the start of its match, and their difference
+    n = len(match)
+    match_start = np.ones(n, dtype=bool)
+    match_start[1:] = match[1:] != match[:-1]
+    first = np.maximum.accumulate(np.where(match_start, np.arange(n), 0))
+    # Team A is the team of the first action of each match
+    teamisA = team == team[first]
+
+    scores = []
+    for team_goals in (goals & teamisA, goals & ~teamisA):
+        before = np.cumsum(team_goals) - team_goals
+        scores.append(before - before[first])
+    goalscoreteamA, goalscoreteamB = scores
+    goalscore_team = np.where(teamisA, goalscoreteamA, goalscoreteamB)
+    goalscore_opponent = np.where(teamisA, goalscoreteamB, goalscoreteamA)
+    return goalscore_team, goalscore_opponent, goalscore_team - goalscore_opponent
@@ -1,19 +1,56 @@
 
-"""Implements the formula of the VAEP framework."""
+"""Implements the formula of the VAEP framework.
 
+The values are computed for the actions of one or more matches at once. The
+first action of every period has no previous game state, so its value is the
+full scoring and conceding probability of its own game state.
+"""
+
+from typing import Optional
+
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 from pandera.typing import DataFrame, Series
 
 from afl_analytics.arpadl.schema import ARPADLSchema
 
-
-def _prev(x: pd.Series) -> pd.Series:
-    prev_x = x.shift(1)
-    prev_x[:1] = x.values[0]
-    return prev_x
+_samephase_nb: int = 10
 
 
-_samephase_nb: int = 10
+def _values(
+    actions: DataFrame[ARPADLSchema],
+    scores: Series[float],
+    concedes: Series[float],
+    goal: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    # The offensive and defensive value of each action, in a single pass. The
+    # goals are the shots that resulted in a goal unless a mask of them is given,
+    # as for atomic actions.
+    scores, concedes = np.asarray(scores, dtype=float), np.asarray(concedes, dtype=float)
+    offensive, defensive = scores.copy(), -concedes
+    if len(scores) < 2:
+        return offensive, defensive
+
+    match = actions["match_id"].to_numpy()
+    period = actions["period_id"].to_numpy()
+    team = actions["team"].to_numpy()
+    time_seconds = actions["time_seconds"].to_numpy(dtype=float)
+    if goal is None:
+        goal = (actions["action_type"].to_numpy() == "shot") & (actions["result"].to_numpy() == "goal")
+
+    # The probabilities before each action, from its team's point of view. They
+    # are 0 at the start of a period, if the previous action was too long ago,
+    # or if the previous action was a goal.
+    sameteam = team[1:] == team[:-1]
+    carry = ~(
+        (match[1:] != match[:-1])
+        | (period[1:] != period[:-1])
+        | (np.abs(time_seconds[1:] - time_seconds[:-1]) > _samephase_nb)
+        | goal[:-1]
+    )
+    offensive[1:] -= np.where(carry, np.where(sameteam, scores[:-1], concedes[:-1]), 0.0)
+    defensive[1:] += np.where(carry, np.where(sameteam, concedes[:-1], scores[:-1]), 0.0)
+    return offensive, defensive
 
 
 def offensive_value(
@@ -35,7 +72,7 @@ def offensive_value(
     Parameters
     ----------
     actions : pd.DataFrame
-        SPADL action.
+        The SPADL actions of one or more matches.
     scores : pd.Series
         The probability of scoring from each corresponding game state.
     concedes : pd.Series
@@ -46,20 +83,8 @@ def offensive_value(
     pd.Series
         The offensive value of each action.
     """
-    sameteam = _prev(actions.team) == actions.team
-    prev_scores = (_prev(scores) * sameteam + _prev(concedes) * (~sameteam)).astype(float)
-
-    # if the previous action was too long ago, the odds of scoring are now 0
-    toolong_idx = abs(actions.time_seconds - _prev(actions.time_seconds)) > _samephase_nb
-    prev_scores[toolong_idx] = 0.0
-
-    # if the previous action was a goal, the odds of scoring are now 0
-    prevgoal_idx = (_prev(actions.action_type).isin(["shot"])) & (
-        _prev(actions.result) == "goal"
-    )
-    prev_scores[prevgoal_idx] = 0.0
-
-    return scores - prev_scores
+    offensive, _ = _values(actions, scores, concedes)
+    return pd.Series(offensive, index=actions.index)
 
 
 def defensive_value(
@@ -81,7 +106,7 @@ def defensive_value(
     Parameters
     ----------
     actions : pd.DataFrame
-        SPADL action.
+        The SPADL actions of one or more matches.
     scores : pd.Series
         The probability of scoring from each corresponding game state.
     concedes : pd.Series
@@ -92,19 +117,8 @@ def defensive_value(
     pd.Series
         The defensive value of each action.
     """
-    sameteam = _prev(actions.team) == actions.team
-    prev_concedes = (_prev(concedes) * sameteam + _prev(scores) * (~sameteam)).astype(float)
-
-    toolong_idx = abs(actions.time_seconds - _prev(actions.time_seconds)) > _samephase_nb
-    prev_concedes[toolong_idx] = 0.0
-
-    # if the previous action was a goal, the odds of conceding are now 0
-    prevgoal_idx = (_prev(actions.action_type).isin(["shot"])) & (
-        _prev(actions.result) == "goal"
-    )
-    prev_concedes[prevgoal_idx] = 0.0
-
-    return -(concedes - prev_concedes)
+    _, defensive = _values(actions, scores, concedes)
+    return pd.Series(defensive, index=actions.index)
 
 
 def value(
@@ -122,7 +136,7 @@ def value(
     Parameters
     ----------
     actions : pd.DataFrame
-        SPADL action.
+        The SPADL actions of one or more matches.
     Pscores : pd.Series
         The probability of scoring from each corresponding game state.
     Pconcedes : pd.Series
@@ -138,8 +152,10 @@ def value(
     :func:`~socceraction.vaep.formula.offensive_value`: The offensive value
     :func:`~socceraction.vaep.formula.defensive_value`: The defensive value
     """
-    v = pd.DataFrame()
-    v["offensive_value"] = offensive_value(actions, Pscores, Pconcedes)
-    v["defensive_value"] = defensive_value(actions, Pscores, Pconcedes)
+    offensive, defensive = _values(actions, Pscores, Pconcedes)
+
+    v = pd.DataFrame(index=actions.index)
+    v["offensive_value"] = offensive
+    v["defensive_value"] = defensive
     v["vaep_value"] = v["offensive_value"] + v["defensive_value"]
     return v
@@ -0,0 +1,151 @@
+"""Incremental computation of the VAEP features of actions as they are appended to a match.
+
+The features of a game state only depend on its action and the previous
+``nb_prev_actions - 1`` actions of the same period, except for the goalscore
+features, which count the goals since the start of the match. The engine keeps
+the last actions of each match and the goalscore of the oldest of them, so the
+features of appended actions are computed from a small window instead of the
+whole match.
+"""
+
+from typing import Any, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from afl_analytics.utils import get_home_team_from_match_id
+
+_goalscore_columns = ["goalscore_team", "goalscore_opponent", "goalscore_diff"]
+
+
+class IncrementalFeatures:
+    """
+    Compute the features of the actions appended to one or more matches.
+
+    The features of each action are identical to those computed by
+    :meth:`~afl_analytics.vaep.base.VAEP.compute_features` on the whole match.
+    The actions of a match have to be appended in order.
+
+    Parameters
+    ----------
+    model : VAEP
+        The VAEP or Atomic-VAEP model that computes the features.
+    home_teams : dict, optional
+        The home team of each game, keyed by 'match_id'. Derived from the
+        'match_id' of each game if None.
+
+    Examples
+    --------
+    >>> engine = IncrementalFeatures(VAEP())
+    >>> for new_actions in feed:  # doctest: +SKIP
+    ...     X = engine.update(new_actions)
+    """
+
+    def __init__(self, model: Any, home_teams: Optional[dict[str, str]] = None) -> None:
+        self.model = model
+        self.home_teams = home_teams
+        # The last actions of each match, which precede the next appended actions
+        self._tails: dict[str, pd.DataFrame] = {}
+        # The team and goalscore of the first action in the tail of each match
+        self._scores: dict[str, tuple[Any, float, float]] = {}
+
+    @property
+    def matches(self) -> list[str]:
+        """The matches for which actions were appended."""
+        return list(self._tails)
+
+    def update(self, actions: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append actions and compute their features.
+
+        Parameters
+        ----------
+        actions : pd.DataFrame
+            The new ARPADL or Atomic-ARPADL actions of one or more matches,
+            which follow the actions appended before.
+
+        Returns
+        -------
+        pd.DataFrame
+            The features of the game state of each new action, in the order of
+            `actions`.
+        """
+        plan = self.model.feature_plan
+        matches = actions.groupby(actions["match_id"].astype(str), sort=False).indices
+        if not matches:
+            return pd.DataFrame(index=actions.index, columns=plan.columns, dtype=plan.dtype)
+
+        # The window of each match is its tail followed by the new actions
+        windows, bounds = [], []
+        end = 0
+        for match_id, rows in matches.items():
+            tail = self._tails.get(match_id, actions.iloc[:0])
+            windows += [tail, actions.iloc[rows]]
+            start, end = end, end + len(tail) + len(rows)
+            bounds.append((start, end))
+        window = pd.concat(windows)
+
+        actions_with_names = self.model._arpadlcfg.add_names(window)  # type: ignore
+        gamestates = self.model._fs.gamestates(actions_with_names, self.model.nb_prev_actions)
+        gamestates = self.model._fs.play_left_to_right(gamestates, self._home_teams(matches))
+        X = plan.transform(gamestates)
+        has_goalscore = set(_goalscore_columns) <= set(plan.columns)
+        if has_goalscore:
+            self._add_goalscore(X, plan.columns, window, matches, bounds)
+
+        # Keep the last actions of each match, at least one to carry the goalscore
+        keep = max(self.model.nb_prev_actions - 1, 1)
+        order = np.empty(len(actions), dtype=np.int64)
+        for (match_id, rows), (start, end) in zip(matches.items(), bounds):
+            order[rows] = np.arange(end - len(rows), end)
+            first = max(start, end - keep)
+            self._tails[match_id] = window.iloc[first:end]
+            if has_goalscore:
+                own, opp = (plan.columns.index(column) for column in _goalscore_columns[:2])
+                self._scores[match_id] = (window["team"].iloc[first], X[first, own], X[first, opp])
+
+        return pd.DataFrame(X[order], index=actions.index, columns=plan.columns, copy=False)
+
+    def reset(self, match_id: Optional[str] = None) -> None:
+        """
+        Forget the actions of a match, or of all matches.
+
+        Parameters
+        ----------
+        match_id : str, optional
+            The match to forget. Forgets all matches if None.
+        """
+        if match_id is None:
+            self._tails.clear()
+            self._scores.clear()
+        else:
+            self._tails.pop(match_id, None)
+            self._scores.pop(match_id, None)
+
+    def _home_teams(self, matches: dict[str, np.ndarray]) -> dict[str, str]:
+        if self.home_teams is not None:
+            return {match_id: self.home_teams[match_id] for match_id in matches}
+        return {match_id: get_home_team_from_match_id(match_id) for match_id in matches}
+
+    def _add_goalscore(
+        self,
+        X: np.ndarray,
+        columns: list[str],
+        window: pd.DataFrame,
+        matches: dict[str, np.ndarray],
+        bounds: list[tuple[int, int]],
+    ) -> None:
+        # The goalscore of a window counts the goals from its first action; add
+        # the goals that were scored before it, as seen by the team of each action
+        team = window["team"].to_numpy()
+        base_team = np.empty(len(window), dtype=object)
+        base_own, base_opp = np.zeros(len(window)), np.zeros(len(window))
+        for match_id, (start, end) in zip(matches, bounds):
+            base_team[start:end], base_own[start:end], base_opp[start:end] = self._scores.get(
+                match_id, (team[start], 0, 0)
+            )
+        same = team == base_team
+        own, opp, diff = (columns.index(column) for column in _goalscore_columns)
+        X[:, own] += np.where(same, base_own, base_opp)
+        X[:, opp] += np.where(same, base_opp, base_own)
+        X[:, diff] = X[:, own] - X[:, opp]
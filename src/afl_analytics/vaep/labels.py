@@ -1,5 +1,12 @@
-"""Implements the label tranformers of the VAEP framework."""
+"""Implements the label tranformers of the VAEP framework.
 
+The labels are computed for the actions of one or more matches at once and
+never look past the end of a match.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 from pandera.typing import DataFrame
 
@@ -7,13 +14,121 @@ import afl_analytics.arpadl.config as spadl
 from afl_analytics.arpadl.schema import ARPADLSchema
 
 
+def _goals_within(
+    goals: np.ndarray,
+    team: np.ndarray,
+    match: np.ndarray,
+    horizons: Sequence[float],
+    time_seconds: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Whether the team of each action scores and concedes a goal in a window of
+    # its match that starts at the action, for each horizon. A horizon h is the
+    # action and the next h - 1 actions, or the actions in the next h seconds
+    # if the time of the actions is given.
+    n = len(goals)
+    idx = np.arange(n)
+    new_match = np.ones(n, dtype=bool)
+    new_match[1:] = match[1:] != match[:-1]
+    last = np.ones(n, dtype=bool)
+    last[:-1] = new_match[1:]
+    first = np.maximum.accumulate(np.where(new_match, idx, 0))
+    stop = np.minimum.accumulate(np.where(last, idx, n)[::-1])[::-1] + 1
+
+    if time_seconds is not None:
+        # One sorted time axis for all matches, with a gap between the matches
+        # that is wider than the longest horizon
+        elapsed = time_seconds - time_seconds[first]
+        span = (elapsed.max() if n else 0) + max(horizons, default=0) + 1
+        clock = elapsed + (np.cumsum(new_match) - 1) * span
+
+    # The team of the first action of each match is team A, as in the goalscore feature
+    teamisA = team == team[first]
+    goalsA = np.concatenate([[0], np.cumsum(goals & teamisA)])
+    goalsB = np.concatenate([[0], np.cumsum(goals & ~teamisA)])
+
+    scores = np.empty((n, len(horizons)), dtype=bool)
+    concedes = np.empty((n, len(horizons)), dtype=bool)
+    for k, h in enumerate(horizons):
+        if time_seconds is None:
+            end = np.minimum(idx + h, stop)
+        else:
+            end = np.minimum(np.searchsorted(clock, clock + h, side="right"), stop)
+        # The goals of each team in the window, as a difference of the cumulative counts
+        windowA = goalsA[end] > goalsA[idx]
+        windowB = goalsB[end] > goalsB[idx]
+        scores[:, k] = np.where(teamisA, windowA, windowB)
+        concedes[:, k] = np.where(teamisA, windowB, windowA)
+    return scores, concedes
+
+
+def _goals(actions: DataFrame[ARPADLSchema]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The goal indicator, team code and match code of each action
+    shots = [name for name in spadl.actiontypes if "shot" in name]
+    goals = actions["action_type"].isin(shots).to_numpy() & (actions["result"] == "goal").to_numpy()
+    team = pd.factorize(actions["team"])[0]
+    match = pd.factorize(actions["match_id"])[0]
+    return goals, team, match
+
+
+def scores_concedes(actions: DataFrame[ARPADLSchema], horizons: Sequence[int] = (5, 10, 20)) -> pd.DataFrame:
+    """Determine whether the team possessing the ball scored or conceded a goal within several horizons.
+
+    All horizons are computed in a single pass over the actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions of one or more matches.
+    horizons : sequence(int), default=(5, 10, 20)
+        The numbers of actions after the current action to consider.
+
+    Returns
+    -------
+    pd.DataFrame
+        A boolean dataframe with a column 'scores_h' and a column 'concedes_h'
+        for each horizon h and a row for each action.
+    """
+    scores, concedes = _goals_within(*_goals(actions), horizons)
+    columns = [f"{label}_{h}" for label in ["scores", "concedes"] for h in horizons]
+    return pd.DataFrame(np.hstack([scores, concedes]), index=actions.index, columns=columns, copy=False)
+
+
+def scores_concedes_seconds(
+    actions: DataFrame[ARPADLSchema], seconds: Sequence[float] = (10.0, 30.0, 60.0)
+) -> pd.DataFrame:
+    """Determine whether the team possessing the ball scored or conceded a goal within several time windows.
+
+    The window of an action holds the actions of its match whose
+    'time_seconds' is at most the given number of seconds later, including
+    the action itself. The actions of each match must be sorted by time. All
+    windows are computed in a single pass over the actions.
+
+    Parameters
+    ----------
+    actions : pd.DataFrame
+        The actions of one or more matches.
+    seconds : sequence(float), default=(10.0, 30.0, 60.0)
+        The lengths of the time windows, in seconds.
+
+    Returns
+    -------
+    pd.DataFrame
+        A boolean dataframe with a column 'scores_Ts' and a column
+        'concedes_Ts' for each window length T and a row for each action.
+    """
+    time_seconds = actions["time_seconds"].to_numpy(dtype=np.float64)
+    scores, concedes = _goals_within(*_goals(actions), seconds, time_seconds)
+    columns = [f"{label}_{t:g}s" for label in ["scores", "concedes"] for t in seconds]
+    return pd.DataFrame(np.hstack([scores, concedes]), index=actions.index, columns=columns, copy=False)
+
+
 def scores(actions: DataFrame[ARPADLSchema], nr_actions: int = 10) -> pd.DataFrame:
     """Determine whether the team possessing the ball scored a goal within the next x actions.
 
     Parameters
     ----------
     actions : pd.DataFrame
-        The actions of a game.
+        The actions of one or more matches.
     nr_actions : int, default=10  # noqa: DAR103
         Number of actions after the current action to consider.
 
@@ -24,27 +139,8 @@ def scores(actions: DataFrame[ARPADLSchema], nr_actions: int = 10) -> pd.DataFra
         True if a goal was scored by the team possessing the ball within the
         next x actions; otherwise False.
     """
-    # merging goals, owngoals and team_ids
-
-    goals = actions["action_type"].str.contains("shot") & (
-        actions["result"] == "goal"
-    )
-    y = pd.concat([goals, actions["team"]], axis=1)
-    y.columns = ["goal", "team"]
-
-    # adding future results
-    for i in range(1, nr_actions):
-        for c in ["team", "goal"]:
-            shifted = y[c].shift(-i)
-            shifted[-i:] = y[c].iloc[len(y) - 1]
-            y["%s+%d" % (c, i)] = shifted
-            
-    res = y["goal"]
-    for i in range(1, nr_actions):
-        gi = y["goal+%d" % i] & (y["team+%d" % i] == y["team"])
-        res = res | gi
-    
-    return pd.DataFrame(res, columns=["scores"])
+    res, _ = _goals_within(*_goals(actions), [nr_actions])
+    return pd.DataFrame({"scores": res[:, 0]}, index=actions.index)
 
 
 def concedes(actions: DataFrame[ARPADLSchema], nr_actions: int = 10) -> pd.DataFrame:
@@ -53,7 +149,7 @@ def concedes(actions: DataFrame[ARPADLSchema], nr_actions: int = 10) -> pd.DataF
     Parameters
     ----------
     actions : pd.DataFrame
-        The actions of a game.
+        The actions of one or more matches.
     nr_actions : int, default=10  # noqa: DAR103
         Number of actions after the current action to consider.
 
@@ -64,23 +160,8 @@ def concedes(actions: DataFrame[ARPADLSchema], nr_actions: int = 10) -> pd.DataF
         True if a goal was conceded by the team possessing the ball within the
         next x actions; otherwise False.
     """
-    goals = actions["action_type"].str.contains("shot") & (
-        actions["result"] == "goal"
-    )
-    y = pd.concat([goals, actions["team"]], axis=1)
-    y.columns = ["goal", "team"]
-
-    # adding future results
-    for i in range(1, nr_actions):
-        for c in ["team", "goal"]:
-            shifted = y[c].shift(-i)
-            shifted[-i:] = y[c].iloc[len(y) - 1]
-            y["%s+%d" % (c, i)] = shifted
-            
-    for i in range(1, nr_actions):
-        gi = y["goal+%d" % i] & (y["team+%d" % i] != y["team"])
-    
-    return pd.DataFrame(gi, columns=["concedes"])
+    _, res = _goals_within(*_goals(actions), [nr_actions])
+    return pd.DataFrame({"concedes": res[:, 0]}, index=actions.index)
 
 
 def goal_from_shot(actions: DataFrame[ARPADLSchema]) -> pd.DataFrame:
@@ -0,0 +1,343 @@
+"""Compiles a list of VAEP feature transformers to a feature plan.
+
+A :class:`FeaturePlan` resolves the names and positions of the features of a
+list of transformers once. It writes every feature straight into a single
+preallocated matrix. The transformers of :mod:`afl_analytics.vaep.features`
+are compiled to array kernels over the lagged game state array, which share
+intermediate results such as the action type and result codes. Any other
+transformer is called as usual and its output is copied into its block of the
+matrix.
+"""
+
+import importlib
+from functools import cached_property
+from types import ModuleType
+from typing import Callable, Iterator, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from scipy import sparse  # type: ignore
+
+import afl_analytics.arpadl.config as arpadlcfg
+
+from . import features as fs
+
+Kernel = Callable[["_Shared", np.ndarray], None]
+
+
+class _Shared:
+    """The intermediate results shared by the kernels of one call."""
+
+    def __init__(self, gamestates: fs.GameStates) -> None:
+        self.gamestates = gamestates
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.gamestates.field(field)
+
+    @cached_property
+    def action_type(self) -> np.ndarray:
+        return self["action_type"].astype(np.int64)
+
+    @cached_property
+    def result(self) -> np.ndarray:
+        return self["result"].astype(np.int64)
+
+    @cached_property
+    def bodypart(self) -> np.ndarray:
+        return self["bodypart"].astype(np.int64)
+
+    @cached_property
+    def team(self) -> np.ndarray:
+        return self["team"].astype(np.int64)
+
+
+def _block(out: np.ndarray, *shape: int) -> np.ndarray:
+    # View the columns of a block as (n_actions, nb_prev_actions, ...)
+    return out.reshape(len(out), *shape)
+
+
+def _onehot(codes: np.ndarray, size: int, out: np.ndarray) -> None:
+    n, k = codes.shape
+    _block(out, k, size)[:] = codes[:, :, None] == np.arange(size)
+
+
+def _actiontype_codes(shared: _Shared) -> tuple[np.ndarray, int]:
+    return shared.action_type, len(arpadlcfg.actiontypes)
+
+
+def _result_codes(shared: _Shared) -> tuple[np.ndarray, int]:
+    return shared.result, len(arpadlcfg.results)
+
+
+def _actiontype_result_codes(shared: _Shared) -> tuple[np.ndarray, int]:
+    nb_results = len(arpadlcfg.results)
+    valid = (shared.action_type >= 0) & (shared.result >= 0)
+    combined = np.where(valid, shared.action_type * nb_results + shared.result, -1)
+    return combined, len(arpadlcfg.actiontypes) * nb_results
+
+
+def _bodypart_codes(shared: _Shared) -> tuple[np.ndarray, int]:
+    return shared.bodypart, len(arpadlcfg.bodyparts)
+
+
+def _startlocation(shared: _Shared, out: np.ndarray) -> None:
+    block = _block(out, shared.gamestates.nb_prev_actions, 2)
+    block[:, :, 0] = shared["start_x"]
+    block[:, :, 1] = shared["start_y"]
+
+
+def _endlocation(shared: _Shared, out: np.ndarray) -> None:
+    block = _block(out, shared.gamestates.nb_prev_actions, 2)
+    block[:, :, 0] = shared["end_x"]
+    block[:, :, 1] = shared["end_y"]
+
+
+def _polar(x: np.ndarray, y: np.ndarray, block: np.ndarray) -> None:
+    dx = np.abs(fs._goal_x - x)
+    dy = np.abs(fs._goal_y - y)
+    block[:, :, 0] = np.sqrt(dx**2 + dy**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        block[:, :, 1] = np.nan_to_num(np.arctan(dy / dx))
+
+
+def _startpolar(shared: _Shared, out: np.ndarray) -> None:
+    _polar(shared["start_x"], shared["start_y"], _block(out, shared.gamestates.nb_prev_actions, 2))
+
+
+def _endpolar(shared: _Shared, out: np.ndarray) -> None:
+    _polar(shared["end_x"], shared["end_y"], _block(out, shared.gamestates.nb_prev_actions, 2))
+
+
+def _movement(shared: _Shared, out: np.ndarray) -> None:
+    block = _block(out, shared.gamestates.nb_prev_actions, 3)
+    dx = shared["end_x"] - shared["start_x"]
+    dy = shared["end_y"] - shared["start_y"]
+    block[:, :, 0] = dx
+    block[:, :, 1] = dy
+    block[:, :, 2] = np.sqrt(dx**2 + dy**2)
+
+
+def _team(shared: _Shared, out: np.ndarray) -> None:
+    out[:] = shared.team[:, 1:] == shared.team[:, :1]
+
+
+def _time_delta(shared: _Shared, out: np.ndarray) -> None:
+    time_seconds = shared["time_seconds"]
+    out[:] = time_seconds[:, :1] - time_seconds[:, 1:]
+
+
+def _space_delta(shared: _Shared, out: np.ndarray) -> None:
+    block = _block(out, shared.gamestates.nb_prev_actions - 1, 3)
+    dx = shared["end_x"][:, 1:] - shared["start_x"][:, :1]
+    dy = shared["end_y"][:, 1:] - shared["start_y"][:, :1]
+    block[:, :, 0] = dx
+    block[:, :, 1] = dy
+    block[:, :, 2] = np.sqrt(dx**2 + dy**2)
+
+
+def _speed(shared: _Shared, out: np.ndarray) -> None:
+    block = _block(out, shared.gamestates.nb_prev_actions - 1, 3)
+    dx = shared["end_x"][:, 1:] - shared["start_x"][:, :1]
+    dy = shared["end_y"][:, 1:] - shared["start_y"][:, :1]
+    dt = shared["time_seconds"][:, :1] - shared["time_seconds"][:, 1:]
+    dt[dt <= 0] = 1e-6
+    block[:, :, 0] = np.abs(dx) / dt
+    block[:, :, 1] = np.abs(dy) / dt
+    block[:, :, 2] = np.sqrt(dx**2 + dy**2) / dt
+
+
+def _goalscore(shared: _Shared, out: np.ndarray) -> None:
+    team = shared.team[:, 0]
+    shots = [i for i, name in enumerate(arpadlcfg.actiontypes) if "shot" in name]
+    goals = np.isin(shared.action_type[:, 0], shots) & (shared.result[:, 0] == arpadlcfg.results.index("goal"))
+    for k, score in enumerate(fs._goals_before(shared.gamestates.match, team, goals)):
+        out[:, k] = score
+
+
+# The one-hot transformers, as the codes of each lagged action and the number of codes
+_onehot_kernels: dict[Callable, Callable[[_Shared], tuple[np.ndarray, int]]] = {
+    fs.actiontype_onehot: _actiontype_codes,
+    fs.result_onehot: _result_codes,
+    fs.actiontype_result_onehot: _actiontype_result_codes,
+    fs.bodypart_onehot: _bodypart_codes,
+}
+
+_kernels: dict[Callable, Kernel] = {
+    fs.startlocation: _startlocation,
+    fs.endlocation: _endlocation,
+    fs.startpolar: _startpolar,
+    fs.endpolar: _endpolar,
+    fs.movement: _movement,
+    fs.team: _team,
+    fs.time_delta: _time_delta,
+    fs.space_delta: _space_delta,
+    fs.speed: _speed,
+    fs.goalscore: _goalscore,
+}
+
+
+class FeaturePlan:
+    """The compiled form of a list of feature transformers.
+
+    Parameters
+    ----------
+    xfns : list(callable)
+        The feature transformers.
+    nb_prev_actions : int, default=3  # noqa: DAR103
+        The number of previous actions included in the game state.
+    feature_module : module, optional
+        The module that defines the game states of the transformers. Only the
+        transformers of :mod:`afl_analytics.vaep.features` are compiled to
+        kernels; the others are called on the game states. Defaults to
+        :mod:`afl_analytics.vaep.features`.
+    dtype : np.dtype, default=np.float32
+        The type of the feature matrix.
+
+    Attributes
+    ----------
+    columns : list(str)
+        The name of each feature.
+    offsets : list(int)
+        The first column of the features of each transformer.
+    """
+
+    def __init__(
+        self,
+        xfns: list[Callable],
+        nb_prev_actions: int = 3,
+        feature_module: Optional[ModuleType] = None,
+        dtype: np.dtype = np.float32,
+    ) -> None:
+        self.xfns = list(xfns)
+        self.nb_prev_actions = nb_prev_actions
+        self.feature_module = fs if feature_module is None else feature_module
+        self.dtype = dtype
+
+        self.columns: list[str] = []
+        self.offsets: list[int] = []
+        for fn in self.xfns:
+            self.offsets.append(len(self.columns))
+            self.columns += self.feature_module.feature_column_names([fn], nb_prev_actions)
+
+    def __getstate__(self) -> dict:
+        # Modules cannot be pickled, so the feature module is pickled by name
+        state = self.__dict__.copy()
+        state["feature_module"] = self.feature_module.__name__
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state["feature_module"] = importlib.import_module(state["feature_module"])
+        self.__dict__.update(state)
+
+    def transform(self, gamestates: fs.GameStates) -> np.ndarray:
+        """Compute the feature matrix of the given game states.
+
+        Parameters
+        ----------
+        gamestates : GameStates
+            The game states, as returned by the `gamestates` function of the
+            feature module.
+
+        Returns
+        -------
+        np.ndarray
+            A (n_actions, n_features) matrix with the features of each game
+            state, in the order of :attr:`columns`.
+        """
+        X = np.empty((len(gamestates.index), len(self.columns)), dtype=self.dtype)
+        shared = _Shared(gamestates)
+        for fn, start, stop in self._blocks():
+            onehot = self._onehot_kernel(fn)
+            if onehot is not None:
+                _onehot(*onehot(shared), X[:, start:stop])
+            else:
+                self._dense_block(fn, shared, X[:, start:stop])
+        return X
+
+    def transform_sparse(self, gamestates: fs.GameStates) -> sparse.csr_matrix:
+        """Compute the feature matrix of the given game states as a sparse matrix.
+
+        The one-hot blocks are never materialised densely: only the ones of
+        each block are stored. The values of every other block are all stored,
+        zeros included. Blocks of boolean features returned by transformers
+        without a kernel are stored like one-hot blocks. The zeros of the
+        one-hot and boolean blocks are thus missing from the matrix, which
+        LightGBM and CatBoost read as zeros but XGBoost reads as missing
+        values, so :class:`~afl_analytics.vaep.base.VAEP` converts sparse
+        features to dense blocks of rows before they reach XGBoost.
+
+        Parameters
+        ----------
+        gamestates : GameStates
+            The game states, as returned by the `gamestates` function of the
+            feature module.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            A (n_actions, n_features) matrix with the features of each game
+            state, in the order of :attr:`columns`.
+        """
+        n = len(gamestates.index)
+        shared = _Shared(gamestates)
+        indices, data, stored = [], [], []
+        for fn, start, stop in self._blocks():
+            onehot = self._onehot_kernel(fn)
+            if onehot is not None:
+                codes, size = onehot(shared)
+                columns = start + np.arange(codes.shape[1]) * size + codes
+                values = np.ones(codes.shape, dtype=self.dtype)
+                keep = codes >= 0
+            else:
+                values = np.empty((n, stop - start), dtype=self.dtype)
+                is_bool = self._dense_block(fn, shared, values)
+                columns = np.broadcast_to(np.arange(start, stop), values.shape)
+                keep = values != 0 if is_bool else np.ones(values.shape, dtype=bool)
+            indices.append(columns)
+            data.append(values)
+            stored.append(keep)
+
+        # The blocks are in column order, so the stored entries of each row are sorted
+        keep = np.hstack(stored)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(keep.sum(axis=1), out=indptr[1:])
+        return sparse.csr_matrix(
+            (np.hstack(data)[keep], np.hstack(indices)[keep].astype(np.int32), indptr),
+            shape=(n, len(self.columns)),
+        )
+
+    def to_frame(self, gamestates: fs.GameStates) -> pd.DataFrame:
+        """Compute the features of the given game states as a dataframe.
+
+        The dataframe is a view on the feature matrix, not a copy of it.
+
+        Parameters
+        ----------
+        gamestates : GameStates
+            The game states, as returned by the `gamestates` function of the
+            feature module.
+
+        Returns
+        -------
+        pd.DataFrame
+            The features of each game state.
+        """
+        return pd.DataFrame(self.transform(gamestates), index=gamestates.index, columns=self.columns, copy=False)
+
+    def _blocks(self) -> Iterator[tuple[Callable, int, int]]:
+        # Each transformer with the first and last column of its features
+        bounds = self.offsets + [len(self.columns)]
+        return zip(self.xfns, bounds[:-1], bounds[1:])
+
+    def _onehot_kernel(self, fn: Callable) -> Optional[Callable[[_Shared], tuple[np.ndarray, int]]]:
+        return _onehot_kernels.get(fn) if self.feature_module is fs else None
+
+    def _dense_block(self, fn: Callable, shared: _Shared, out: np.ndarray) -> bool:
+        # Write the features of a transformer to out; True if they are booleans
+        kernel = _kernels.get(fn) if self.feature_module is fs else None
+        if kernel is not None:
+            kernel(shared, out)
+            return False
+        features = fn(shared.gamestates)
+        out[:] = features.to_numpy(dtype=self.dtype)
+        return all(dtype == bool for dtype in features.dtypes)
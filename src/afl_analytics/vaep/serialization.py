@@ -0,0 +1,260 @@
+"""Saving and loading of fitted VAEP models.
+
+A model is saved to a directory that holds each fitted learner in the native
+format of its library, next to a manifest with the feature configuration of
+the model. Loading only reads the manifest; each learner is read from disk on
+its first prediction.
+"""
+
+import importlib
+import json
+import os
+from collections.abc import Iterator, MutableMapping
+from typing import Any, Callable
+
+try:
+    import xgboost
+except ImportError:
+    xgboost = None  # type: ignore
+try:
+    import catboost
+except ImportError:
+    catboost = None  # type: ignore
+try:
+    import lightgbm
+except ImportError:
+    lightgbm = None  # type: ignore
+
+_format = 1
+
+
+class LazyModels(MutableMapping):
+    """
+    The learners of a model, each read from disk when it is first accessed.
+
+    Parameters
+    ----------
+    loaders : dict(str, callable)
+        A function that reads the learner of each label.
+    """
+
+    def __init__(self, loaders: dict[str, Callable[[], Any]]) -> None:
+        self._loaders = dict(loaders)
+        self._models: dict[str, Any] = {}
+
+    @property
+    def loaded(self) -> list[str]:
+        """The labels whose learner has been read."""
+        return [col for col in self if col in self._models]
+
+    def __getitem__(self, col: str) -> Any:
+        if col not in self._models:
+            if col not in self._loaders:
+                raise KeyError(col)
+            self._models[col] = self._loaders[col]()
+        return self._models[col]
+
+    def __setitem__(self, col: str, model: Any) -> None:
+        self._loaders.pop(col, None)
+        self._models[col] = model
+
+    def __delitem__(self, col: str) -> None:
+        if col not in self:
+            raise KeyError(col)
+        self._loaders.pop(col, None)
+        self._models.pop(col, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._loaders) + [col for col in self._models if col not in self._loaders])
+
+    def __len__(self) -> int:
+        return len(set(self._loaders) | set(self._models))
+
+
+def save(model: Any, models: MutableMapping, path: str) -> None:
+    """
+    Save the fitted learners and the feature configuration of a model.
+
+    Parameters
+    ----------
+    model : VAEP
+        The VAEP or Atomic-VAEP model.
+    models : dict
+        The fitted learner of each label.
+    path : str
+        The directory to save the model to. It is created if needed.
+
+    Raises
+    ------
+    ValueError
+        If a feature transformer cannot be imported by name or a learner has
+        no native format.
+    """
+    plan = model.feature_plan
+    os.makedirs(path, exist_ok=True)
+    heads = {}
+    for col in models:
+        learner = _learner_name(models[col])
+        filename = col + _extensions[learner]
+        _savers[learner](models[col], os.path.join(path, filename))
+        heads[col] = {"learner": learner, "file": filename}
+
+    manifest = {
+        "format": _format,
+        "model": _qualname(type(model)),
+        "xfns": [_qualname(fn) for fn in plan.xfns],
+        "nb_prev_actions": plan.nb_prev_actions,
+        "columns": plan.columns,
+        "heads": heads,
+    }
+    hidden = os.path.join(path, ".manifest.json.tmp")
+    with open(hidden, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(hidden, os.path.join(path, "manifest.json"))
+
+
+def load(cls: type, path: str) -> tuple[Any, LazyModels]:
+    """
+    Load the feature configuration of a saved model.
+
+    Parameters
+    ----------
+    cls : type
+        The class of the saved model, VAEP or a subclass.
+    path : str
+        The directory the model was saved to.
+
+    Raises
+    ------
+    ValueError
+        If the model was saved by another class or in an unknown format. The
+        learners raise a ValueError when they are read if the features of the
+        saved model differ from those computed now.
+
+    Returns
+    -------
+    tuple(VAEP, LazyModels)
+        The model, without learners, and its learners, which are read on
+        first use.
+    """
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest["format"] != _format:
+        raise ValueError(f"Unknown model format {manifest['format']}")
+    if manifest["model"] != _qualname(cls):
+        raise ValueError(f"The model was saved by {manifest['model']}, not by {_qualname(cls)}")
+
+    model = cls([_resolve(name) for name in manifest["xfns"]], manifest["nb_prev_actions"])
+    models = LazyModels(
+        {
+            col: _HeadLoader(model, manifest["columns"], head["learner"], os.path.join(path, head["file"]))
+            for col, head in manifest["heads"].items()
+        }
+    )
+    return model, models
+
+
+class _HeadLoader:
+    """Read the saved learner of one label, so that unread learners can be pickled."""
+
+    def __init__(self, model: Any, columns: list[str], learner: str, path: str) -> None:
+        self.model = model
+        self.columns = columns
+        self.learner = learner
+        self.path = path
+
+    def __call__(self) -> Any:
+        # Compiling the feature plan is the slow part of loading, so it is
+        # only checked when the first learner is needed
+        if self.model.feature_plan.columns != self.columns:
+            raise ValueError("The features of the saved model differ from those computed by its transformers")
+        return _loaders[self.learner](self.path)
+
+
+def _learner_name(model: Any) -> str:
+    if xgboost is not None and isinstance(model, xgboost.Booster):
+        return "xgboost.Booster"
+    if xgboost is not None and isinstance(model, xgboost.XGBClassifier):
+        return "xgboost.XGBClassifier"
+    if lightgbm is not None and isinstance(model, lightgbm.Booster):
+        return "lightgbm.Booster"
+    if lightgbm is not None and isinstance(model, lightgbm.LGBMClassifier):
+        return "lightgbm.LGBMClassifier"
+    if catboost is not None and isinstance(model, catboost.CatBoostClassifier):
+        return "catboost.CatBoostClassifier"
+    raise ValueError(f"A {type(model).__name__} learner cannot be saved")
+
+
+def _load_xgboost_booster(path: str) -> "xgboost.Booster":
+    if xgboost is None:
+        raise ImportError("xgboost is not installed.")
+    return xgboost.Booster(model_file=path)
+
+
+def _load_xgboost_classifier(path: str) -> "xgboost.XGBClassifier":
+    if xgboost is None:
+        raise ImportError("xgboost is not installed.")
+    model = xgboost.XGBClassifier()
+    model.load_model(path)
+    return model
+
+
+def _load_lightgbm(path: str) -> "lightgbm.Booster":
+    if lightgbm is None:
+        raise ImportError("lightgbm is not installed.")
+    return lightgbm.Booster(model_file=path)
+
+
+def _load_catboost(path: str) -> "catboost.CatBoostClassifier":
+    if catboost is None:
+        raise ImportError("catboost is not installed.")
+    model = catboost.CatBoostClassifier()
+    model.load_model(path, format="cbm")
+    return model
+
+
+_extensions = {
+    "xgboost.Booster": ".ubj",
+    "xgboost.XGBClassifier": ".ubj",
+    "lightgbm.Booster": ".txt",
+    "lightgbm.LGBMClassifier": ".txt",
+    "catboost.CatBoostClassifier": ".cbm",
+}
+
+_savers: dict[str, Callable[[Any, str], Any]] = {
+    "xgboost.Booster": lambda model, path: model.save_model(path),
+    "xgboost.XGBClassifier": lambda model, path: model.save_model(path),
+    "lightgbm.Booster": lambda model, path: model.save_model(path),
+    # The booster of a classifier, up to its best iteration
+    "lightgbm.LGBMClassifier": lambda model, path: model.booster_.save_model(path),
+    "catboost.CatBoostClassifier": lambda model, path: model.save_model(path, format="cbm"),
+}
+
+# A saved lightgbm classifier is loaded as its booster, which predicts the same probabilities
+_loaders: dict[str, Callable[[str], Any]] = {
+    "xgboost.Booster": _load_xgboost_booster,
+    "xgboost.XGBClassifier": _load_xgboost_classifier,
+    "lightgbm.Booster": _load_lightgbm,
+    "lightgbm.LGBMClassifier": _load_lightgbm,
+    "catboost.CatBoostClassifier": _load_catboost,
+}
+
+
+def _qualname(obj: Any) -> str:
+    if "<" in obj.__qualname__:
+        raise ValueError(f"{obj.__qualname__} cannot be imported by name")
+    return f"{obj.__module__}.{obj.__qualname__}"
+
+
+def _resolve(name: str) -> Any:
+    # Import the longest module prefix of the name and look up the rest in it
+    parts = name.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        try:
+            obj = importlib.import_module(".".join(parts[:i]))
+        except ImportError:
+            continue
+        for attr in parts[i:]:
+            obj = getattr(obj, attr)
+        return obj
+    raise ValueError(f"{name} cannot be imported")
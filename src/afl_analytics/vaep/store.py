@@ -0,0 +1,310 @@
+"""On-disk store of the VAEP features and labels of each match.
+
+The features and labels of a match are stored column by column, as the
+transposed ``.npy`` matrix of the match, under a key that hashes the actions of
+the match, and the home team for its features, in a directory per feature or
+label configuration. A match is only
+computed again when its actions or the configuration change, and stored
+matches are memory-mapped when a training set is assembled. The least recently
+used matches are evicted once the store exceeds its size limit.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from afl_analytics.diskcache import LRUDirectory, match_keys, write_atomically
+from afl_analytics.utils import get_home_team_from_match_id
+
+from .base import VAEP
+
+
+def feature_version(model: VAEP) -> str:
+    """
+    Return a hash of the feature configuration of a model.
+
+    Parameters
+    ----------
+    model : VAEP
+        A VAEP or Atomic-VAEP model.
+
+    Returns
+    -------
+    str
+        The hash of the model class, the feature transformers, the number of
+        previous actions and the names and type of the features.
+    """
+    plan = model.feature_plan
+    return _hash_text(
+        repr(
+            (
+                type(model).__qualname__,
+                [_qualname(fn) for fn in plan.xfns],
+                plan.nb_prev_actions,
+                plan.columns,
+                np.dtype(plan.dtype).str,
+            )
+        )
+    )
+
+
+def label_version(model: VAEP) -> str:
+    """
+    Return a hash of the label configuration of a model.
+
+    Parameters
+    ----------
+    model : VAEP
+        A VAEP or Atomic-VAEP model.
+
+    Returns
+    -------
+    str
+        The hash of the model class and the label transformers.
+    """
+    return _hash_text(repr((type(model).__qualname__, [_qualname(fn) for fn in model.yfns])))
+
+
+class FeatureStore:
+    """
+    An on-disk store of the features and labels of each match.
+
+    Changing the code of a feature or label transformer without renaming it
+    does not change its configuration hash; :meth:`clear` the store after
+    such a change.
+
+    Parameters
+    ----------
+    root : str
+        The directory of the store. It is created on the first write.
+    max_bytes : int, default=2**32
+        The size limit of the store. The least recently used matches are
+        evicted when it is exceeded.
+
+    Attributes
+    ----------
+    hits : int
+        The number of matches that were read from the store.
+    misses : int
+        The number of matches that were computed.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2**32) -> None:
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._directory = LRUDirectory(root, ".npy", max_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        """The size limit of the store."""
+        return self._directory.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        self._directory.max_bytes = max_bytes
+
+    def compute_features(
+        self, model: VAEP, actions: pd.DataFrame, home_teams: Optional[dict[str, str]] = None
+    ) -> pd.DataFrame:
+        """
+        Compute the features of the game states of many games, reusing stored matches.
+
+        Parameters
+        ----------
+        model : VAEP
+            The VAEP or Atomic-VAEP model that computes the features.
+        actions : pd.DataFrame
+            The ARPADL or Atomic-ARPADL actions of one or more games.
+        home_teams : dict, optional
+            The home team of each game, keyed by 'match_id'. Derived from the
+            'match_id' of each game if None.
+
+        Returns
+        -------
+        pd.DataFrame
+            The features of each game state, as returned by
+            :meth:`~afl_analytics.vaep.base.VAEP.compute_features`.
+        """
+        return self._compute(
+            actions, "features-" + feature_version(model), _feature_fn(model, home_teams), _home_team_fn(home_teams)
+        )
+
+    def compute_labels(self, model: VAEP, actions: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute the labels of the game states of many games, reusing stored matches.
+
+        Parameters
+        ----------
+        model : VAEP
+            The VAEP or Atomic-VAEP model that computes the labels.
+        actions : pd.DataFrame
+            The ARPADL or Atomic-ARPADL actions of one or more games.
+
+        Returns
+        -------
+        pd.DataFrame
+            The labels of each game state, as returned by
+            :meth:`~afl_analytics.vaep.base.VAEP.compute_labels`.
+        """
+        return self._compute(actions, "labels-" + label_version(model), _label_fn(model))
+
+    def chunks(
+        self, model: VAEP, actions: pd.DataFrame, home_teams: Optional[dict[str, str]] = None
+    ) -> list[tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Return the memory-mapped features and labels of each game.
+
+        The features and labels of the games that are not stored yet are
+        computed and stored first. The chunks can be passed to
+        :meth:`~afl_analytics.vaep.base.VAEP.fit_chunks` to train a model
+        without loading all features in memory.
+
+        Parameters
+        ----------
+        model : VAEP
+            The VAEP or Atomic-VAEP model that computes the features and labels.
+        actions : pd.DataFrame
+            The ARPADL or Atomic-ARPADL actions of one or more games.
+        home_teams : dict, optional
+            The home team of each game, keyed by 'match_id'. Derived from the
+            'match_id' of each game if None.
+
+        Returns
+        -------
+        list(tuple(pd.DataFrame, pd.DataFrame))
+            The features and labels of each game, backed by the stored files.
+        """
+        feature_columns, _, features = self._stored(
+            actions, "features-" + feature_version(model), _feature_fn(model, home_teams), _home_team_fn(home_teams)
+        )
+        label_columns, _, labels = self._stored(actions, "labels-" + label_version(model), _label_fn(model))
+        return [
+            (pd.DataFrame(X, columns=feature_columns, copy=False), pd.DataFrame(y, columns=label_columns, copy=False))
+            for X, y in zip(features, labels)
+        ]
+
+    def size(self) -> int:
+        """
+        Return the size of the store in bytes.
+
+        Returns
+        -------
+        int
+            The total size of the stored matches.
+        """
+        return self._directory.size()
+
+    def clear(self) -> None:
+        """Remove every stored match."""
+        self._directory.clear()
+
+    def _compute(
+        self,
+        actions: pd.DataFrame,
+        version: str,
+        compute: Callable[[str, pd.DataFrame], pd.DataFrame],
+        context: Optional[Callable[[str], str]] = None,
+    ) -> pd.DataFrame:
+        columns, matches, values = self._stored(actions, version, compute, context)
+        if columns is None:
+            return pd.DataFrame(index=actions.index)
+
+        # Copy every match once, straight from the mapped files into the result
+        dtype = np.result_type(*values) if values else np.float32
+        X = np.empty((len(actions), len(columns)), dtype=dtype)
+        for rows, match_values in zip(matches.values(), values):
+            X[rows] = match_values
+        return pd.DataFrame(X, index=actions.index, columns=columns, copy=False)
+
+    def _stored(
+        self,
+        actions: pd.DataFrame,
+        version: str,
+        compute: Callable[[str, pd.DataFrame], pd.DataFrame],
+        context: Optional[Callable[[str], str]] = None,
+    ) -> tuple[Optional[list[str]], dict[str, np.ndarray], list[np.ndarray]]:
+        # The column names, the rows of each match and its memory-mapped values
+        directory = os.path.join(self.root, version)
+        columns = self._columns(directory)
+
+        matches: dict[str, np.ndarray] = {}
+        values: list[np.ndarray] = []
+        # The keys include the layout, so files stored row by row are never read as columns
+        for match_id, rows, key in match_keys(actions, actions["match_id"], f"{version}-columns", context=context):
+            matches[match_id] = rows
+            path = os.path.join(directory, f"{key}.npy")
+            if columns is not None and self._directory.get(path):
+                self.hits += 1
+            else:
+                self.misses += 1
+                computed = compute(match_id, actions.iloc[rows])
+                if columns is None:
+                    columns = self._put_columns(directory, list(computed.columns))
+                self._directory.put(path, _npy_writer(computed.to_numpy()))
+            values.append(np.load(path, mmap_mode="r").T)
+
+        self._directory.evict()
+        return columns, matches, values
+
+    def _columns(self, directory: str) -> Optional[list[str]]:
+        path = os.path.join(directory, "columns.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _put_columns(self, directory: str, columns: list[str]) -> list[str]:
+        os.makedirs(directory, exist_ok=True)
+
+        def write(hidden: str) -> None:
+            with open(hidden, "w") as f:
+                json.dump(columns, f)
+
+        write_atomically(os.path.join(directory, "columns.json"), write)
+        return columns
+
+
+def _feature_fn(model: VAEP, home_teams: Optional[dict[str, str]]) -> Callable[[str, pd.DataFrame], pd.DataFrame]:
+    home_team = _home_team_fn(home_teams)
+
+    def compute(match_id: str, match_actions: pd.DataFrame) -> pd.DataFrame:
+        return model.compute_features(pd.Series({"home_team_id": home_team(match_id)}), match_actions)
+
+    return compute
+
+
+def _home_team_fn(home_teams: Optional[dict[str, str]]) -> Callable[[str], str]:
+    # The features depend on the home team of a match, so it is part of its key
+    def home_team(match_id: str) -> str:
+        return home_teams[match_id] if home_teams is not None else get_home_team_from_match_id(match_id)
+
+    return home_team
+
+
+def _label_fn(model: VAEP) -> Callable[[str, pd.DataFrame], pd.DataFrame]:
+    def compute(match_id: str, match_actions: pd.DataFrame) -> pd.DataFrame:
+        return model.compute_labels(pd.Series({"match_id": match_id}), match_actions)
+
+    return compute
+
+
+def _npy_writer(values: np.ndarray) -> Callable[[str], None]:
+    def write(path: str) -> None:
+        # Each column of the match is contiguous on disk
+        with open(path, "wb") as f:
+            np.save(f, np.ascontiguousarray(values.T))
+
+    return write
+
+
+def _qualname(fn: Callable) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
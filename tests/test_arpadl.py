@@ -1,5 +1,16 @@
 from afl_analytics.arpadl.pyafl import convert_to_actions
-from afl_analytics.arpadl.schema import ARPADLSchema
+from afl_analytics.arpadl.atomic.base import convert_to_atomic
+from afl_analytics.arpadl.batch import convert_to_actions_batch, convert_to_atomic_batch, iter_convert_to_atomic
+from afl_analytics.arpadl.utils import add_names
+from afl_analytics.arpadl.streaming import StreamingConverter
+from afl_analytics.arpadl.arrow import actions_to_pandas, convert_to_actions_arrow, convert_to_atomic_arrow
+from afl_analytics.arpadl.store import ActionStore
+from afl_analytics.arpadl.cache import ConversionCache
+from afl_analytics.arpadl.synthetic import generate_chains
+from afl_analytics.arpadl.profiling import Profiler
+import pandas as pd
+import pyarrow as pa
+from afl_analytics.arpadl.schema import ARPADLSchema, validate_actions
 from AFLPy.AFLData_Client import load_data
  
 def test_pyafl_convert_to_actions():
@@ -35,4 +46,151 @@ def test_pyafl_convert_to_actions_2024():
     chains = load_data('AFL_API_Match_Chains', ID = "AFL_2024")
     actions = convert_to_actions(chains)
     
-    assert (ARPADLSchema.validate(actions) == actions).all().all()
\ No newline at end of file
+    assert (ARPADLSchema.validate(actions) == actions).all().all()
+    
+def test_pyafl_convert_to_actions_batch():
+     
+    chains = load_data('AFL_API_Match_Chains', ID = "AFL_2022")
+    actions, failures = convert_to_actions_batch(chains)
+    
+    assert not failures
+    assert actions.equals(convert_to_actions(chains).reset_index(drop=True))
+    
+def test_pyafl_convert_to_actions_categorical():
+     
+    chains = load_data('AFL_API_Match_Chains', ID = "AFL_2022_F4_Geelong_Sydney")
+    actions = convert_to_actions(chains, categorical=True)
+    
+    assert actions['action_type'].cat.codes.dtype == 'int8'
+    assert add_names(actions).equals(convert_to_actions(chains))
+    
+def test_pyafl_convert_to_actions_validation_modes():
+     
+    chains = load_data('AFL_API_Match_Chains', ID = "AFL_2022_F4_Geelong_Sydney")
+    actions = convert_to_actions(chains)
+    
+    for validation in ['dtype', 'sample', 'off']:
+        assert convert_to_actions(chains, validation=validation).equals(actions)
+    assert validate_actions(convert_to_actions(chains, categorical=True), validation='dtype') is not None
+    
+def test_validate_actions_keeps_categoricals():
+     
+    actions = convert_to_actions(generate_chains(1, seed=0), categorical=True)
+    dtypes = actions.dtypes.copy()
+    
+    for validation in ['full', 'dtype', 'sample', 'off']:
+        assert validate_actions(actions, validation=validation).dtypes.equals(dtypes)
+    assert validate_actions(actions, validation='full').equals(actions)
+    assert actions.dtypes.equals(dtypes)
+    
+def test_streaming_converter():
+     
+    chains = generate_chains(1, seed=0)
+    converter = StreamingConverter()
+    streamed = [converter.update(chains.iloc[i:i + 50]) for i in range(0, len(chains), 50)]
+    streamed.append(converter.flush())
+    
+    assert pd.concat(streamed, ignore_index=True).equals(convert_to_actions(chains))
+    
+def test_arrow_convert_to_actions():
+     
+    chains = generate_chains(2, seed=0)
+    actions = convert_to_actions_arrow(pa.Table.from_pandas(chains, preserve_index=False))
+    
+    assert actions_to_pandas(actions).equals(convert_to_actions(chains))
+    
+def test_arrow_convert_to_atomic():
+     
+    chains = generate_chains(2, seed=0)
+    actions = convert_to_actions_arrow(pa.Table.from_pandas(chains, preserve_index=False))
+    
+    atomic_actions = convert_to_atomic_arrow(actions)
+    
+    assert actions_to_pandas(atomic_actions).equals(convert_to_atomic(convert_to_actions(chains)))
+    assert all(pa.types.is_dictionary(atomic_actions.schema.field(col).type) for col in ['team', 'player', 'action_type'])
+    # String columns that are not dictionary-encoded convert the same
+    plain = pa.Table.from_pandas(actions_to_pandas(actions), preserve_index=False)
+    assert actions_to_pandas(convert_to_atomic_arrow(plain)).equals(actions_to_pandas(atomic_actions))
+    
+def test_action_store(tmp_path):
+     
+    chains = generate_chains(2, first_season=2022, seed=0)
+    actions = convert_to_actions(chains)
+    store = ActionStore(str(tmp_path))
+    store.write(actions)
+    
+    assert store.read(season=2022).equals(actions)
+    assert store.read(columns=['start_x'], season=2023).empty
+    
+def test_action_store_schema(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(2, first_season=2022, seed=0))
+    first, second = sorted(actions['match_id'].unique())
+    store = ActionStore(str(tmp_path))
+    store.write(actions[actions['match_id'] == second])
+    # Without players, the player column of this match has no type in its file
+    store.write(actions[actions['match_id'] == first].assign(player=None))
+    
+    assert pa.types.is_dictionary(store.read_table().schema.field('player').type)
+    assert store.read(match_id=second).equals(actions[actions['match_id'] == second].reset_index(drop=True))
+    assert store.read(match_id=first)['player'].isna().all()
+    
+def test_conversion_cache(tmp_path):
+     
+    chains = generate_chains(2, seed=0)
+    cache = ConversionCache(str(tmp_path))
+    
+    assert cache.convert_to_actions(chains).equals(convert_to_actions(chains))
+    assert cache.convert_to_actions(chains).equals(convert_to_actions(chains))
+    assert (cache.hits, cache.misses) == (2, 2)
+    
+    cache.convert_to_actions(chains, validation='off')
+    assert (cache.hits, cache.misses) == (2, 4)
+    
+def test_synthetic_chains():
+     
+    chains = generate_chains(2, seed=0)
+    actions = convert_to_actions(chains)
+    
+    assert actions['match_id'].nunique() == 2
+    assert generate_chains(2, seed=0).equals(chains)
+    assert convert_to_actions_batch(chains, max_workers=1)[0].equals(actions)
+    
+def test_profiler():
+     
+    chains = generate_chains(1, seed=0)
+    with Profiler(memory=True) as profiler:
+        actions = convert_to_actions(chains)
+    report = profiler.to_frame()
+    
+    assert actions.equals(convert_to_actions(chains))
+    assert report['stage'].iloc[-1] == 'convert_to_actions'
+    assert report['rows_out'].iloc[-1] == len(actions)
+    assert (report['peak_bytes'] >= 0).all()
+    assert (report['rows_out'] <= report['rows_in']).loc[report['stage'] == '_filter_actions'].all()
+    
+def test_profiler_skips_worker_threads():
+     
+    actions = convert_to_actions(generate_chains(2, seed=0))
+    with Profiler() as profiler:
+        atomic_actions = convert_to_atomic_batch(actions, max_workers=2, threads=True)[0]
+    
+    assert atomic_actions.equals(convert_to_atomic(actions))
+    assert profiler.records == []
+    
+def test_atomic_extras_follow_their_action():
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    atomic_actions = convert_to_atomic(actions, validation='full')
+    shots = atomic_actions.index[atomic_actions['action_type'] == 'shot']
+    
+    assert atomic_actions.loc[shots + 1, 'action_type'].isin(['goal', 'behind', 'miss']).all()
+    assert atomic_actions.groupby('match_id')['time_seconds'].diff().dropna().ge(0).all()
+    
+def test_convert_to_atomic_batch():
+     
+    actions = convert_to_actions(generate_chains(3, seed=0))
+    atomic_actions = convert_to_atomic(actions)
+    
+    assert convert_to_atomic_batch(actions, max_workers=2, threads=True)[0].equals(atomic_actions)
+    assert [match_id for match_id, _ in iter_convert_to_atomic(actions, max_workers=1)] == sorted(actions['match_id'].unique())
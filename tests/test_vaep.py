@@ -0,0 +1,269 @@
+from afl_analytics.arpadl.pyafl import convert_to_actions
+from afl_analytics.arpadl.atomic.base import convert_to_atomic
+from afl_analytics.arpadl.utils import add_names
+from afl_analytics.arpadl.synthetic import generate_chains
+from afl_analytics.vaep.atomic.base import AtomicVAEP
+from afl_analytics.vaep.atomic import features as atomic_vaep_features
+from afl_analytics.vaep.atomic import formula as atomic_vaep_formula
+from afl_analytics.vaep import features as vaep_features
+from afl_analytics.vaep import formula as vaep_formula
+from afl_analytics.vaep import labels as vaep_labels
+from afl_analytics.vaep import chunked as vaep_chunked
+from afl_analytics.vaep.base import VAEP
+from afl_analytics.vaep.incremental import IncrementalFeatures
+from afl_analytics.vaep.store import FeatureStore
+import numpy as np
+import pandas as pd
+import pickle
+import pytest
+from scipy.sparse import csr_matrix
+ 
+def test_atomic_vaep():
+     
+    atomic_actions = convert_to_atomic(convert_to_actions(generate_chains(2, seed=0)))
+    model = AtomicVAEP()
+    features = model.compute_features(None, atomic_actions)
+    labels = model.compute_labels(None, atomic_actions)
+    per_match = [model.compute_features(None, match_actions) for _, match_actions in atomic_actions.groupby('match_id', sort=False)]
+    
+    assert features.equals(pd.concat(per_match))
+    assert len(labels) == len(atomic_actions) and labels['scores'].any()
+    
+def test_atomic_vaep_gamestates():
+     
+    atomic_actions = convert_to_atomic(convert_to_actions(generate_chains(2, seed=0)))
+    gamestates = atomic_vaep_features.gamestates(atomic_actions, 3)
+    a0, a2 = gamestates[0], gamestates[2]
+    
+    assert isinstance(gamestates, vaep_features.GameStates)
+    assert gamestates.values.shape == (len(atomic_actions), 3, len(gamestates.fields))
+    assert (a0['x'] == atomic_actions['x']).all() and (a0['action_type'] == atomic_actions['action_type']).all()
+    assert (a2['match_id'] == a0['match_id']).all() and (a2['period_id'] == a0['period_id']).all()
+    
+def test_atomic_vaep_formula_many_matches():
+     
+    atomic_actions = convert_to_atomic(convert_to_actions(generate_chains(3, seed=0)))
+    scores = pd.Series(0.5, index=atomic_actions.index)
+    concedes = pd.Series(0.25, index=atomic_actions.index)
+    values = atomic_vaep_formula.value(atomic_actions, scores, concedes)
+    per_match = pd.concat([atomic_vaep_formula.value(match_actions, scores[match_actions.index], concedes[match_actions.index]) for _, match_actions in atomic_actions.groupby('match_id', sort=False)])
+    after_goal = atomic_actions.index[1:][(atomic_actions['action_type'] == 'goal').to_numpy()[:-1]]
+    
+    assert values.equals(per_match)
+    assert (values.loc[after_goal, 'offensive_value'] == 0.5).all()
+    
+def test_vaep_gamestates():
+     
+    actions = convert_to_actions(generate_chains(2, seed=0))
+    original = actions.copy()
+    gamestates = vaep_features.play_left_to_right(vaep_features.gamestates(actions, 3))
+    a0, a2 = gamestates[0], gamestates[2]
+    
+    assert actions.equals(original)
+    assert gamestates.values.shape == (len(actions), 3, len(gamestates.fields))
+    assert (a2['match_id'] == a0['match_id']).all() and (a2['period_id'] == a0['period_id']).all()
+    assert (a0['time_seconds'] - a2['time_seconds']).ge(0).all()
+    
+def test_vaep_feature_plan():
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    model = VAEP()
+    gamestates = vaep_features.play_left_to_right(vaep_features.gamestates(actions, 3))
+    features = model.feature_plan.to_frame(gamestates)
+    expected = pd.concat([fn(gamestates) for fn in model.xfns], axis=1)
+    
+    assert list(features.columns) == list(expected.columns)
+    assert ((features - expected.astype('float32')).abs() < 1e-3).all().all()
+    
+def test_vaep_goalscore_many_matches():
+     
+    actions = convert_to_actions(generate_chains(3, seed=0))
+    gamestates = vaep_features.gamestates(actions, 1)
+    goalscore = vaep_features.goalscore(gamestates)
+    per_match = pd.concat([vaep_features.goalscore(vaep_features.gamestates(match_actions, 1)) for _, match_actions in actions.groupby('match_id', sort=False)])
+    first = actions.groupby('match_id', sort=False).head(1).index
+    
+    assert goalscore.equals(per_match)
+    assert (goalscore.loc[first] == 0).all().all()
+    assert (VAEP(xfns=[vaep_features.goalscore], nb_prev_actions=1).feature_plan.transform(gamestates) == goalscore.to_numpy()).all()
+    
+def test_vaep_sparse_features():
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    model = VAEP()
+    game = pd.Series({'home_team_id': 'Adelaide'})
+    features = model.compute_features(game, actions)
+    sparse_features = model.compute_features(game, actions, sparse=True)
+    
+    assert sparse_features.shape == features.shape
+    assert (sparse_features.toarray() == features.to_numpy()).all()
+    assert sparse_features.nnz < features.size / 4
+    
+def test_vaep_sparse_predictions():
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    model = VAEP()
+    game = pd.Series({'home_team_id': 'Adelaide'})
+    X = model.compute_features(game, actions)
+    X_sparse = model.compute_features(game, actions, sparse=True)
+    y = model.compute_labels(game, actions)
+    model.fit(X, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    sparse_model = VAEP().fit(X_sparse, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    
+    assert model._estimate_probabilities(X_sparse).equals(model._estimate_probabilities(X).reset_index(drop=True))
+    assert sparse_model._estimate_probabilities(X_sparse).equals(sparse_model._estimate_probabilities(X).reset_index(drop=True))
+    
+def test_vaep_sparse_fit_in_blocks(monkeypatch):
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    game = pd.Series({'home_team_id': 'Adelaide'})
+    X = VAEP().compute_features(game, actions)
+    X_sparse = VAEP().compute_features(game, actions, sparse=True)
+    y = VAEP().compute_labels(game, actions)
+    monkeypatch.setattr(vaep_chunked._RowBlocks, 'block_size', 100)
+    blocks = []
+    toarray = csr_matrix.toarray
+    monkeypatch.setattr(csr_matrix, 'toarray', lambda self, *args: blocks.append(self.shape[0]) or toarray(self, *args))
+    np.random.seed(0)
+    model = VAEP().fit(X, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    np.random.seed(0)
+    sparse_model = VAEP().fit(X_sparse, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    
+    assert sparse_model._estimate_probabilities(X_sparse).equals(model._estimate_probabilities(X).reset_index(drop=True))
+    assert blocks and max(blocks) <= 100
+    
+def test_feature_store(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(2, seed=0))
+    model = VAEP()
+    store = FeatureStore(str(tmp_path))
+    features = store.compute_features(model, actions)
+    labels = store.compute_labels(model, actions)
+    
+    assert store.compute_features(model, actions).equals(features)
+    assert store.compute_labels(model, actions).equals(labels)
+    assert (store.hits, store.misses) == (4, 4)
+    assert list(features.columns) == model.feature_plan.columns
+    
+def test_feature_store_home_teams(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(1, seed=0))
+    match_id = actions['match_id'].iloc[0]
+    teams = list(actions['team'].unique())
+    model = VAEP()
+    store = FeatureStore(str(tmp_path))
+    first = store.compute_features(model, actions, {match_id: teams[0]})
+    second = store.compute_features(model, actions, {match_id: teams[1]})
+    
+    assert (store.hits, store.misses) == (0, 2)
+    assert not first.equals(second)
+    assert second.equals(model.compute_features_many(actions, {match_id: teams[1]}, max_workers=1))
+    assert store.compute_features(model, actions, {match_id: teams[0]}).equals(first)
+    assert (store.hits, store.misses) == (1, 2)
+    
+def test_vaep_compute_many():
+     
+    actions = convert_to_actions(generate_chains(3, seed=0))
+    model = VAEP()
+    features = model.compute_features_many(actions, max_workers=2)
+    labels = model.compute_labels_many(actions, max_workers=2)
+    
+    assert features.equals(model.compute_features_many(actions, max_workers=1))
+    assert labels.equals(pd.concat([model.compute_labels(None, match_actions) for _, match_actions in actions.groupby('match_id', sort=False)]))
+    
+def test_vaep_fit_chunks(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(4, seed=0))
+    model = VAEP()
+    store = FeatureStore(str(tmp_path))
+    chunks = store.chunks(model, actions)
+    model.fit_chunks(chunks, learner='xgboost', tree_params={'max_depth': 2, 'objective': 'binary:logistic'}, num_boost_round=5)
+    scores = model.score(store.compute_features(model, actions), store.compute_labels(model, actions))
+    
+    assert len(chunks) == 4
+    assert set(scores) == {'scores', 'concedes'}
+    
+def test_vaep_fit_chunks_without_training_chunk(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(2, seed=0))
+    model = VAEP()
+    chunks = FeatureStore(str(tmp_path)).chunks(model, actions)
+    
+    for learner in ['xgboost', 'lightgbm']:
+        with pytest.raises(ValueError, match='training set'):
+            model.fit_chunks(chunks, learner=learner, val_size=1.0, num_boost_round=5)
+    
+def test_vaep_incremental_features():
+     
+    actions = convert_to_actions(generate_chains(2, seed=0))
+    model = VAEP()
+    engine = IncrementalFeatures(model)
+    features = pd.concat([engine.update(actions.iloc[start:start + 7]) for start in range(0, len(actions), 7)])
+    
+    assert features.equals(model.compute_features_many(actions, max_workers=1))
+    
+def test_vaep_label_horizons():
+     
+    actions = add_names(convert_to_actions(generate_chains(3, seed=0)))
+    labels = vaep_labels.scores_concedes(actions, horizons=(5, 10))
+    per_match = pd.concat([vaep_labels.scores_concedes(match_actions, horizons=(5, 10)) for _, match_actions in actions.groupby('match_id', sort=False)])
+    
+    assert list(labels.columns) == ['scores_5', 'scores_10', 'concedes_5', 'concedes_10']
+    assert labels.equals(per_match)
+    assert labels['scores_10'].equals(vaep_labels.scores(actions, 10)['scores'])
+    assert labels['concedes_10'].equals(vaep_labels.concedes(actions, 10)['concedes'])
+    assert (labels['concedes_10'] >= labels['concedes_5']).all()
+    
+def test_vaep_label_time_windows():
+     
+    actions = add_names(convert_to_actions(generate_chains(3, seed=0)))
+    labels = vaep_labels.scores_concedes_seconds(actions, seconds=(10, 60))
+    per_match = pd.concat([vaep_labels.scores_concedes_seconds(match_actions, seconds=(10, 60)) for _, match_actions in actions.groupby('match_id', sort=False)])
+    
+    assert list(labels.columns) == ['scores_10s', 'scores_60s', 'concedes_10s', 'concedes_60s']
+    assert labels.equals(per_match)
+    assert (labels['scores_60s'] >= labels['scores_10s']).all()
+    
+def test_vaep_formula_many_matches():
+     
+    actions = add_names(convert_to_actions(generate_chains(3, seed=0)))
+    scores = pd.Series(0.5, index=actions.index)
+    concedes = pd.Series(0.25, index=actions.index)
+    values = vaep_formula.value(actions, scores, concedes)
+    per_match = pd.concat([vaep_formula.value(match_actions, scores[match_actions.index], concedes[match_actions.index]) for _, match_actions in actions.groupby('match_id', sort=False)])
+    first = actions.groupby(['match_id', 'period_id'], sort=False).head(1).index
+    
+    assert values.equals(per_match)
+    assert (values.loc[first, 'offensive_value'] == 0.5).all()
+    assert (values.loc[first, 'defensive_value'] == -0.25).all()
+    
+def test_vaep_rate_many():
+     
+    actions = convert_to_actions(generate_chains(3, seed=0))
+    model = VAEP()
+    X = model.compute_features_many(actions, max_workers=1)
+    y = model.compute_labels_many(actions, max_workers=1)
+    model.fit(X, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    ratings = model.rate_many(actions, game_states=X)
+    per_game = pd.concat([model.rate(None, match_actions, X.loc[match_actions.index]) for _, match_actions in actions.groupby('match_id', sort=False)])
+    
+    assert list(ratings.columns) == ['offensive_value', 'defensive_value', 'vaep_value']
+    assert ratings.index.equals(actions.index)
+    assert ratings.equals(per_game)
+    
+def test_vaep_save_load(tmp_path):
+     
+    actions = convert_to_actions(generate_chains(3, seed=0))
+    model = VAEP(nb_prev_actions=2)
+    X = model.compute_features_many(actions, max_workers=1)
+    y = model.compute_labels_many(actions, max_workers=1)
+    model.fit(X, y, tree_params={'n_estimators': 5, 'max_depth': 2}, fit_params={'verbose': False})
+    model.save(str(tmp_path))
+    loaded = VAEP.load(str(tmp_path))
+    
+    assert loaded.nb_prev_actions == 2
+    assert loaded._VAEP__models.loaded == []
+    assert pickle.loads(pickle.dumps(loaded)).rate_many(actions, game_states=X).equals(model.rate_many(actions, game_states=X))
+    assert loaded.rate_many(actions, game_states=X).equals(model.rate_many(actions, game_states=X))
+    assert loaded._VAEP__models.loaded == ['scores', 'concedes']
+    assert pickle.loads(pickle.dumps(loaded))._VAEP__models.loaded == ['scores', 'concedes']